@@ -0,0 +1,38 @@
+"""
+运行指标API模块
+
+该模块提供Prometheus抓取接口，包括：
+1. 上传、ADB、自动化各阶段的耗时分布
+2. 定时任务数量、设备任务队列深度、设备工作等待数量
+3. 在线设备数量
+"""
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from core.adb import adb
+from core.device_scheduler import device_scheduler
+from core.job_queue import job_queue
+from core.metrics import (
+    registry, SCHEDULER_JOBS, DEVICE_JOB_QUEUE_DEPTH, DEVICE_WORK_WAITING, CONNECTED_DEVICES
+)
+from core.scheduler import job_store
+
+router = APIRouter(tags=["Metrics"])
+
+# 抓取时读取的当前值
+SCHEDULER_JOBS.set_function(job_store.count)
+DEVICE_JOB_QUEUE_DEPTH.set_function(job_queue.depth)
+DEVICE_WORK_WAITING.set_function(
+    lambda: {serial: stats["waiting"] for serial, stats in device_scheduler.stats().items()}
+)
+CONNECTED_DEVICES.set_function(lambda: len(adb.registry.connected_devices()))
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """
+    输出Prometheus文本格式的指标
+
+    Returns:
+        str: 指标文本
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -4,10 +4,17 @@
 该模块提供设备相关的API接口，包括：
 1. 获取设备列表
 2. 设备信息查询
+3. 上传文件磁盘占用统计
+4. 物理设备工作队列统计
+5. 图片传输调度统计
 """
 
 from fastapi import APIRouter
 from core.config import Settings
+from core.device_scheduler import device_scheduler
+from core.executors import disk_executor
+from core.transfer_scheduler import transfer_scheduler, bandwidth_limiter
+from services.blob_store import blob_store
 
 # 修改路由前缀，使用复数形式
 router = APIRouter(prefix="/api/v1/devices", tags=["Device Info"])
@@ -34,4 +41,93 @@ async def get_device_list():
         "data": {
             "devices": devices
         }
-    } 
\ No newline at end of file
+    }
+
+@router.get("/storage")
+async def get_storage_usage():
+    """
+    获取各设备上传文件的磁盘占用
+
+    Returns:
+        dict: {
+            "code": 1,
+            "status": "success",
+            "data": {
+                "devices": {"deviceA": {"files": 18, "logical_bytes": 123456}},
+                "blobs": {"count": 9, "bytes": 61728},
+                "logical_bytes": 123456,
+                "physical_bytes": 61728,
+                "saved_bytes": 61728
+            }
+        }
+    """
+    usage = await disk_executor.run(blob_store.usage)
+
+    return {
+        "code": 1,
+        "status": "success",
+        "data": usage
+    }
+
+@router.get("/queues")
+async def get_device_queues():
+    """
+    获取各物理设备的工作队列统计
+
+    多个设备名映射到同一序列号时共用一个队列。
+
+    Returns:
+        dict: {
+            "code": 1,
+            "status": "success",
+            "data": {
+                "max_concurrency": 16,
+                "queues": {
+                    "XPL5T19A28003051": {
+                        "waiting": 1,
+                        "running": "post:deviceA:1700000000",
+                        "completed": 12,
+                        "avg_wait_seconds": 3.2,
+                        "max_wait_seconds": 40.5,
+                        "last_wait_seconds": 0.0
+                    }
+                }
+            }
+        }
+    """
+    return {
+        "code": 1,
+        "status": "success",
+        "data": {
+            "max_concurrency": device_scheduler.max_concurrency,
+            "queues": device_scheduler.stats()
+        }
+    }
+
+@router.get("/transfers")
+async def get_transfer_stats():
+    """
+    获取图片传输调度统计
+
+    Returns:
+        dict: {
+            "code": 1,
+            "status": "success",
+            "data": {
+                "max_transfers": 8,
+                "per_hub": 4,
+                "bandwidth_limit": 67108864,
+                "running": {"default": 3},
+                "waiting": 2,
+                "completed": 41
+            }
+        }
+    """
+    return {
+        "code": 1,
+        "status": "success",
+        "data": {
+            **transfer_scheduler.stats(),
+            "bandwidth_limit": bandwidth_limiter.rate
+        }
+    }
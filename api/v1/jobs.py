@@ -0,0 +1,296 @@
+"""
+任务查询API模块
+
+该模块提供后台任务相关的API接口，包括：
+1. 查询设备立即任务的执行进度
+2. 分页查询定时任务，可按设备和执行时间范围过滤
+3. 定时任务的改期、取消和立即执行
+4. 查询重试耗尽的死信步骤
+5. 查询发布操作的步骤追踪和按步骤的耗时汇总
+"""
+
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, status
+from core.config import Settings
+from core.job_queue import job_queue
+from core.retry import step_ledger
+from core.tracing import trace_store
+from core.scheduler import (
+    JobLookupError, job_store, get_scheduled_job, reschedule_job, cancel_job, run_job_now
+)
+from models.request import RescheduleRequest
+
+router = APIRouter(prefix="/api/v1/jobs", tags=["Jobs"])
+
+@router.get("/")
+async def list_jobs(
+    device_name: Optional[str] = Query(None, description="设备名称"),
+    start: Optional[int] = Query(None, description="执行时间下限（Unix时间戳，包含）"),
+    end: Optional[int] = Query(None, description="执行时间上限（Unix时间戳，不包含）"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=500)
+):
+    """
+    分页查询定时任务，按执行时间排序
+
+    Returns:
+        dict: {
+            "code": 1,
+            "status": "success",
+            "data": {
+                "total": 1234,
+                "page": 1,
+                "page_size": 50,
+                "items": [
+                    {
+                        "id": "post:deviceA:1700000000",
+                        "device_name": "deviceA",
+                        "task_time": 1700000000,
+                        "next_run_time": 1700000000.0
+                    }
+                ]
+            }
+        }
+    """
+    result = job_store.find_jobs(
+        device_name=device_name,
+        start=start,
+        end=end,
+        limit=page_size,
+        offset=(page - 1) * page_size
+    )
+
+    return {
+        "code": 1,
+        "status": "success",
+        "data": {
+            "total": result["total"],
+            "page": page,
+            "page_size": page_size,
+            "items": result["items"]
+        }
+    }
+
+@router.get("/dead-letters")
+async def list_dead_letters(
+    device_name: Optional[str] = Query(None, description="设备名称"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1, le=500)
+):
+    """
+    分页查询死信（重试耗尽或不可重试的步骤），最新的在前
+
+    Returns:
+        dict: {
+            "code": 1,
+            "status": "success",
+            "data": {
+                "total": 3,
+                "page": 1,
+                "page_size": 50,
+                "items": [
+                    {
+                        "id": 3,
+                        "step_key": "publish:deviceA:1700000000",
+                        "device_name": "deviceA",
+                        "payload": {"step": "publish", "device_name": "deviceA", "task_time": 1700000000},
+                        "error": "CONNECT_FAILED",
+                        "attempts": 3,
+                        "created_at": 1700000900.0
+                    }
+                ]
+            }
+        }
+    """
+    result = step_ledger.dead_letters(device_name=device_name, limit=page_size, offset=(page - 1) * page_size)
+
+    return {
+        "code": 1,
+        "status": "success",
+        "data": {
+            "total": result["total"],
+            "page": page,
+            "page_size": page_size,
+            "items": result["items"]
+        }
+    }
+
+@router.get("/traces")
+async def list_traces(
+    device_name: Optional[str] = Query(None, description="设备名称"),
+    post_time: Optional[int] = Query(None, description="帖子时间戳"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=200)
+):
+    """
+    分页查询发布操作的步骤追踪，最新的在前；同一帖子的每次重试各有一条记录
+
+    Returns:
+        dict: {
+            "code": 1,
+            "status": "success",
+            "data": {
+                "total": 2,
+                "page": 1,
+                "page_size": 20,
+                "items": [
+                    {
+                        "run_id": "...",
+                        "device_name": "deviceA",
+                        "post_time": 1700000000,
+                        "status": "SUCCESS",
+                        "started_at": 1700000003.2,
+                        "duration": 41.7,
+                        "spans": [
+                            {"step": "unlock", "start_offset": 0.01, "duration": 6.3, "slept": 0.0, "error": null}
+                        ]
+                    }
+                ]
+            }
+        }
+    """
+    result = trace_store.runs(
+        device_name=device_name,
+        post_time=post_time,
+        limit=page_size,
+        offset=(page - 1) * page_size
+    )
+
+    return {
+        "code": 1,
+        "status": "success",
+        "data": {
+            "total": result["total"],
+            "page": page,
+            "page_size": page_size,
+            "items": result["items"]
+        }
+    }
+
+@router.get("/traces/steps")
+async def trace_step_stats(
+    device_name: Optional[str] = Query(None, description="设备名称"),
+    since: Optional[int] = Query(None, description="只统计此时间之后的运行（Unix时间戳）")
+):
+    """
+    按步骤汇总发布操作的耗时，平均耗时最长的在前
+
+    Returns:
+        dict: {
+            "code": 1,
+            "status": "success",
+            "data": [
+                {
+                    "step": "select_folder",
+                    "count": 120,
+                    "failures": 2,
+                    "avg_duration": 12.4,
+                    "max_duration": 31.0,
+                    "avg_slept": 1.5
+                }
+            ]
+        }
+    """
+    return {
+        "code": 1,
+        "status": "success",
+        "data": trace_store.step_stats(device_name=device_name, since=since)
+    }
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    """
+    查询任务进度
+
+    先查找设备立即任务，不存在时查找定时任务。
+
+    Returns:
+        dict: {
+            "code": 1,
+            "status": "success",
+            "data": {
+                "id": "...",
+                "device_name": "deviceA",
+                "upload_time": 1700000000,
+                "status": "queued|running|succeeded|failed",
+                "images_total": 9,
+                "images_pushed": 9,
+                "images_failed": 0,
+                "notification": "pending|sent|failed|skipped",
+                "error": null,
+                ...
+            }
+        }
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        job = get_scheduled_job(job_id)
+    if job is None:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Job not found")
+
+    return {
+        "code": 1,
+        "status": "success",
+        "data": job
+    }
+
+@router.post("/{job_id}/reschedule")
+async def reschedule_scheduled_job(job_id: str, request: RescheduleRequest):
+    """
+    修改定时任务的执行时间
+
+    Returns:
+        dict: {"code": 1, "status": "success", "data": 任务摘要}
+    """
+    run_time = datetime.fromtimestamp(request.run_at, tz=Settings.SCHEDULER_TIMEZONE)
+    try:
+        job = reschedule_job(job_id, run_time)
+    except JobLookupError:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Job not found")
+    except ValueError as e:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, str(e))
+
+    return {
+        "code": 1,
+        "status": "success",
+        "data": job
+    }
+
+@router.post("/{job_id}/run")
+async def run_scheduled_job(job_id: str):
+    """
+    立即执行定时任务
+
+    Returns:
+        dict: {"code": 1, "status": "success", "data": 任务摘要}
+    """
+    try:
+        job = run_job_now(job_id)
+    except JobLookupError:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Job not found")
+
+    return {
+        "code": 1,
+        "status": "success",
+        "data": job
+    }
+
+@router.delete("/{job_id}")
+async def cancel_scheduled_job(job_id: str):
+    """
+    取消定时任务
+
+    Returns:
+        dict: {"code": 1, "status": "success", "data": {"id": 任务ID}}
+    """
+    try:
+        cancel_job(job_id)
+    except JobLookupError:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Job not found")
+
+    return {
+        "code": 1,
+        "status": "success",
+        "data": {"id": job_id}
+    }
@@ -3,78 +3,225 @@
 
 该模块提供设备数据上传的API接口，主要功能包括：
 1. 接收并处理设备上传的文件和文本数据
-2. 创建相应的定时任务进行后续处理
-3. 处理上传过程中的异常情况
+2. 将设备推送任务放入后台任务队列
+3. 创建相应的定时任务进行后续处理
+4. 处理上传过程中的异常情况
 
 主要组件：
 - upload_endpoint: 主上传接口
+- multipart_upload_endpoint: multipart/form-data流式上传接口
+- upload_session_*: 断点续传分块上传接口
 - handle_upload: 处理文件上传逻辑
 - create_scheduled_task: 创建定时任务
 """
 
-from fastapi import APIRouter, HTTPException, status
-from core.tasks import execute_immediate_tasks, execute_scheduled_tasks
-from models.request import UploadRequest
-from services.upload_service import process_upload
-from core.scheduler import add_job
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from core.tasks import execute_scheduled_tasks
+from core.job_queue import job_queue
+from models.request import UploadRequest, UploadMeta, UploadSessionRequest
+from services.upload_service import process_upload, process_multipart_upload, InvalidFileDataError, UploadTooLargeError
+from services.upload_session_service import (
+    UploadSessionError, UploadSessionNotFound, UploadSessionConflict, create_session, get_session, write_chunk, finalize_session
+)
+from utils.multipart_utils import MultipartError
+from core.scheduler import add_job, allocate_post_slot, scheduled_job_id
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone, timedelta
+from typing import Optional
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/v1/upload", tags=["Device Upload"])
 
-@router.post("/", status_code=status.HTTP_201_CREATED)
+@router.post("/", status_code=status.HTTP_202_ACCEPTED)
 async def upload_endpoint(request: UploadRequest):
     """
     设备上传数据接口
     1. 处理文件上传请求
-    2. 执行立即任务
+    2. 立即任务入队，文件落盘后即返回任务ID
     3. 创建定时任务
     """
     # 处理上传
     response_data = await handle_upload(request)
     
-    # 执行立即任务
-    await execute_immediate_task(request)
+    # 立即任务入队
+    response_data["job_id"] = await execute_immediate_task(request)
     
     # 创建定时任务
-    await create_scheduled_task(request)
+    response_data["scheduled_job_id"] = await create_scheduled_task(request)
     
     return response_data
 
+@router.post(
+    "/multipart",
+    status_code=status.HTTP_202_ACCEPTED,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["device_name", "timestamp"],
+                        "properties": {
+                            "device_name": {"type": "string"},
+                            "timestamp": {"type": "integer"},
+                            "title": {"type": "string"},
+                            "content": {"type": "string"},
+                            "files": {"type": "array", "items": {"type": "string", "format": "binary"}}
+                        }
+                    }
+                }
+            }
+        }
+    }
+)
+async def multipart_upload_endpoint(request: Request):
+    """
+    multipart/form-data流式上传接口
+
+    与JSON上传接口的目录结构和后续任务一致，但文件以二进制分段上传，
+    边接收边写入磁盘，避免Base64膨胀和整包驻留内存。
+    """
+    # 处理上传
+    meta, response_data = await handle_multipart_upload(request)
+
+    # 立即任务入队
+    response_data["job_id"] = await execute_immediate_task(meta)
+
+    # 创建定时任务
+    response_data["scheduled_job_id"] = await create_scheduled_task(meta)
+
+    return response_data
+
+@router.post("/sessions", status_code=status.HTTP_201_CREATED)
+async def create_upload_session(request: UploadSessionRequest):
+    """
+    创建断点续传会话
+
+    声明设备信息和待上传文件的大小，返回会话ID，
+    之后按文件序号和偏移量上传分块。
+    """
+    async with session_errors():
+        return success_response(await create_session(request))
+
+@router.get("/sessions/{session_id}")
+async def get_upload_session(session_id: str):
+    """查询会话中各文件已接收的字节区间"""
+    async with session_errors():
+        return success_response(await get_session(session_id))
+
+@router.put("/sessions/{session_id}/files/{file_index}/chunks/{chunk_no}")
+async def put_upload_chunk(request: Request, session_id: str, file_index: int, chunk_no: int,
+                           offset: int = Query(..., ge=0)):
+    """
+    上传一个分块
+
+    请求体为分块的原始字节，写入文件的offset偏移处。
+    同一分块可重复上传，已接收区间会自动合并。
+    """
+    async with session_errors():
+        return success_response(await write_chunk(session_id, file_index, chunk_no, offset, request.stream()))
+
+@router.post("/sessions/{session_id}/finalize", status_code=status.HTTP_202_ACCEPTED)
+async def finalize_upload_session(session_id: str):
+    """
+    完成断点续传会话
+
+    1. 合并文件并写入正式目录结构
+    2. 立即任务入队
+    3. 创建定时任务
+    """
+    async with session_errors():
+        meta, response_data = await finalize_session(session_id)
+
+    # 立即任务入队
+    response_data["job_id"] = await execute_immediate_task(meta)
+
+    # 创建定时任务
+    response_data["scheduled_job_id"] = await create_scheduled_task(meta)
+
+    return response_data
+
+def success_response(data: dict) -> dict:
+    """按上传接口的统一格式包装响应数据"""
+    return {"code": 1, "msg": "success", **data}
+
+@asynccontextmanager
+async def session_errors():
+    """把断点续传的业务异常转换为HTTP错误"""
+    try:
+        yield
+    except UploadSessionNotFound:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Upload session not found")
+    except UploadSessionConflict as e:
+        raise HTTPException(status.HTTP_409_CONFLICT, str(e))
+    except UploadSessionError as e:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, str(e))
+    except UploadTooLargeError as e:
+        raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Upload session failed: %s", str(e))
+        raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, "Upload failed")
+
 async def handle_upload(request: UploadRequest) -> dict:
     """处理文件上传请求"""
     try:
         return await process_upload(request)
+    except InvalidFileDataError as e:
+        raise HTTPException(status.HTTP_422_UNPROCESSABLE_ENTITY, str(e))
     except Exception as e:
         logger.error("Upload failed: %s", str(e))
         raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, "Upload failed")
 
-async def execute_immediate_task(request: UploadRequest):
-    """执行立即任务"""
+async def handle_multipart_upload(request: Request) -> tuple[UploadMeta, dict]:
+    """处理multipart流式上传请求"""
+    try:
+        return await process_multipart_upload(request.headers.get("content-type", ""), request.stream())
+    except MultipartError as e:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, str(e))
+    except UploadTooLargeError as e:
+        raise HTTPException(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, str(e))
+    except Exception as e:
+        logger.error("Multipart upload failed: %s", str(e))
+        raise HTTPException(status.HTTP_500_INTERNAL_SERVER_ERROR, "Upload failed")
+
+async def execute_immediate_task(request: UploadMeta) -> Optional[str]:
+    """立即任务入队，返回任务ID，入队失败时返回None"""
     try:
-        await execute_immediate_tasks(
+        job = job_queue.enqueue(
             device_name=request.device_name,
             upload_time=request.timestamp
         )
+        return job["id"]
     except Exception as e:
-        logger.error("Immediate task failed: %s", str(e))
+        logger.error("Immediate task enqueue failed: %s", str(e))
         # 这里我们不抛出异常，因为这是次要任务，不应影响上传响应
+        return None
         
-async def create_scheduled_task(request: UploadRequest):
-    """创建定时任务"""
+async def create_scheduled_task(request: UploadMeta) -> Optional[str]:
+    """创建定时任务，同一设备同一时间戳只保留一个任务，发布时间按最小间隔顺延，返回定时任务ID"""
     try:
         # 使用上海时区
         shanghai_tz = timezone(timedelta(hours=8))
         trigger_time = datetime.fromtimestamp(request.timestamp, tz=timezone.utc)
         trigger_time_shanghai = trigger_time.astimezone(shanghai_tz)
         
-        add_job(
+        # 按设备和账号的最小发布间隔顺延到空闲时间槽
+        job_id = scheduled_job_id(request.device_name, request.timestamp)
+        run_time = allocate_post_slot(request.device_name, trigger_time_shanghai, job_id=job_id)
+        
+        job = add_job(
             execute_scheduled_tasks,
-            trigger_time_shanghai,
+            run_time,
+            job_id=job_id,
             device_name=request.device_name,
             task_time=request.timestamp
         )
+        return job.id if job else None
     except Exception as e:
         logger.error("Task scheduling failed: %s", str(e))
-        # 这里我们不抛出异常，因为这是次要任务，不应影响上传响应
\ No newline at end of file
+        # 这里我们不抛出异常，因为这是次要任务，不应影响上传响应
+        return None
\ No newline at end of file
@@ -0,0 +1,106 @@
+"""
+定时任务恢复基准测试脚本
+
+在临时数据库中写入指定数量的定时发布任务，模拟服务重启后的恢复过程：
+1. startup - 打开存储、读取任务ID索引、下次执行时间和到期任务（start_scheduler的实际路径）
+2. full    - 反序列化全部任务（旧的整表加载方式，作为对比）
+3. query   - 按设备分页查询任务摘要（任务列表接口）
+
+目标：数千个任务的startup耗时低于1秒。
+
+用法:
+    python -m benchmarks.job_store_rehydration_benchmark --jobs 5000 --runs 5
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from core.job_store import SQLiteJobStore
+
+STARTUP_TARGET = 1.0  # startup耗时目标（秒）
+
+def publish(device_name: str, task_time: int) -> None:
+    """基准测试用的任务函数"""
+
+def open_scheduler(db_path: Path) -> AsyncIOScheduler:
+    """打开任务存储并以暂停状态启动调度器（绑定到不运行的事件循环，任务不会执行）"""
+    scheduler = AsyncIOScheduler(timezone=timezone.utc, jobstores={"default": SQLiteJobStore(db_path)},
+                                 event_loop=asyncio.new_event_loop())
+    scheduler.start(paused=True)
+    return scheduler
+
+def close_scheduler(scheduler: AsyncIOScheduler) -> None:
+    """关闭调度器（同时关闭任务存储）和它的事件循环"""
+    scheduler.shutdown(wait=False)
+    scheduler._eventloop.close()
+
+def populate(db_path: Path, jobs: int, devices: int) -> None:
+    """写入任务，执行时间从一小时后开始每分钟一个，轮流分配到各设备"""
+    scheduler = open_scheduler(db_path)
+    start = datetime.now(timezone.utc) + timedelta(hours=1)
+    for index in range(jobs):
+        device_name = f"device{index % devices}"
+        scheduler.add_job(
+            publish, "date", run_date=start + timedelta(minutes=index), id=f"post:{device_name}:{index}",
+            kwargs={"device_name": device_name, "task_time": index}
+        )
+    close_scheduler(scheduler)
+
+def startup(db_path: Path) -> None:
+    """启动路径：不反序列化未到期的任务"""
+    store = SQLiteJobStore(db_path)
+    store.job_ids()
+    store.get_next_run_time()
+    store.get_due_jobs(datetime.now(timezone.utc))
+    store.shutdown()
+
+def full(db_path: Path) -> None:
+    """整表加载：反序列化全部任务"""
+    scheduler = open_scheduler(db_path)
+    scheduler.get_jobs()
+    close_scheduler(scheduler)
+
+def query(db_path: Path) -> None:
+    """任务列表接口：按设备分页查询摘要"""
+    store = SQLiteJobStore(db_path)
+    store.find_jobs(device_name="device0", limit=100)
+    store.shutdown()
+
+def measure(func: Callable[[Path], None], db_path: Path, runs: int) -> List[float]:
+    """执行多次并返回每次的耗时（秒）"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func(db_path)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="定时任务恢复基准测试")
+    parser.add_argument("--jobs", type=int, default=5000, help="任务数量")
+    parser.add_argument("--devices", type=int, default=10, help="设备数量")
+    parser.add_argument("--runs", type=int, default=5, help="每种方式的执行次数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / "scheduler.db"
+        populate(db_path, args.jobs, args.devices)
+        print(f"jobs={args.jobs} devices={args.devices} runs={args.runs}")
+        for name, func in (("startup", startup), ("full", full), ("query", query)):
+            timings = measure(func, db_path, args.runs)
+            print(f"{name:>8}: avg {sum(timings) / len(timings) * 1000:8.2f} ms, max {max(timings) * 1000:8.2f} ms")
+            if name == "startup":
+                verdict = "OK" if max(timings) < STARTUP_TARGET else "SLOW"
+                print(f"          target < {STARTUP_TARGET * 1000:.0f} ms: {verdict}")
+
+if __name__ == "__main__":
+    main()
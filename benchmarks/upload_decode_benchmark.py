@@ -0,0 +1,104 @@
+"""
+上传解码基准测试脚本
+
+对比Base64上传的两种处理方式：
+1. before - 校验时解码一次并丢弃，保存时再解码一次（旧实现）
+2. after  - 校验时不解码，保存时解码一次（FileBase64.decode）
+
+每种方式在独立子进程中运行，分别统计每个请求的解码耗时和进程峰值RSS。
+
+用法:
+    python -m benchmarks.upload_decode_benchmark --files 20 --size-kb 2048 --requests 5
+"""
+
+import argparse
+import base64
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+def build_payload(files: int, size_kb: int) -> dict:
+    """构造一个上传请求的JSON负载"""
+    return {
+        "device_name": "deviceA",
+        "timestamp": int(time.time()),
+        "files": [
+            {"filename": f"{i}.jpg", "data": base64.b64encode(os.urandom(size_kb * 1024)).decode()}
+            for i in range(files)
+        ]
+    }
+
+def run_before(payload: dict) -> float:
+    """旧实现：校验解码一次并丢弃，保存时再解码一次"""
+    from typing import List
+    from pydantic import BaseModel, validator
+
+    class LegacyFileBase64(BaseModel):
+        filename: str
+        data: str
+
+        @validator('data')
+        def validate_base64(cls, v):
+            base64.b64decode(v.encode(), validate=True)
+            return v
+
+    class LegacyUploadRequest(BaseModel):
+        device_name: str
+        timestamp: int
+        files: List[LegacyFileBase64]
+
+    start = time.perf_counter()
+    request = LegacyUploadRequest(**payload)
+    for file in request.files:
+        base64.b64decode(file.data.encode())
+    return time.perf_counter() - start
+
+def run_after(payload: dict) -> float:
+    """新实现：校验时不解码，保存时解码一次"""
+    from models.request import UploadRequest
+
+    start = time.perf_counter()
+    request = UploadRequest(**payload)
+    for file in request.files:
+        file.decode()
+    return time.perf_counter() - start
+
+def worker(mode: str, files: int, size_kb: int, requests: int, queue) -> None:
+    """在子进程中执行基准测试并回传结果"""
+    runner = run_before if mode == "before" else run_after
+    timings = []
+    for _ in range(requests):
+        payload = build_payload(files, size_kb)
+        timings.append(runner(payload))
+        del payload
+    # Linux下ru_maxrss单位为KB，macOS下为字节
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak //= 1024
+    queue.put((timings, peak))
+
+def main():
+    parser = argparse.ArgumentParser(description="Base64上传解码基准测试")
+    parser.add_argument("--files", type=int, default=20, help="每个请求的图片数量")
+    parser.add_argument("--size-kb", type=int, default=2048, help="每张图片的大小(KB)")
+    parser.add_argument("--requests", type=int, default=5, help="请求次数")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"files={args.files} size={args.size_kb}KB requests={args.requests}")
+    for mode in ("before", "after"):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=worker, args=(mode, args.files, args.size_kb, args.requests, queue))
+        proc.start()
+        timings, peak = queue.get()
+        proc.join()
+        avg_ms = sum(timings) / len(timings) * 1000
+        print(f"{mode:>6}: decode {avg_ms:8.2f} ms/request, peak RSS {peak / 1024:8.1f} MB")
+
+if __name__ == "__main__":
+    main()
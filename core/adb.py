@@ -3,15 +3,24 @@ ADB调试桥模块
 
 该模块提供与安卓设备通信的核心功能：
 1. 设备连接管理
-2. ADB命令执行
-3. 异步通信支持
+2. ADB命令执行（套接字引擎或adb子进程）
+3. 异步通信支持（子进程基于asyncio，超时或取消时结束进程）
 """
 
 import subprocess
 import asyncio
 import logging
-from typing import List, Set, Optional, Dict, Union
+import time
+from pathlib import Path
+from typing import Callable, List, Set, Optional, Dict, Union
+from adbutils.errors import AdbConnectionError
 from core.config import Settings
+from core.metrics import ADB_COMMAND_DURATION, ADB_PUSH_BYTES, ADB_PUSH_THROUGHPUT
+from core.adb_engine import SocketADBEngine
+from core.adb_process import AsyncProcessRunner
+from core.executors import device_io_executor
+from core.device_registry import DeviceRegistry
+from core.transfer_scheduler import bandwidth_limiter
 
 logger = logging.getLogger(__name__)
 
@@ -31,11 +40,30 @@ class ADBInterface:
         self.adb_path = Settings.ADB_PATH or "adb"
         self.device_mapping = Settings.DEVICE_MAPPING
         self.connected_devices: Set[str] = set()
+        # shell和push优先走套接字引擎，其他命令仍通过adb子进程执行
+        self.engine = SocketADBEngine(
+            pool_size=Settings.ADB_SYNC_POOL_SIZE, persistent_shell=Settings.ADB_PERSISTENT_SHELL,
+            bandwidth=bandwidth_limiter
+        ) if Settings.ADB_ENGINE == "socket" else None
+        # adb子进程执行器，限制全局和单设备的并发进程数
+        self.processes = AsyncProcessRunner(
+            max_concurrency=Settings.ADB_PROCESS_MAX_CONCURRENCY,
+            per_device=Settings.ADB_PROCESS_PER_DEVICE,
+            kill_grace=Settings.ADB_PROCESS_KILL_GRACE
+        )
+        # 设备在线状态注册表，由track-devices长连接（或轮询）维护
+        self.registry = DeviceRegistry(poll=self._list_devices)
+        self.registry.add_listener(self._on_device_state)
         
         # 启动ADB服务器并初始化设备列表
         self._start_adb_server()
         self.update_connected_devices()
     
+    def _on_device_state(self, serial: str, connected: bool, status: str) -> None:
+        """设备断开时丢弃套接字引擎中该设备的常驻shell和sync连接"""
+        if not connected and self.engine is not None:
+            self.engine.drop_device(serial)
+    
     def _start_adb_server(self) -> None:
         """启动ADB服务器"""
         try:
@@ -50,28 +78,41 @@ class ADBInterface:
         except Exception as e:
             logger.error(f"启动ADB服务器失败: {str(e)}")
     
+    def _list_devices(self) -> Set[str]:
+        """
+        通过adb devices获取在线设备
+        
+        Returns:
+            包含设备ID的集合
+            
+        Raises:
+            Exception: adb命令执行失败
+        """
+        result = subprocess.run(
+            [self.adb_path, 'devices'], 
+            capture_output=True, 
+            text=True, 
+            check=True,
+            timeout=10
+        )
+
+        # 解析ADB输出
+        lines = result.stdout.strip().split('\n')[1:]  # 跳过标题行
+        return {
+            line.split()[0] for line in lines 
+            if line.strip() and 'device' in line  # 过滤掉未授权设备
+        }
+    
     def update_connected_devices(self) -> Set[str]:
         """
-        更新已连接的设备列表
+        更新已连接的设备列表，并同步到设备注册表
         
         Returns:
             包含设备ID的集合
         """
         try:
-            result = subprocess.run(
-                [self.adb_path, 'devices'], 
-                capture_output=True, 
-                text=True, 
-                check=True,
-                timeout=10
-            )
-
-            # 解析ADB输出
-            lines = result.stdout.strip().split('\n')[1:]  # 跳过标题行
-            self.connected_devices = {
-                line.split()[0] for line in lines 
-                if line.strip() and 'device' in line  # 过滤掉未授权设备
-            }
+            self.connected_devices = self._list_devices()
+            self.registry.replace_all({serial: "device" for serial in self.connected_devices})
             
             logger.info(f"当前连接的设备: {self.connected_devices}")
             return self.connected_devices
@@ -81,7 +122,7 @@ class ADBInterface:
             self.connected_devices = set()
             return set()
     
-    def _get_device_id(self, device_name: str) -> str:
+    def get_device_id(self, device_name: str) -> str:
         """
         从设备名称获取设备ID
         
@@ -97,11 +138,14 @@ class ADBInterface:
         """
         异步获取已连接的设备列表
         
+        注册表数据可信时直接返回内存中的结果，否则执行adb devices刷新。
+        
         Returns:
             包含设备ID的集合
         """
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, self.update_connected_devices)
+        if self.registry.is_fresh():
+            return self.registry.connected_devices()
+        return await device_io_executor.run(self.update_connected_devices)
     
     async def is_device_connected_async(self, device_name: str) -> bool:
         """
@@ -113,8 +157,10 @@ class ADBInterface:
         Returns:
             设备是否连接
         """
+        device_id = self.get_device_id(device_name)
+        if self.registry.is_fresh():
+            return self.registry.is_connected(device_id)
         devices = await self.get_connected_devices_async()
-        device_id = self._get_device_id(device_name)
         return device_id in devices
     
     async def connect_device_async(self, device_name: str) -> bool:
@@ -127,7 +173,7 @@ class ADBInterface:
         Returns:
             连接是否成功
         """
-        device_id = self._get_device_id(device_name)
+        device_id = self.get_device_id(device_name)
         
         # 检查设备是否已连接
         if await self.is_device_connected_async(device_name):
@@ -140,7 +186,8 @@ class ADBInterface:
             
             if success:
                 logger.info(f"成功连接到设备: {device_id}")
-                await self.get_connected_devices_async()  # 更新设备列表
+                # 强制刷新设备列表，不等待track-devices推送
+                await device_io_executor.run(self.update_connected_devices)
                 return True
             else:
                 logger.error(f"连接设备失败: {device_id}, 输出: {result}")
@@ -149,12 +196,14 @@ class ADBInterface:
             logger.error(f"连接设备时发生错误: {str(e)}")
             return False
     
-    async def execute_adb_command_async(self, command_args: List[str]) -> str:
+    async def execute_adb_command_async(self, command_args: List[str],
+                                        on_line: Optional[Callable[[str], None]] = None) -> str:
         """
         异步执行ADB命令
         
         Args:
             command_args: ADB命令参数列表
+            on_line: 可选回调，每读到一行输出调用一次
             
         Returns:
             命令执行结果
@@ -163,7 +212,7 @@ class ADBInterface:
             ADBException: 命令执行失败
         """
         cmd = [self.adb_path] + command_args
-        return await self._run_command_async(cmd)
+        return await self._run_command_async(cmd, on_line=on_line)
     
     async def execute_device_command_async(self, device_name: str, command_args: List[str]) -> str:
         """
@@ -179,16 +228,68 @@ class ADBInterface:
         Raises:
             ADBException: 命令执行失败
         """
-        device_id = self._get_device_id(device_name)
+        device_id = self.get_device_id(device_name)
+        if self.engine is not None and command_args and command_args[0] in ('shell', 'push'):
+            try:
+                return await self._run_engine_command_async(device_id, command_args)
+            except AdbConnectionError as e:
+                logger.warning(f"无法连接ADB服务器，改用adb进程执行: {str(e)}")
         cmd = [self.adb_path, '-s', device_id] + command_args
         return await self._run_command_async(cmd)
     
-    async def _run_command_async(self, cmd: List[str]) -> str:
+    async def _run_engine_command_async(self, device_id: str, command_args: List[str]) -> str:
+        """
+        通过套接字引擎执行shell或push命令
+        
+        Args:
+            device_id: 设备ID
+            command_args: 命令参数列表，首项为shell或push
+            
+        Returns:
+            命令执行结果
+            
+        Raises:
+            ADBException: 命令执行失败
+            AdbConnectionError: 无法连接ADB服务器
+        """
+        cmd_str = f"{device_id} {' '.join(command_args)}"
+        logger.info(f"执行命令(socket): {cmd_str}")
+        try:
+            with ADB_COMMAND_DURATION.time(engine="socket", command=command_args[0]):
+                return await self._dispatch_engine_command(device_id, command_args, cmd_str)
+        except (ADBException, AdbConnectionError):
+            raise
+        except Exception as e:
+            error_msg = str(e) or f"未知错误 (类型: {type(e).__name__})"
+            logger.error(f"执行命令时发生错误: {error_msg}, 命令: {cmd_str}")
+            raise ADBException(f"执行命令时出错: {error_msg}")
+    
+    async def _dispatch_engine_command(self, device_id: str, command_args: List[str], cmd_str: str) -> str:
+        """按命令类型调用套接字引擎的shell或push"""
+        if command_args[0] == 'shell':
+            returncode, output = await device_io_executor.run(
+                self.engine.shell, device_id, ' '.join(command_args[1:]), timeout=Settings.ADB_COMMAND_TIMEOUT
+            )
+            if returncode != 0:
+                error_output = output or f"命令执行失败，返回码: {returncode}"
+                logger.error(f"命令执行失败: {error_output}")
+                raise ADBException(f"命令执行失败: {error_output}")
+            return output.strip()
+        
+        if len(command_args) != 3:
+            raise ADBException(f"push命令参数错误: {cmd_str}")
+        size = await device_io_executor.run(self.engine.push, device_id, command_args[1], command_args[2])
+        return f"{command_args[1]}: 1 file pushed. {size} bytes"
+    
+    async def _run_command_async(self, cmd: List[str], on_line: Optional[Callable[[str], None]] = None) -> str:
         """
         异步执行命令的核心实现
         
+        子进程由asyncio直接管理，不占用线程池线程；超时或等待的任务被取消时子进程随之结束。
+        
         Args:
             cmd: 完整命令列表
+            on_line: 可选回调，每读到一行输出调用一次
             
         Returns:
             命令执行结果
@@ -200,25 +301,22 @@ class ADBInterface:
         logger.info(f"执行命令: {cmd_str}")
         
         try:
-            # 在异步环境中运行同步代码
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(None, lambda: subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=False,
-                timeout=30
-            ))
+            device_id = cmd[2] if cmd[1:2] == ['-s'] else None
+            args = cmd[3:] if device_id else cmd[1:]
+            with ADB_COMMAND_DURATION.time(engine="subprocess", command=args[0] if args else ""):
+                returncode, stdout, stderr = await self.processes.run(
+                    cmd, device_id=device_id, timeout=Settings.ADB_COMMAND_TIMEOUT, on_line=on_line
+                )
             
             # 检查命令执行结果
-            if result.returncode != 0:
-                error_output = result.stderr or result.stdout or f"命令执行失败，返回码: {result.returncode}"
+            if returncode != 0:
+                error_output = stderr or stdout or f"命令执行失败，返回码: {returncode}"
                 logger.error(f"命令执行失败: {error_output}")
                 raise ADBException(f"命令执行失败: {error_output}")
                 
-            return result.stdout.strip()
+            return stdout.strip()
             
-        except subprocess.TimeoutExpired:
+        except asyncio.TimeoutError:
             error_msg = f"命令执行超时: {cmd_str}"
             logger.error(error_msg)
             raise ADBException(error_msg)
@@ -248,6 +346,127 @@ class ADBInterface:
             logger.error(f"推送文件失败: {str(e)}")
             return False
     
+    async def push_directory_async(self, device_name: str, local_dir: Path, remote_dir: str,
+                                   on_result: Optional[Callable[[dict], None]] = None,
+                                   names: Optional[Set[str]] = None) -> dict:
+        """
+        批量推送目录下的所有文件
+        
+        套接字引擎下所有文件在同一个sync连接中传输；
+        子进程模式下先整体执行一次adb push目录，失败时逐个推送以获得每个文件的结果；
+        names只包含部分文件时直接逐个推送这些文件。
+        
+        Args:
+            device_name: 设备名称或别名
+            local_dir: 本地目录
+            remote_dir: 设备上的目标目录（需已存在）
+            on_result: 可选回调，每个文件完成后在事件循环中以结果字典调用
+            names: 只推送这些文件名，为None时推送目录下所有文件
+            
+        Returns:
+            dict: {
+                "files": [{"local_path", "remote_path", "success", "size", "error"}],
+                "success_count": 成功数量,
+                "total_bytes": 成功推送的字节数,
+                "elapsed": 耗时（秒）,
+                "throughput": 吞吐量（字节/秒）
+            }
+        """
+        device_id = self.get_device_id(device_name)
+        paths = sorted(local_dir.glob("*.*"))
+        files = [
+            (str(path), f"{remote_dir.rstrip('/')}/{path.name}")
+            for path in paths
+            if names is None or path.name in names
+        ]
+        loop = asyncio.get_event_loop()
+        started = time.monotonic()
+        
+        def notify(result: dict):
+            if on_result is not None:
+                loop.call_soon_threadsafe(on_result, result)
+        
+        results = None
+        if self.engine is not None:
+            try:
+                logger.info(f"批量推送(socket): {device_id} {local_dir} -> {remote_dir}, 共 {len(files)} 个文件")
+                results = await device_io_executor.run(self.engine.push_many, device_id, files, notify)
+            except AdbConnectionError as e:
+                logger.warning(f"无法连接ADB服务器，改用adb进程推送: {str(e)}")
+        
+        if results is None:
+            results = await self._push_directory_subprocess_async(
+                device_name, local_dir, remote_dir, files, on_result, whole_directory=len(files) == len(paths)
+            )
+        
+        elapsed = time.monotonic() - started
+        total_bytes = sum(r["size"] for r in results if r["success"])
+        report = {
+            "files": results,
+            "success_count": sum(1 for r in results if r["success"]),
+            "total_bytes": total_bytes,
+            "elapsed": elapsed,
+            "throughput": total_bytes / elapsed if elapsed > 0 else 0.0
+        }
+        ADB_PUSH_BYTES.inc(total_bytes, device=device_id)
+        if total_bytes:
+            ADB_PUSH_THROUGHPUT.observe(report["throughput"], device=device_id)
+        logger.info(
+            f"批量推送完成: {report['success_count']}/{len(results)} 个文件, "
+            f"{total_bytes / 1024 / 1024:.2f} MB, 耗时 {elapsed:.2f}s, "
+            f"吞吐 {report['throughput'] / 1024 / 1024:.2f} MB/s"
+        )
+        return report
+    
+    async def _push_directory_subprocess_async(self, device_name: str, local_dir: Path, remote_dir: str,
+                                               files: List[tuple],
+                                               on_result: Optional[Callable[[dict], None]],
+                                               whole_directory: bool = True) -> List[dict]:
+        """
+        子进程模式的目录推送：推送整个目录时先整体推送，失败时逐个推送；
+        只推送部分文件时直接逐个推送，不重复传输已推送的文件。
+        无法按数据块限速，推送前按字节数预留带宽。
+        """
+        if whole_directory:
+            results = await self._push_whole_directory_async(device_name, local_dir, remote_dir, files, on_result)
+            if results is not None:
+                return results
+        
+        results = []
+        for local_path, remote_path in files:
+            result = {"local_path": local_path, "remote_path": remote_path, "success": False, "size": 0, "error": None}
+            try:
+                await bandwidth_limiter.consume_async(Path(local_path).stat().st_size)
+                cmd = [self.adb_path, '-s', self.get_device_id(device_name), 'push', local_path, remote_path]
+                await self._run_command_async(cmd)
+                result["success"] = True
+                result["size"] = Path(local_path).stat().st_size
+            except ADBException as e:
+                result["error"] = str(e)
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+        return results
+    
+    async def _push_whole_directory_async(self, device_name: str, local_dir: Path, remote_dir: str,
+                                          files: List[tuple],
+                                          on_result: Optional[Callable[[dict], None]]) -> Optional[List[dict]]:
+        """一次adb push整个目录，失败时返回None"""
+        try:
+            await bandwidth_limiter.consume_async(sum(Path(local_path).stat().st_size for local_path, _ in files))
+            await self.execute_device_command_async(device_name, ['push', f"{local_dir}/.", remote_dir])
+        except ADBException as e:
+            logger.warning(f"整体推送目录失败，改为逐个推送: {str(e)}")
+            return None
+        results = []
+        for local_path, remote_path in files:
+            result = {"local_path": local_path, "remote_path": remote_path, "success": True,
+                      "size": Path(local_path).stat().st_size, "error": None}
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+        return results
+    
     async def create_remote_directory_async(self, device_name: str, remote_dir: str) -> bool:
         """
         在设备上创建目录
@@ -0,0 +1,335 @@
+"""
+ADB套接字引擎模块
+
+该模块直接通过ADB服务器的套接字协议与设备通信，替代每条命令启动一个adb客户端进程：
+1. shell命令通过每个设备的常驻shell会话执行（不支持时使用shell服务连接），并获取退出码
+2. 文件推送通过sync服务连接执行，支持一个连接内批量推送多个文件
+3. 每个设备维护一组可复用的sync连接
+
+主要功能：
+- 单条命令的开销从一次进程创建降为一次套接字往返
+- sync连接在多次推送间复用，连接异常时自动丢弃重建
+"""
+
+import os
+import stat
+import struct
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from adbutils import AdbClient, AdbConnection, AdbError
+from adbutils.errors import AdbConnectionError
+from core.adb_shell import PersistentShell, ShellUnsupported
+from core.config import Settings
+from core.transfer_scheduler import BandwidthLimiter
+
+logger = logging.getLogger(__name__)
+
+# sync协议单个DATA包的最大长度
+SYNC_DATA_MAX = 64 * 1024
+
+class SyncConnection:
+    """
+    已进入sync模式的设备连接
+
+    一个sync连接可以连续执行多次STAT/SEND请求，直到发送QUIT或连接关闭。
+    """
+
+    def __init__(self, conn: AdbConnection, serial: str, bandwidth: Optional[BandwidthLimiter] = None):
+        self.conn = conn
+        self.serial = serial
+        self.bandwidth = bandwidth
+        self.last_used = time.monotonic()
+
+    def _send_request(self, cmd: bytes, path: str) -> None:
+        """发送sync请求头：命令(4字节) + 路径长度(小端uint32) + 路径"""
+        data = path.encode("utf-8")
+        self.conn.conn.sendall(cmd + struct.pack("<I", len(data)) + data)
+
+    def _read_exact(self, n: int) -> bytes:
+        """读取指定长度的数据，连接提前关闭时抛出异常"""
+        data = b""
+        while len(data) < n:
+            chunk = self.conn.conn.recv(n - len(data))
+            if not chunk:
+                raise AdbError("sync连接已关闭")
+            data += chunk
+        return data
+
+    def stat(self, path: str) -> Tuple[int, int, int]:
+        """
+        查询远程文件信息
+
+        Args:
+            path: 远程路径
+
+        Returns:
+            tuple: (mode, size, mtime)，文件不存在时均为0
+        """
+        self._send_request(b"STAT", path)
+        if self._read_exact(4) != b"STAT":
+            raise AdbError(f"sync STAT响应异常: {path}")
+        return struct.unpack("<III", self._read_exact(12))
+
+    def send(self, local_path: str, remote_path: str, mode: int = 0o644) -> int:
+        """
+        推送单个文件
+
+        Args:
+            local_path: 本地文件路径
+            remote_path: 远程文件路径（完整文件名）
+            mode: 远程文件权限
+
+        Returns:
+            int: 推送的字节数
+
+        Raises:
+            AdbError: 设备返回失败
+        """
+        self._send_request(b"SEND", f"{remote_path},{stat.S_IFREG | mode}")
+        total = 0
+        with open(local_path, "rb") as f:
+            while True:
+                chunk = f.read(SYNC_DATA_MAX)
+                if not chunk:
+                    break
+                if self.bandwidth is not None:
+                    self.bandwidth.consume(len(chunk))
+                self.conn.conn.sendall(b"DATA" + struct.pack("<I", len(chunk)) + chunk)
+                total += len(chunk)
+        mtime = int(os.path.getmtime(local_path))
+        self.conn.conn.sendall(b"DONE" + struct.pack("<I", mtime))
+
+        status = self._read_exact(4)
+        length = struct.unpack("<I", self._read_exact(4))[0]
+        if status == b"OKAY":
+            return total
+        message = self._read_exact(length).decode("utf-8", errors="replace") if length else ""
+        raise AdbError(f"推送失败: {remote_path}, {message or status.decode(errors='replace')}")
+
+    def quit(self) -> None:
+        """结束sync会话并关闭连接"""
+        try:
+            self.conn.conn.sendall(b"QUIT" + struct.pack("<I", 0))
+        except OSError:
+            pass
+        finally:
+            self.conn.close()
+
+class SocketADBEngine:
+    """
+    基于ADB服务器套接字协议的命令引擎
+
+    shell命令优先在设备的常驻shell会话中执行，设备不支持时每次使用一个新的shell服务连接，
+    sync连接按设备缓存复用。所有方法均为阻塞调用，由调用方放入线程池执行。
+    """
+
+    def __init__(self, host: str = None, port: int = None, pool_size: int = 2, idle_timeout: float = 60.0,
+                 persistent_shell: bool = True, bandwidth: Optional[BandwidthLimiter] = None):
+        """
+        初始化引擎
+
+        Args:
+            host: ADB服务器地址，默认127.0.0.1
+            port: ADB服务器端口，默认5037
+            pool_size: 每个设备保留的空闲sync连接数
+            idle_timeout: 空闲sync连接的最长保留时间（秒）
+            persistent_shell: 是否使用常驻shell会话执行shell命令
+            bandwidth: 可选的带宽限速器，推送的每个数据块发送前按字节数限速
+        """
+        self.client = AdbClient(host=host, port=port)
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.persistent_shell = persistent_shell
+        self.bandwidth = bandwidth
+        self._pool: Dict[str, List[SyncConnection]] = {}
+        self._shells: Dict[str, PersistentShell] = {}
+        self._exec_unsupported: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def shell(self, serial: str, command: str, timeout: float = 30) -> Tuple[int, str]:
+        """
+        执行shell命令
+
+        Args:
+            serial: 设备序列号
+            command: shell命令
+            timeout: 超时时间（秒）
+
+        Returns:
+            tuple: (退出码, 输出)
+        """
+        session = self._shell_session(serial) if self.persistent_shell else None
+        if session is not None:
+            try:
+                return session.run(command, timeout)
+            except ShellUnsupported as e:
+                logger.warning(f"设备不支持常驻shell，改用shell服务连接: {serial}, 原因: {str(e)}")
+                with self._lock:
+                    self._exec_unsupported.add(serial)
+        result = self.client.device(serial).shell2(command, timeout=timeout, rstrip=True)
+        return result.returncode, result.output
+
+    def _shell_session(self, serial: str) -> Optional[PersistentShell]:
+        """获取设备的常驻shell会话，设备不支持常驻shell时返回None"""
+        with self._lock:
+            if serial in self._exec_unsupported:
+                return None
+            session = self._shells.get(serial)
+            if session is None:
+                session = self._shells[serial] = PersistentShell(
+                    self.client, serial, connect_timeout=Settings.ADB_COMMAND_TIMEOUT
+                )
+            return session
+
+    def drop_device(self, serial: str) -> None:
+        """
+        丢弃设备的常驻shell会话和缓存的sync连接（设备断开时调用）
+
+        Args:
+            serial: 设备序列号
+        """
+        with self._lock:
+            session = self._shells.pop(serial, None)
+            idle = self._pool.pop(serial, [])
+            self._exec_unsupported.discard(serial)
+        if session is not None:
+            session.close()
+        for sync_conn in idle:
+            sync_conn.quit()
+
+    def _open_sync(self, serial: str) -> SyncConnection:
+        """建立新的sync连接"""
+        conn = self.client.make_connection(timeout=Settings.ADB_COMMAND_TIMEOUT)
+        try:
+            conn.send_command(f"host:transport:{serial}")
+            conn.check_okay()
+            conn.send_command("sync:")
+            conn.check_okay()
+        except Exception:
+            conn.close()
+            raise
+        return SyncConnection(conn, serial, self.bandwidth)
+
+    def acquire_sync(self, serial: str) -> SyncConnection:
+        """
+        从连接池取出一个sync连接，没有可用连接时新建
+
+        Args:
+            serial: 设备序列号
+
+        Returns:
+            SyncConnection: sync连接
+        """
+        now = time.monotonic()
+        with self._lock:
+            idle = self._pool.get(serial, [])
+            while idle:
+                sync_conn = idle.pop()
+                if now - sync_conn.last_used <= self.idle_timeout:
+                    return sync_conn
+                sync_conn.quit()
+        return self._open_sync(serial)
+
+    def release_sync(self, sync_conn: SyncConnection, broken: bool = False) -> None:
+        """
+        归还sync连接，异常连接直接关闭
+
+        Args:
+            sync_conn: sync连接
+            broken: 连接是否已处于异常状态
+        """
+        if broken:
+            sync_conn.conn.close()
+            return
+        sync_conn.last_used = time.monotonic()
+        with self._lock:
+            idle = self._pool.setdefault(sync_conn.serial, [])
+            if len(idle) < self.pool_size:
+                idle.append(sync_conn)
+                return
+        sync_conn.quit()
+
+    def push(self, serial: str, local_path: str, remote_path: str) -> int:
+        """
+        推送文件到设备
+
+        与adb push一致，远程路径是已存在的目录时推送到该目录下的同名文件。
+
+        Args:
+            serial: 设备序列号
+            local_path: 本地文件路径
+            remote_path: 远程文件或目录路径
+
+        Returns:
+            int: 推送的字节数
+        """
+        sync_conn = self.acquire_sync(serial)
+        try:
+            mode, _, _ = sync_conn.stat(remote_path)
+            if stat.S_ISDIR(mode):
+                remote_path = f"{remote_path.rstrip('/')}/{os.path.basename(local_path)}"
+            size = sync_conn.send(local_path, remote_path)
+        except Exception:
+            self.release_sync(sync_conn, broken=True)
+            raise
+        self.release_sync(sync_conn)
+        return size
+
+    def push_many(self, serial: str, files: List[Tuple[str, str]],
+                  on_result: Optional[Callable[[dict], None]] = None) -> List[dict]:
+        """
+        在同一个sync连接上批量推送文件
+
+        单个文件失败后设备会关闭该sync连接，此时丢弃连接并为剩余文件重新建立连接。
+        尚无文件推送成功时无法连接ADB服务器，直接抛出AdbConnectionError，由调用方改用adb进程推送。
+
+        Args:
+            serial: 设备序列号
+            files: (本地文件路径, 远程文件路径) 列表
+            on_result: 可选回调，每个文件完成后以结果字典调用
+
+        Returns:
+            list: 每个文件的结果 {"local_path", "remote_path", "success", "size", "error"}
+
+        Raises:
+            AdbConnectionError: 尚无文件推送成功时无法连接ADB服务器
+        """
+        results = []
+        sync_conn = None
+        try:
+            for local_path, remote_path in files:
+                result = {"local_path": local_path, "remote_path": remote_path, "success": False, "size": 0, "error": None}
+                try:
+                    if sync_conn is None:
+                        sync_conn = self.acquire_sync(serial)
+                    result["size"] = sync_conn.send(local_path, remote_path)
+                    result["success"] = True
+                except AdbConnectionError:
+                    if not any(r["success"] for r in results):
+                        raise
+                    result["error"] = "无法连接ADB服务器"
+                except Exception as e:
+                    result["error"] = str(e) or type(e).__name__
+                    if sync_conn is not None:
+                        self.release_sync(sync_conn, broken=True)
+                        sync_conn = None
+                results.append(result)
+                if on_result is not None:
+                    on_result(result)
+        finally:
+            if sync_conn is not None:
+                self.release_sync(sync_conn)
+        return results
+
+    def close(self) -> None:
+        """关闭所有缓存的连接和常驻shell会话"""
+        with self._lock:
+            pool, self._pool = self._pool, {}
+            shells, self._shells = self._shells, {}
+        for idle in pool.values():
+            for sync_conn in idle:
+                sync_conn.quit()
+        for session in shells.values():
+            session.close()
@@ -0,0 +1,145 @@
+"""
+ADB异步子进程模块
+
+该模块基于asyncio.create_subprocess_exec执行adb命令，包括：
+1. 全局和按设备的并发限制
+2. 超时或任务取消时终止子进程（先terminate，宽限期后kill）
+3. 按行回调的标准输出流（分块读取，不受单行长度限制）
+
+主要功能：
+- 大量并发的设备命令不占用线程池线程
+- 取消等待中的任务时子进程随之结束，不会残留
+"""
+
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 64 * 1024  # 读取子进程输出的分块大小（字节）
+
+class AsyncProcessRunner:
+    """
+    异步子进程执行器
+
+    信号量在首次使用时创建，绑定到运行中的事件循环。
+    """
+
+    def __init__(self, max_concurrency: int, per_device: int, kill_grace: float):
+        """
+        初始化执行器
+
+        Args:
+            max_concurrency: 同时运行的子进程上限
+            per_device: 同一设备同时运行的子进程上限
+            kill_grace: terminate后等待进程退出的时间（秒），超时后kill
+        """
+        self.max_concurrency = max_concurrency
+        self.per_device = per_device
+        self.kill_grace = kill_grace
+        self._global: Optional[asyncio.Semaphore] = None
+        self._devices: Dict[str, asyncio.Semaphore] = {}
+        self.running = 0
+
+    def _device_semaphore(self, device_id: str) -> asyncio.Semaphore:
+        semaphore = self._devices.get(device_id)
+        if semaphore is None:
+            semaphore = self._devices[device_id] = asyncio.Semaphore(self.per_device)
+        return semaphore
+
+    async def _terminate(self, proc: asyncio.subprocess.Process) -> None:
+        """结束子进程：先terminate，宽限期内未退出则kill"""
+        if proc.returncode is not None:
+            return
+        try:
+            proc.terminate()
+            await asyncio.wait_for(proc.wait(), self.kill_grace)
+        except ProcessLookupError:
+            return
+        except asyncio.TimeoutError:
+            logger.warning(f"子进程未响应terminate，强制结束: pid={proc.pid}")
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                return
+            await proc.wait()
+
+    @staticmethod
+    async def _read_lines(stream: asyncio.StreamReader, on_line: Optional[Callable[[str], None]]) -> str:
+        """
+        逐行读取输出，每行调用回调，返回完整输出
+
+        按固定大小分块读取后自行拆分行，不使用readline，
+        超过StreamReader缓冲上限（64KiB）的长行不会引发异常
+        """
+        lines: List[str] = []
+        buffer = bytearray()
+        while True:
+            chunk = await stream.read(READ_CHUNK_SIZE)
+            if chunk:
+                buffer.extend(chunk)
+                end = buffer.rfind(b"\n") + 1
+                if not end:
+                    continue
+                complete = [line + b"\n" for line in buffer[:end - 1].split(b"\n")]
+                del buffer[:end]
+            else:
+                complete = [buffer] if buffer else []
+            for line in complete:
+                text = line.decode("utf-8", errors="replace")
+                lines.append(text)
+                if on_line is not None:
+                    on_line(text.rstrip("\r\n"))
+            if not chunk:
+                break
+        return "".join(lines)
+
+    async def run(self, cmd: List[str], device_id: Optional[str] = None, timeout: Optional[float] = None,
+                  on_line: Optional[Callable[[str], None]] = None) -> Tuple[int, str, str]:
+        """
+        执行命令并等待结束
+
+        Args:
+            cmd: 完整命令列表
+            device_id: 命令所属设备，用于按设备限制并发
+            timeout: 超时时间（秒），不包括排队等待的时间
+            on_line: 可选回调，每读到一行标准输出调用一次
+
+        Returns:
+            tuple: (返回码, 标准输出, 标准错误)
+
+        Raises:
+            asyncio.TimeoutError: 命令执行超时（子进程已结束）
+            asyncio.CancelledError: 任务被取消（子进程已结束）
+        """
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.max_concurrency)
+        device_semaphore = self._device_semaphore(device_id) if device_id else None
+
+        if device_semaphore is not None:
+            await device_semaphore.acquire()
+        try:
+            async with self._global:
+                proc = await asyncio.create_subprocess_exec(
+                    *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+                )
+                self.running += 1
+                try:
+                    stdout, stderr = await asyncio.wait_for(
+                        asyncio.gather(
+                            self._read_lines(proc.stdout, on_line),
+                            self._read_lines(proc.stderr, None)
+                        ),
+                        timeout
+                    )
+                    return await proc.wait(), stdout, stderr
+                except BaseException:
+                    # 超时或取消时结束子进程，不让它在后台继续运行
+                    await asyncio.shield(self._terminate(proc))
+                    raise
+                finally:
+                    self.running -= 1
+        finally:
+            if device_semaphore is not None:
+                device_semaphore.release()
@@ -0,0 +1,144 @@
+"""
+ADB常驻shell模块
+
+该模块为每个设备维护一个常驻的设备端sh进程，短shell命令通过它执行：
+1. 通过ADB服务器的exec:sh服务建立无终端的原始输入输出通道
+2. 每条命令后输出带随机标记的结束行，据此切分输出并取得退出码
+3. 会话断开时自动重建；设备不支持exec服务时由调用方回退到普通shell
+
+主要功能：
+- mkdir、媒体扫描广播等短命令不再需要每次建立shell服务连接
+- 同一设备的命令在会话内依次执行
+"""
+
+import logging
+import threading
+import uuid
+from typing import Optional, Tuple
+from adbutils import AdbClient, AdbConnection, AdbError
+
+logger = logging.getLogger(__name__)
+
+class ShellUnsupported(Exception):
+    """设备不支持exec:sh服务"""
+    pass
+
+class ShellClosed(Exception):
+    """会话在收到任何输出之前被关闭"""
+    pass
+
+class PersistentShell:
+    """
+    单个设备的常驻shell会话
+
+    命令在子shell中执行（不影响会话的工作目录和环境），标准输入重定向到/dev/null，
+    标准错误合并到标准输出。
+    """
+
+    def __init__(self, client: AdbClient, serial: str, connect_timeout: float):
+        """
+        初始化会话（不立即连接）
+
+        Args:
+            client: ADB客户端
+            serial: 设备序列号
+            connect_timeout: 建立连接的超时时间（秒）
+        """
+        self.client = client
+        self.serial = serial
+        self.connect_timeout = connect_timeout
+        self.spawned = 0
+        self._conn: Optional[AdbConnection] = None
+        self._buffer = b""
+        self._lock = threading.Lock()
+
+    def _spawn(self) -> None:
+        """建立exec:sh连接"""
+        conn = self.client.make_connection(timeout=self.connect_timeout)
+        try:
+            conn.send_command(f"host:transport:{self.serial}")
+            conn.check_okay()
+            conn.send_command("exec:sh")
+            try:
+                conn.check_okay()
+            except AdbError as e:
+                raise ShellUnsupported(str(e))
+        except BaseException:
+            conn.close()
+            raise
+        self._conn = conn
+        self._buffer = b""
+        self.spawned += 1
+        logger.info(f"已建立常驻shell会话: {self.serial} (第 {self.spawned} 次)")
+
+    def close(self) -> None:
+        """关闭会话，下次执行命令时重建"""
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            conn.close()
+
+    def _execute(self, command: str, timeout: float) -> Tuple[int, str]:
+        """在当前会话中执行一条命令"""
+        marker = f"__X4END_{uuid.uuid4().hex}__"
+        sock = self._conn.conn
+        sock.settimeout(timeout)
+        sock.sendall(f"( {command} ) </dev/null 2>&1; echo {marker} $?\n".encode())
+
+        end = (marker + " ").encode()
+        received = False
+        while True:
+            index = self._buffer.find(end)
+            if index >= 0:
+                newline = self._buffer.find(b"\n", index)
+                if newline >= 0:
+                    output = self._buffer[:index]
+                    returncode = int(self._buffer[index + len(end):newline])
+                    self._buffer = self._buffer[newline + 1:]
+                    return returncode, output.decode("utf-8", errors="replace").rstrip()
+            chunk = sock.recv(65536)
+            if not chunk:
+                if received:
+                    raise ConnectionError(f"常驻shell会话在命令执行中被关闭: {self.serial}")
+                raise ShellClosed(self.serial)
+            received = True
+            self._buffer += chunk
+
+    def run(self, command: str, timeout: float) -> Tuple[int, str]:
+        """
+        执行shell命令
+
+        复用的会话在收到任何输出前就被关闭时（设备端进程已退出），重建会话后重试一次；
+        超时或执行中断开时关闭会话并抛出异常，不重试。
+
+        Args:
+            command: shell命令
+            timeout: 超时时间（秒）
+
+        Returns:
+            tuple: (退出码, 输出)
+
+        Raises:
+            ShellUnsupported: 设备不支持exec:sh
+            socket.timeout: 命令执行超时
+        """
+        with self._lock:
+            reused = self._conn is not None
+            if not reused:
+                self._spawn()
+            try:
+                return self._execute(command, timeout)
+            except ShellClosed:
+                self.close()
+                if not reused:
+                    raise ConnectionError(f"常驻shell会话建立后立即被关闭: {self.serial}")
+                logger.info(f"常驻shell会话已断开，重建后重试: {self.serial}")
+            except (OSError, AdbError, ValueError):
+                self.close()
+                raise
+
+            self._spawn()
+            try:
+                return self._execute(command, timeout)
+            except (ShellClosed, OSError, AdbError, ValueError):
+                self.close()
+                raise
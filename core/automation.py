@@ -5,16 +5,31 @@
 - 自动发布内容
 - 屏幕解锁
 - 应用操作
+
+自动化操作均为阻塞调用，由设备执行器在独立线程中运行，
+超时或取消时通过cancel_event在下一个检查点停止。
 """
 
 import logging
 import os
-import time
-import uiautomator2 as u2
+import threading
+from datetime import datetime
 from core.config import Settings
+from core.tracing import PostTrace
+from core.ui_wait import UIWaiter
+from core.u2_sessions import u2_sessions
 
 logger = logging.getLogger(__name__)
 
+# 各界面元素的最长等待时间（秒）
+UNLOCK_TIMEOUT = 15  # 密码键盘或已解锁的界面
+FOLDER_WAIT_TIMEOUT = 5  # 每次滚动前等待文件夹出现
+NEXT_WAIT_TIMEOUT = 5
+
+class AutomationCancelled(Exception):
+    """自动化操作被取消或超时"""
+    pass
+
 class AndroidAutomation:
     def __init__(self, device_name: str):
         """
@@ -26,6 +41,9 @@ class AndroidAutomation:
         self.device_name = device_name
         self.device_id = Settings.DEVICE_MAPPING[device_name]
         self.d = None
+        self.cancel_event = threading.Event()
+        self.publish_clicked = False  # 是否已点击最终的发布按钮，点击后失败不能重试
+        self.trace = None  # 当前发布运行的步骤追踪
         
         # 从设备配置中获取详细设置
         device_config = Settings.DEVICE_CONFIG[device_name]
@@ -36,10 +54,28 @@ class AndroidAutomation:
         logger.info(f"初始化设备: {device_name} (ID: {self.device_id})")
         logger.debug(f"使用配置 - 应用包名: {self.app_package}, 等待超时: {self.wait_timeout}秒")
 
+    def _checkpoint(self):
+        """检查是否已被取消，已取消时抛出AutomationCancelled"""
+        if self.cancel_event.is_set():
+            raise AutomationCancelled(self.device_id)
+
+    def _sleep(self, seconds: float):
+        """可被取消的等待，计入步骤追踪的等待时间"""
+        if self.trace is not None:
+            self.trace.add_sleep(seconds)
+        if self.cancel_event.wait(seconds):
+            raise AutomationCancelled(self.device_id)
+
+    def _begin_step(self, name: str):
+        """结束当前步骤的计时并开始下一个步骤"""
+        if self.trace is not None:
+            self.trace.begin(name)
+
     def connect_device(self):
-        """连接设备"""
+        """连接设备，优先复用缓存中仍然可用的会话"""
         try:
-            self.d = u2.connect(self.device_id)
+            self._checkpoint()
+            self.d = u2_sessions.get(self.device_id)
             logger.info(f"成功连接设备: {self.device_id}")
             return True
         except Exception as e:
@@ -48,7 +84,7 @@ class AndroidAutomation:
 
     def post_content(self, title, content, image_paths):
         """
-        发布内容
+        发布内容，每个步骤的耗时记录在步骤追踪中
         
         Args:
             title: 发布内容的标题
@@ -58,6 +94,16 @@ class AndroidAutomation:
         Returns:
             tuple: (是否成功, 状态消息)
         """
+        self.trace = PostTrace(self.device_name)
+        status = "AUTOMATION_FAILED"
+        try:
+            success, status = self._post_content(title, content, image_paths)
+            return success, status
+        finally:
+            self.trace.finish(status)
+
+    def _post_content(self, title, content, image_paths):
+        """发布内容的具体步骤，返回 (是否成功, 状态消息)"""
         try:
             logger.info("开始发布内容")
             logger.debug(f"标题: {title if title else '[无标题]'}")
@@ -73,130 +119,147 @@ class AndroidAutomation:
             img_index = path_parts.index('imgs')
             time_str = path_parts[img_index - 1]
             logger.debug(f"解析到的时间文件夹: {time_str}")
+            self.trace.post_time = int(datetime.strptime(time_str, "%Y%m%d%H%M%S").timestamp())
+
+            ui = UIWaiter(
+                self.d, self._sleep,
+                poll_interval=Settings.AUTOMATION_CONFIG['POLL_INTERVAL'],
+                step=lambda: self.trace.current.step if self.trace.current else ""
+            )
+            ui.register_popups(Settings.AUTOMATION_CONFIG['POPUP_BUTTONS'])
+            app_id = f"{self.app_package}:id/-"
 
             # 解锁屏幕
+            self._begin_step("unlock")
+            self._checkpoint()
             self.d.screen_on()
             self.d.swipe(500, 2500, 500, 500, duration=1.0)
             
-            # 添加等待和重试机制
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    # 等待密码输入界面
-                    if self.d(resourceId="com.android.systemui:id/digit_text", text="0").exists(timeout=5):
-                        for digit in self.lock_password:
-                            self.d(resourceId="com.android.systemui:id/digit_text", text=str(digit)).click()
-                        break
-                except Exception as e:
-                    if attempt == max_retries - 1:
-                        raise Exception(f"密码输入失败: {str(e)}")
-                    time.sleep(1)
+            # 等待密码输入界面或已解锁的界面（出现系统界面以外的应用，如桌面），
+            # 出现密码键盘时所有数字键在同一份快照上解析后依次点击
+            digit_xpath = '//*[@resource-id="com.android.systemui:id/digit_text" and @text="{}"]'
+            state, _, screen = ui.wait_any({
+                "keypad": digit_xpath.format(0),
+                "unlocked": '//*[@package and @package!="com.android.systemui"]'
+            }, timeout=UNLOCK_TIMEOUT)
+            if state is None:
+                logger.warning("未等到密码键盘或已解锁的界面，继续启动应用")
+            elif state == "unlocked":
+                logger.debug("设备已解锁，跳过密码输入")
+            else:
+                for digit in self.lock_password:
+                    key = screen.find(digit_xpath.format(digit))
+                    if key is None:
+                        raise Exception(f"密码输入失败: 找不到数字键 {digit}")
+                    key.click()
 
             # 启动应用
+            self._begin_step("app_start")
+            self._checkpoint()
             self.d.app_start(self.app_package)
             self.d.wait_activity(self.app_package, timeout=self.wait_timeout)
             logger.debug("应用启动成功")
 
             # 点击发布按钮
-            self.d.xpath('//*[@content-desc="发布"]/android.widget.ImageView[1]').click()
+            self._begin_step("open_publish")
+            if not ui.click('//*[@content-desc="发布"]/android.widget.ImageView[1]', timeout=self.wait_timeout):
+                raise Exception("找不到发布按钮")
             logger.debug("点击发布按钮")
 
-            # 尝试多种方式点击"全部"按钮
-            try:
-                # 方式1：使用原有的xpath
-                all_photos = self.d.xpath('//*[@resource-id="android:id/content"]/android.widget.FrameLayout[1]/android.widget.FrameLayout[3]/android.widget.RelativeLayout[1]/android.widget.RelativeLayout[1]/android.widget.RelativeLayout[1]/android.widget.LinearLayout[1]')
-                if all_photos.exists:
-                    all_photos.click()
-                else:
-                    # 方式2：尝试使用文本定位
-                    self.d(text="全部").click()
-            except Exception as e:
-                logger.error(f"点击'全部'按钮失败: {str(e)}")
+            # 点击"全部"按钮：原有的xpath和文本定位，哪个先出现就点击哪个
+            self._begin_step("select_album")
+            _, all_photos, _ = ui.wait_any({
+                "xpath": '//*[@resource-id="android:id/content"]/android.widget.FrameLayout[1]/android.widget.FrameLayout[3]/android.widget.RelativeLayout[1]/android.widget.RelativeLayout[1]/android.widget.RelativeLayout[1]/android.widget.LinearLayout[1]',
+                "text": '//*[@text="全部"]'
+            }, timeout=self.wait_timeout)
+            if all_photos is None:
+                logger.error("点击'全部'按钮失败: 找不到按钮")
                 return False, "SELECT_ALBUM_FAILED"
-            
+            all_photos.click()
             logger.debug("点击'全部'按钮成功")
 
-            # 等待文件夹列表加载
-            time.sleep(1)
-
-            # 选择时间文件夹
+            # 选择时间文件夹，等待文件夹列表加载，找不到时滚动列表
+            self._begin_step("select_folder")
             logger.debug(f"准备选择文件夹: {time_str}")
-
-            # 添加重试机制选择文件夹
+            folder_xpath = f'//*[@resource-id="{app_id}" and @text="{time_str}"]'
+            max_retries = 3
             for attempt in range(max_retries):
-                try:
-                    target_element = self.d(resourceId=f"{self.app_package}:id/-", text=time_str)
-                    if target_element.exists(timeout=5):
-                        target_element.click()
-                        logger.debug(f"成功选择文件夹: {time_str}")
-                        break
-                    else:
-                        # 如果找不到，尝试滚动列表
-                        self.d.swipe(500, 1000, 500, 200)
-                        time.sleep(0.5)
-                except Exception as e:
-                    if attempt == max_retries - 1:
-                        logger.error(f"选择文件夹失败: {str(e)}")
-                        return False, "FOLDER_NOT_FOUND"
-                    time.sleep(1)
-
-            self.d.wait_activity('', timeout=self.wait_timeout)
-
-            # 选择图片
+                if ui.click(folder_xpath, timeout=FOLDER_WAIT_TIMEOUT):
+                    logger.debug(f"成功选择文件夹: {time_str}")
+                    break
+                self.d.swipe(500, 1000, 500, 200)
+            else:
+                logger.error(f"选择文件夹失败: {time_str}")
+                return False, "FOLDER_NOT_FOUND"
+
+            # 选择图片：等待第一张图片出现，之后在同一份快照上解析全部图片
+            self._begin_step("select_images")
             base_xpath = '//androidx.viewpager.widget.ViewPager/androidx.recyclerview.widget.RecyclerView[1]/android.widget.FrameLayout[1]/androidx.recyclerview.widget.RecyclerView[1]/android.widget.FrameLayout[{}]/android.widget.FrameLayout[1]/android.widget.RelativeLayout[1]/android.widget.FrameLayout[1]/android.widget.FrameLayout[1]/android.widget.ImageView[1]'
             
-            index = 1
-            while True:
-                xpath = base_xpath.format(index)
-                if self.d.xpath(xpath).exists:
-                    logger.debug(f"选择第 {index} 张图片")
-                    self.d.xpath(xpath).click()
-                    index += 1
-                else:
-                    logger.info(f"共选择 {index - 1} 张图片")
-                    break
+            selected = 0
+            _, _, screen = ui.wait_any({"first": base_xpath.format(1)}, timeout=self.wait_timeout)
+            if screen is not None:
+                while True:
+                    self._checkpoint()
+                    image = screen.find(base_xpath.format(selected + 1))
+                    if image is None:
+                        break
+                    logger.debug(f"选择第 {selected + 1} 张图片")
+                    image.click()
+                    selected += 1
+            logger.info(f"共选择 {selected} 张图片")
 
-            if index - 1 == 0:
+            if selected == 0:
                 logger.error("未能选择任何图片")
                 return False, "NO_IMAGES_SELECTED"
 
             self.d.click(0.741, 0.964)  # 点击确认按钮
 
             # 点击下一步
-            next_button = self.d(resourceId=f"{self.app_package}:id/-", text="下一步")
-            if not next_button.exists(timeout=5):
+            self._begin_step("next")
+            if not ui.click(f'//*[@resource-id="{app_id}" and @text="下一步"]', timeout=NEXT_WAIT_TIMEOUT):
                 logger.error("找不到下一步按钮")
                 return False, "NEXT_BUTTON_NOT_FOUND"
-
-            next_button.click()
             logger.debug("点击下一步")
 
-            # 根据是否有标题和正文来决定操作流程
+            # 根据是否有标题和正文来决定操作流程，发布前最后一次检查是否已取消
+            self._begin_step("publish")
+            self._checkpoint()
             if title or content:
                 logger.debug("检测到标题或正文内容，进行输入操作")
                 # 输入标题（如果有）
                 if title:
-                    self.d(resourceId=f"{self.app_package}:id/-", text="添加标题").click()
+                    if not ui.click(f'//*[@resource-id="{app_id}" and @text="添加标题"]', timeout=self.wait_timeout):
+                        raise Exception("找不到标题输入框")
                     self.d.send_keys(title)
                     logger.debug(f"输入标题: {title}")
 
                 # 输入正文（如果有）
                 if content:
-                    self.d.xpath(
-                        '//android.widget.ScrollView/android.widget.LinearLayout[1]/android.widget.FrameLayout[3]/android.widget.LinearLayout[1]/android.view.ViewGroup[1]/android.widget.LinearLayout[1]').click()
+                    if not ui.click('//android.widget.ScrollView/android.widget.LinearLayout[1]/android.widget.FrameLayout[3]/android.widget.LinearLayout[1]/android.view.ViewGroup[1]/android.widget.LinearLayout[1]', timeout=self.wait_timeout):
+                        raise Exception("找不到正文输入框")
                     self.d.send_keys(content)
                     logger.debug("输入正文完成")
 
-                # 点击发布按钮
-                self.d(resourceId=f"{self.app_package}:id/-", text="发布").click()
+                publish_xpath = f'//*[@resource-id="{app_id}" and @text="发布"]'
             else:
                 logger.debug("无标题和正文内容，直接发布")
-                # 直接点击发布笔记按钮
-                self.d(resourceId=f"{self.app_package}:id/-", text="发布笔记").click()
+                publish_xpath = f'//*[@resource-id="{app_id}" and @text="发布笔记"]'
+
+            # 点击发布按钮
+            publish_button = ui.wait(publish_xpath, timeout=self.wait_timeout)
+            if publish_button is None:
+                raise Exception("找不到最终发布按钮")
+            self._checkpoint()
+            self.publish_clicked = True
+            publish_button.click()
 
-            logger.info("发布操作完成")
+            logger.info(f"发布操作完成，共获取 {ui.dumps} 次界面层级")
             return True, "SUCCESS"
 
+        except AutomationCancelled:
+            logger.warning(f"发布操作已取消: {self.device_id}")
+            return False, "CANCELLED"
         except Exception as e:
             logger.error(f"发布内容失败: {str(e)}")
-            return False, "AUTOMATION_FAILED" 
\ No newline at end of file
+            return False, "AUTOMATION_FAILED"
@@ -3,7 +3,7 @@
 
 该模块定义了应用程序的核心配置参数，包括：
 1. 项目路径配置
-2. 上传目录设置
+2. 上传目录和数据目录设置
 3. 时区设置
 4. 设备映射配置
 """
@@ -16,6 +16,8 @@ import os
 PROJECT_DIR = Path(__file__).parent.parent
 UPLOAD_DIR = PROJECT_DIR / "uploads"
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+DATA_DIR = PROJECT_DIR / "data"  # 任务队列等本地持久化数据
+DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 class Settings:
     """
@@ -26,16 +28,68 @@ class Settings:
         TIMEZONE (timezone): 应用程序时区（上海，UTC+8）
         SCHEDULER_TIMEZONE (timezone): 调度器时区设置
         MAX_FILE_SIZE (int): 最大文件大小限制（100MB）
+        UPLOAD_SAVE_CONCURRENCY (int): 单个请求内并发保存文件数
+        EXECUTOR_DISK_WORKERS (int): 文件操作线程数
+        EXECUTOR_DEVICE_WORKERS (int): 设备通信线程数
+        EXECUTOR_CPU_WORKERS (int): 哈希计算等CPU密集操作线程数
     """
     DEBUG = True
     TIMEZONE = timezone(timedelta(hours=8))  # 上海时区
     SCHEDULER_TIMEZONE = timezone(timedelta(hours=8))  # 调度器使用上海时区
     MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
 
+    # 上传文件保存配置
+    UPLOAD_SAVE_CONCURRENCY = 8  # 单个请求内同时写盘的文件数上限
+
+    # 按子系统划分的线程池大小
+    EXECUTOR_DISK_WORKERS = 8  # 上传写盘、去重存储等文件操作
+    EXECUTOR_DEVICE_WORKERS = 32  # ADB套接字引擎调用，单条命令可能阻塞到超时
+    EXECUTOR_CPU_WORKERS = min(8, os.cpu_count() or 1)  # 哈希计算，sha256在大缓冲区上会释放GIL
+
+    # 断点续传配置
+    UPLOAD_CHUNK_MAX_SIZE = 16 * 1024 * 1024  # 单个分块最大16MB
+    UPLOAD_SESSION_TTL = 24 * 3600  # 未完成的上传会话保留时间（秒）
+
+    # 设备任务队列配置
+    JOB_QUEUE_DB = DATA_DIR / "jobs.db"  # 任务持久化数据库
+    JOB_QUEUE_WORKERS = 16  # 并发处理设备任务的工作协程数，推送并发由传输调度限制
+    JOB_RETENTION_DAYS = 7  # 已结束任务的保留天数
+    SCHEDULER_DB = DATA_DIR / "scheduler.db"  # 定时任务持久化数据库
+    SCHEDULE_DUPLICATE_POLICY = "skip"  # 同一设备同一时间戳重复提交时：skip保留已有任务，replace替换
+    POST_MIN_INTERVAL_DEVICE = 180  # 同一台手机上两次发布的最小间隔（秒）
+    POST_MIN_INTERVAL_ACCOUNT = 600  # 同一账号（设备名）两次发布的最小间隔（秒）
+
+    # 步骤重试策略：最多尝试次数、首次重试等待、等待上限（秒）
+    RETRY_POLICIES = {
+        "push": {"max_attempts": 4, "base_delay": 1, "max_delay": 15},
+        "publish": {"max_attempts": 3, "base_delay": 60, "max_delay": 600}
+    }
+
     # ADB配置
     ADB_PATH = "adb"  # 如果 adb 在系统 PATH 中
     # 或者使用绝对路径
     # ADB_PATH = r"E:\Program Files (x86)\adb\adb.exe"  # Windows 示例
+    ADB_COMMAND_TIMEOUT = 30  # 单条ADB命令超时时间（秒）
+    # 命令引擎: "socket" 直接通过ADB服务器套接字协议通信；"subprocess" 每条命令启动adb进程
+    ADB_ENGINE = "socket"
+    ADB_SYNC_POOL_SIZE = 2  # 每个设备缓存的空闲sync连接数
+    ADB_PERSISTENT_SHELL = True  # 套接字引擎的shell命令在每个设备的常驻sh会话中执行
+    # 图片推送模式: "incremental" 跳过设备上已有相同内容的文件；"full" 每次推送全部文件
+    DEVICE_SYNC_MODE = "incremental"
+    POST_MANIFEST_NAME = "manifest.json"  # 每次上传目录下记录图片sha256和大小的清单文件
+    ADB_PROCESS_MAX_CONCURRENCY = 64  # 同时运行的adb子进程上限
+    ADB_PROCESS_PER_DEVICE = 4  # 同一设备同时运行的adb子进程上限
+    ADB_PROCESS_KILL_GRACE = 2  # 结束adb子进程时terminate后等待的时间（秒），超时后kill
+    DEVICE_POLL_INTERVAL = 5  # track-devices不可用时轮询设备列表的间隔（秒）
+    DEVICE_PRESENCE_TTL = 10  # 轮询结果的有效期（秒），过期后回退为实时查询
+    DEVICE_MAX_CONCURRENCY = 16  # 同时执行工作的物理设备数上限
+
+    # 图片传输调度配置
+    TRANSFER_MAX_CONCURRENCY = 8  # 同时向设备推送图片的传输数上限
+    TRANSFER_PER_HUB = 4  # 同一集线器（DEVICE_CONFIG中的hub）上同时进行的传输数上限
+    TRANSFER_BANDWIDTH_LIMIT = 64 * 1024 * 1024  # 所有传输共享的总带宽（字节/秒），0为不限速
+    TRANSFER_BANDWIDTH_BURST = 4 * 1024 * 1024  # 带宽空闲后允许的突发字节数
+    U2_SESSION_IDLE_TIMEOUT = 1800  # uiautomator2会话最长空闲时间（秒），超过后重新连接
 
     # 设备映射配置
     # 设备映射配置
@@ -77,5 +131,8 @@ class Settings:
     # 基础自动化配置（默认值）
     AUTOMATION_CONFIG = {
         'APP_PACKAGE': 'com.xingin.xhs',
-        'WAIT_TIMEOUT': 10
+        'WAIT_TIMEOUT': 10,
+        'POLL_INTERVAL': 0.2,  # 等待界面元素时的轮询间隔（秒）
+        'POPUP_BUTTONS': ["我知道了", "以后再说", "暂不更新", "允许"],  # 出现时自动点击的弹窗按钮文字
+        'POST_TIMEOUT': 600  # 单次发布操作的超时时间（秒）
     } 
\ No newline at end of file
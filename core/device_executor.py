@@ -0,0 +1,95 @@
+"""
+设备执行器模块
+
+该模块为阻塞的设备自动化操作提供专用线程池：
+1. 每台物理设备（按序列号区分）一个单线程执行器，同一设备上的操作顺序执行
+2. 不同设备的操作在各自线程中并行执行
+3. 超时或取消时通知正在执行的操作尽快停止
+
+主要功能：
+- uiautomator2的sleep、等待和HTTP调用不再阻塞事件循环
+- 超时和取消结果返回给调用的任务
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class DeviceExecutor:
+    """
+    按设备序列号划分的执行器集合
+
+    被提交的函数在线程中执行，线程无法被强制终止，
+    因此超时或取消时通过cancel_event通知函数在下一个检查点退出，
+    并等待函数真正结束后才把超时或取消抛给调用方。调用方持有的设备槽位
+    因此在线程仍在操作设备时不会被释放，同一手机上的其他别名任务不会与其交错执行。
+    """
+
+    def __init__(self):
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._lock = threading.Lock()
+
+    def _executor(self, serial: str) -> ThreadPoolExecutor:
+        """获取设备的执行器，不存在时创建"""
+        with self._lock:
+            if serial not in self._executors:
+                self._executors[serial] = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix=f"device-{serial}"
+                )
+            return self._executors[serial]
+
+    async def run(self, serial: str, func: Callable[..., Any], *args,
+                  timeout: Optional[float] = None,
+                  cancel_event: Optional[threading.Event] = None) -> Any:
+        """
+        在设备执行器中运行阻塞函数
+
+        Args:
+            serial: 设备序列号
+            func: 要执行的阻塞函数
+            *args: 函数参数
+            timeout: 超时时间（秒），为None时不限制
+            cancel_event: 超时或取消时设置的事件，供函数检查是否应停止
+
+        Returns:
+            Any: 函数返回值
+
+        Raises:
+            asyncio.TimeoutError: 执行超时（函数已结束）
+            asyncio.CancelledError: 调用方任务被取消（函数已结束）
+        """
+        concurrent_future = self._executor(serial).submit(func, *args)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(concurrent_future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            if cancel_event is not None:
+                cancel_event.set()
+            logger.warning(f"设备 {serial} 上的操作超时或被取消，已通知停止，等待其退出")
+            await self._wait_finished(concurrent_future)
+            raise
+
+    @staticmethod
+    async def _wait_finished(concurrent_future: Future) -> None:
+        """等待线程中的函数结束，期间再次被取消也继续等待，函数的结果和异常被忽略"""
+        waiter = asyncio.wrap_future(concurrent_future)
+        while not waiter.done():
+            try:
+                await asyncio.shield(waiter)
+            except asyncio.CancelledError:
+                continue
+            except Exception:
+                break
+
+    def shutdown(self) -> None:
+        """关闭所有执行器，未开始的操作被丢弃"""
+        with self._lock:
+            executors, self._executors = self._executors, {}
+        for executor in executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+# 创建全局执行器实例
+device_executor = DeviceExecutor()
@@ -0,0 +1,187 @@
+"""
+设备注册表模块
+
+该模块在内存中维护设备在线状态，供设备连接检查直接查询：
+1. 通过ADB服务器的track-devices长连接实时接收设备变化
+2. 长连接不可用时退化为定时轮询，并以TTL判断数据是否可信
+3. 设备上线、下线时触发事件回调
+
+主要功能：
+- 设备在线检查变为O(1)的内存查询，不再每次启动adb进程
+- 提供设备连接/断开事件钩子
+"""
+
+import asyncio
+import inspect
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set
+from adbutils import AdbClient, AdbConnection
+from core.config import Settings
+
+logger = logging.getLogger(__name__)
+
+# 设备状态变化回调：callback(设备ID, 是否在线, 状态)，可以是普通函数或协程函数
+DeviceListener = Callable[[str, bool, str], None]
+
+ONLINE_STATUS = "device"
+
+class DeviceRegistry:
+    """
+    设备注册表
+
+    状态由后台线程写入，读取方通过is_connected等方法直接查询内存。
+    """
+
+    def __init__(self, poll: Callable[[], Set[str]], host: str = None, port: int = None):
+        """
+        初始化注册表
+
+        Args:
+            poll: track-devices不可用时的轮询函数，返回在线设备ID集合
+            host: ADB服务器地址
+            port: ADB服务器端口
+        """
+        self.client = AdbClient(host=host, port=port)
+        self._poll = poll
+        self._states: Dict[str, str] = {}
+        self._listeners: List[DeviceListener] = []
+        self._lock = threading.Lock()
+        self._tracking = False
+        self._last_refresh = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._conn: Optional[AdbConnection] = None
+
+    def add_listener(self, listener: DeviceListener) -> None:
+        """
+        注册设备状态变化回调
+
+        Args:
+            listener: 回调函数，参数为(设备ID, 是否在线, 状态)
+        """
+        self._listeners.append(listener)
+
+    def is_fresh(self) -> bool:
+        """注册表数据是否可信：track-devices连接正常，或最近一次刷新未超过TTL"""
+        return self._tracking or time.monotonic() - self._last_refresh <= Settings.DEVICE_PRESENCE_TTL
+
+    def is_connected(self, device_id: str) -> bool:
+        """
+        查询设备是否在线
+
+        Args:
+            device_id: 设备ID
+
+        Returns:
+            bool: 设备是否处于device状态
+        """
+        return self._states.get(device_id) == ONLINE_STATUS
+
+    def connected_devices(self) -> Set[str]:
+        """获取所有在线设备ID"""
+        with self._lock:
+            return {serial for serial, status in self._states.items() if status == ONLINE_STATUS}
+
+    def snapshot(self) -> Dict[str, str]:
+        """获取所有已知设备的状态"""
+        with self._lock:
+            return dict(self._states)
+
+    def replace_all(self, states: Dict[str, str]) -> None:
+        """
+        用一次完整的设备列表替换当前状态，并对差异触发回调
+
+        Args:
+            states: 设备ID到状态的映射
+        """
+        with self._lock:
+            previous, self._states = self._states, dict(states)
+            self._last_refresh = time.monotonic()
+        for serial in previous.keys() | states.keys():
+            old, new = previous.get(serial), states.get(serial)
+            if old != new:
+                self._notify(serial, new or "absent")
+
+    def _notify(self, serial: str, status: str) -> None:
+        """记录状态变化并在事件循环中调度回调"""
+        connected = status == ONLINE_STATUS
+        logger.info(f"设备状态变化: {serial} -> {status}")
+        if self._loop is None or self._loop.is_closed():
+            return
+        for listener in self._listeners:
+            self._loop.call_soon_threadsafe(self._dispatch, listener, serial, connected, status)
+
+    def _dispatch(self, listener: DeviceListener, serial: str, connected: bool, status: str) -> None:
+        """在事件循环线程中执行回调"""
+        try:
+            result = listener(serial, connected, status)
+            if inspect.isawaitable(result):
+                asyncio.ensure_future(result)
+        except Exception as e:
+            logger.error(f"设备状态回调执行失败: {str(e)}", exc_info=True)
+
+    @staticmethod
+    def _parse(output: str) -> Dict[str, str]:
+        """解析track-devices返回的设备列表"""
+        states = {}
+        for line in output.splitlines():
+            fields = line.strip().split("\t", maxsplit=1)
+            if len(fields) == 2:
+                states[fields[0]] = fields[1]
+        return states
+
+    def _track(self) -> None:
+        """保持track-devices长连接，每次收到完整设备列表后更新状态"""
+        conn = self.client.make_connection()
+        self._conn = conn
+        try:
+            conn.send_command("host:track-devices")
+            conn.check_okay()
+            self._tracking = True
+            logger.info("已建立track-devices连接")
+            while not self._stop.is_set():
+                self.replace_all(self._parse(conn.read_string_block()))
+        finally:
+            self._tracking = False
+            self._conn = None
+            conn.close()
+
+    def _run(self) -> None:
+        """后台线程：优先使用track-devices，失败时轮询并稍后重连"""
+        while not self._stop.is_set():
+            try:
+                self._track()
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                logger.warning(f"track-devices连接不可用，改为轮询: {str(e)}")
+                try:
+                    self.replace_all({serial: ONLINE_STATUS for serial in self._poll()})
+                except Exception as poll_error:
+                    logger.error(f"轮询设备列表失败: {str(poll_error)}")
+                self._stop.wait(Settings.DEVICE_POLL_INTERVAL)
+
+    def start(self) -> None:
+        """在当前事件循环中启动后台跟踪线程"""
+        if self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="adb-track-devices", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止后台跟踪线程"""
+        self._stop.set()
+        conn = self._conn
+        if conn is not None:
+            try:
+                conn.close()  # 关闭连接以唤醒阻塞中的读取
+            except Exception:
+                pass  # 后台线程可能已同时关闭该连接
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
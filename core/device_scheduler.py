@@ -0,0 +1,125 @@
+"""
+物理设备工作调度模块
+
+多个逻辑设备名可能映射到同一台手机（如deviceA和deviceA_sys2），
+该模块按设备序列号对设备工作进行排队：
+1. 同一物理设备上的推送、媒体扫描和自动化操作按到达顺序逐个执行
+2. 不同物理设备并行执行，总并发数受全局上限限制
+3. 记录每台设备的排队深度和等待时间
+
+主要功能：
+- 避免同一手机上的多个别名任务互相干扰
+- 提供按设备序列号的队列统计
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from core.config import Settings
+
+logger = logging.getLogger(__name__)
+
+class DeviceQueueStats:
+    """单台物理设备的队列统计"""
+
+    def __init__(self):
+        self.waiting = 0
+        self.running: Optional[str] = None
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.last_wait = 0.0
+
+    def to_dict(self) -> Dict:
+        """转换为接口返回的字典"""
+        return {
+            "waiting": self.waiting,
+            "running": self.running,
+            "completed": self.completed,
+            "avg_wait_seconds": round(self.total_wait / self.completed, 3) if self.completed else 0.0,
+            "max_wait_seconds": round(self.max_wait, 3),
+            "last_wait_seconds": round(self.last_wait, 3)
+        }
+
+class DeviceWorkScheduler:
+    """
+    按设备序列号排队的工作调度器
+
+    asyncio.Lock按等待顺序唤醒，因此同一设备上的工作先到先执行。
+    先获取设备锁再占用全局并发名额，排队中的工作不会占用其他设备的名额。
+    """
+
+    def __init__(self, max_concurrency: int):
+        """
+        初始化调度器
+
+        Args:
+            max_concurrency: 同时执行工作的物理设备数上限
+        """
+        self.max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._stats: Dict[str, DeviceQueueStats] = {}
+
+    @staticmethod
+    def resolve_serial(device_name: str) -> str:
+        """把逻辑设备名解析为设备序列号"""
+        return Settings.DEVICE_MAPPING.get(device_name, device_name)
+
+    @asynccontextmanager
+    async def slot(self, device_name: str, label: str) -> AsyncIterator[None]:
+        """
+        占用物理设备的执行槽位，退出上下文时释放
+
+        同一设备上的工作不能嵌套获取槽位，只在任务的最外层调用。
+
+        Args:
+            device_name: 逻辑设备名或设备序列号
+            label: 工作描述，用于日志和统计
+        """
+        serial = self.resolve_serial(device_name)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        lock = self._locks.setdefault(serial, asyncio.Lock())
+        stats = self._stats.setdefault(serial, DeviceQueueStats())
+
+        queued_at = time.monotonic()
+        stats.waiting += 1
+        if lock.locked():
+            logger.info(f"设备 {serial} 正在执行 {stats.running}，{label} 进入排队，前面还有 {stats.waiting - 1} 个")
+        try:
+            await lock.acquire()
+            try:
+                await self._semaphore.acquire()
+            except BaseException:
+                lock.release()
+                raise
+        finally:
+            stats.waiting -= 1
+
+        wait = time.monotonic() - queued_at
+        stats.running = label
+        stats.last_wait = wait
+        stats.max_wait = max(stats.max_wait, wait)
+        try:
+            yield
+        finally:
+            stats.running = None
+            stats.completed += 1
+            stats.total_wait += wait
+            self._semaphore.release()
+            lock.release()
+
+    def stats(self) -> Dict[str, Dict]:
+        """
+        获取所有物理设备的队列统计
+
+        Returns:
+            dict: 设备序列号到统计数据的映射
+        """
+        return {serial: stats.to_dict() for serial, stats in self._stats.items()}
+
+# 创建全局调度器实例
+device_scheduler = DeviceWorkScheduler(Settings.DEVICE_MAX_CONCURRENCY)
@@ -0,0 +1,329 @@
+"""
+设备增量同步模块
+
+该模块在推送图片前比较本地和设备上的文件，只推送缺失或内容不同的文件：
+1. 本地sha256和大小取自上传时写入的清单文件，缺失时在线程池中计算
+2. 设备上的文件大小和修改时间通过一条find命令批量获取，获取失败时抛出异常而不是当作空目录
+3. 同名同大小的文件先查远程文件索引（记录推送过的文件内容），无记录时用一条sha256sum命令批量校验
+4. 目标目录中没有的文件按sha256在远程文件索引中查找设备上其他位置的相同内容，
+   找到且大小、修改时间未变时在设备上直接复制，不经过USB传输
+
+主要功能：
+- 任务重试时跳过已推送的文件
+- 同一手机上的多个别名发布相同图片时，在设备上复制已有文件
+- 推送或复制成功的文件记录到远程文件索引，后续比较无需在设备上计算sha256
+"""
+
+import hashlib
+import json
+import logging
+import re
+import shlex
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from core.adb import adb, ADBException
+from core.config import Settings
+from core.executors import cpu_executor, disk_executor
+from core.sqlite_db import shared_database
+
+logger = logging.getLogger(__name__)
+
+# sha256sum的输出行：摘要、两个空格、文件名
+SHA256SUM_LINE = re.compile(r"^([0-9a-f]{64})\s+\*?(.+)$")
+
+# 目录列表命令成功结束时输出的标记，用于区分空目录和命令失败
+LISTING_DONE = "__listing_done__"
+
+class LocalFile:
+    """本地文件的内容信息"""
+
+    def __init__(self, sha256: str, size: int, mtime: int):
+        self.sha256 = sha256
+        self.size = size
+        self.mtime = mtime  # 推送时设备上的文件修改时间与本地一致
+
+class RemoteFileIndex:
+    """
+    远程文件索引
+
+    记录推送到设备上的文件的大小、修改时间和sha256，
+    设备上的文件大小和修改时间与记录一致时认为内容未变。
+    按 (序列号, sha256) 建有索引，可查找设备上任意位置的相同内容。
+    记录超过JOB_RETENTION_DAYS后由启动时的清理删除。
+    """
+
+    def __init__(self, db_path: Path):
+        """
+        初始化索引
+
+        Args:
+            db_path: 数据库文件路径
+        """
+        database = shared_database(db_path)
+        self._lock = database.lock
+        self._conn = database.conn
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS remote_files (
+                    serial TEXT NOT NULL,
+                    remote_path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    recorded_at REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (serial, remote_path)
+                )
+            """)
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(remote_files)")}
+            if "recorded_at" not in columns:
+                self._conn.execute("ALTER TABLE remote_files ADD COLUMN recorded_at REAL NOT NULL DEFAULT 0")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_remote_files_sha256 ON remote_files (serial, sha256)")
+
+    def get(self, serial: str, remote_path: str) -> Optional[Tuple[int, int, str]]:
+        """获取记录的 (大小, 修改时间, sha256)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime, sha256 FROM remote_files WHERE serial = ? AND remote_path = ?",
+                (serial, remote_path)
+            ).fetchone()
+        return (row["size"], row["mtime"], row["sha256"]) if row else None
+
+    def find(self, serial: str, sha256: str) -> List[Tuple[str, int, int]]:
+        """按内容查找设备上的文件，返回 (远程路径, 大小, 修改时间) 列表，最近记录的在前"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT remote_path, size, mtime FROM remote_files WHERE serial = ? AND sha256 = ? "
+                "ORDER BY recorded_at DESC",
+                (serial, sha256)
+            ).fetchall()
+        return [(row["remote_path"], row["size"], row["mtime"]) for row in rows]
+
+    def record(self, serial: str, remote_path: str, size: int, mtime: int, sha256: str) -> None:
+        """记录设备上文件的内容信息"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO remote_files (serial, remote_path, size, mtime, sha256, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (serial, remote_path, size, mtime, sha256, time.time())
+            )
+
+    def forget(self, serial: str, remote_path: str) -> None:
+        """删除已失效的记录（设备上的文件已被删除或修改）"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM remote_files WHERE serial = ? AND remote_path = ?", (serial, remote_path)
+            )
+
+    def purge(self, before: float) -> None:
+        """清理指定时间之前的记录"""
+        with self._lock:
+            self._conn.execute("DELETE FROM remote_files WHERE recorded_at < ?", (before,))
+
+# 创建全局远程文件索引实例
+remote_index = RemoteFileIndex(Settings.JOB_QUEUE_DB)
+
+def _remote_path(remote_dir: str, name: str) -> str:
+    return f"{remote_dir.rstrip('/')}/{name}"
+
+def _load_local_files(local_dir: Path, names: Iterable[str]) -> Dict[str, LocalFile]:
+    """读取清单中的sha256和大小，补充修改时间；不在清单中或大小不符的文件返回sha256为空"""
+    try:
+        manifest = json.loads((local_dir.parent / Settings.POST_MANIFEST_NAME).read_text(encoding="utf-8"))
+        entries = manifest.get("files", {})
+    except (OSError, ValueError):
+        entries = {}
+    files = {}
+    for name in names:
+        stat = (local_dir / name).stat()
+        entry = entries.get(name)
+        sha256 = entry["sha256"] if entry and entry.get("size") == stat.st_size else ""
+        files[name] = LocalFile(sha256, stat.st_size, int(stat.st_mtime))
+    return files
+
+def _sha256_file(path: Path, block_size: int = 1024 * 1024) -> str:
+    """分块计算文件的sha256摘要"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _parse_stat(output: str) -> Dict[str, Tuple[int, int]]:
+    """解析stat -c '%s %Y %n'的输出，返回 {名称: (大小, 修改时间)}"""
+    listing = {}
+    for line in output.splitlines():
+        parts = line.split(" ", 2)
+        if len(parts) == 3 and parts[0].isdigit() and parts[1].isdigit():
+            listing[parts[2]] = (int(parts[0]), int(parts[1]))
+    return listing
+
+async def _remote_listing(device_name: str, remote_dir: str) -> Dict[str, Tuple[int, int]]:
+    """
+    一条find命令获取目录下所有文件的 (大小, 修改时间)
+
+    由find分批调用stat，文件数量不受命令行长度限制；目录不存在时返回空字典。
+
+    Raises:
+        ADBException: 命令没有正常结束
+    """
+    quoted = shlex.quote(remote_dir)
+    output = await adb.execute_device_command_async(device_name, [
+        "shell",
+        f"if [ -d {quoted} ]; then cd {quoted} && find . -maxdepth 1 -type f -exec stat -c '%s %Y %n' {{}} + "
+        f"&& echo {LISTING_DONE}; else echo {LISTING_DONE}; fi"
+    ])
+    if not output.rstrip().endswith(LISTING_DONE):
+        raise ADBException(f"获取设备目录文件列表失败: {remote_dir}, 输出: {output.strip()[-200:]}")
+    return {name[2:] if name.startswith("./") else name: stat
+            for name, stat in _parse_stat(output).items()}
+
+async def _remote_stat(device_name: str, paths: Iterable[str]) -> Dict[str, Tuple[int, int]]:
+    """一条stat命令获取多个完整路径的 (大小, 修改时间)，不存在的路径不在结果中"""
+    quoted = " ".join(shlex.quote(path) for path in paths)
+    output = await adb.execute_device_command_async(device_name, [
+        "shell", f"stat -c '%s %Y %n' -- {quoted} 2>/dev/null; true"
+    ])
+    return _parse_stat(output)
+
+async def _remote_sha256(device_name: str, remote_dir: str, names: Iterable[str]) -> Dict[str, str]:
+    """一条sha256sum命令计算设备上多个文件的摘要，命令不可用时返回空字典"""
+    quoted = " ".join(shlex.quote(name) for name in names)
+    output = await adb.execute_device_command_async(device_name, [
+        "shell", f"cd {shlex.quote(remote_dir)} && sha256sum -- {quoted} 2>/dev/null; true"
+    ])
+    digests = {}
+    for line in output.splitlines():
+        match = SHA256SUM_LINE.match(line.strip())
+        if match:
+            digests[match.group(2)] = match.group(1)
+    return digests
+
+class SyncPlan:
+    """一次推送的同步计划"""
+
+    def __init__(self, serial: str, remote_dir: str, local_files: Dict[str, LocalFile]):
+        self.serial = serial
+        self.remote_dir = remote_dir
+        self.local_files = local_files
+        self.to_push: Set[str] = set()
+        self.unchanged: Set[str] = set()
+        self.copies: Dict[str, Tuple[str, int]] = {}  # 文件名 -> (设备上相同内容的路径, 修改时间)
+
+    def record_pushed(self, name: str) -> None:
+        """
+        记录推送成功的文件，后续比较无需在设备上计算sha256
+
+        Args:
+            name: 文件名
+        """
+        local = self.local_files.get(name)
+        if local is not None and local.sha256:
+            remote_index.record(self.serial, _remote_path(self.remote_dir, name), local.size, local.mtime, local.sha256)
+
+async def plan_sync(device_name: str, local_dir: Path, remote_dir: str, names: Set[str]) -> SyncPlan:
+    """
+    比较本地和设备上的文件，生成同步计划
+
+    目标目录中同名同大小的文件，远程文件索引中的记录（大小、修改时间一致）
+    或设备上计算的sha256与本地一致时跳过；其余文件按sha256在索引中查找设备上
+    其他位置的相同内容，仍然存在且未被修改的在设备上复制，找不到的需要推送。
+
+    Args:
+        device_name: 设备名称或别名
+        local_dir: 本地图片目录
+        remote_dir: 设备上的目标目录
+        names: 待推送的文件名
+
+    Returns:
+        SyncPlan: 同步计划，to_push为需要推送的文件，unchanged为设备上已有的文件，
+            copies为可以在设备上复制的文件
+
+    Raises:
+        ADBException: 查询设备文件失败
+    """
+    serial = adb.get_device_id(device_name)
+    local_files = await disk_executor.run(_load_local_files, local_dir, names)
+    for name, local in local_files.items():
+        if not local.sha256:
+            local.sha256 = await cpu_executor.run(_sha256_file, local_dir / name)
+
+    plan = SyncPlan(serial, remote_dir, local_files)
+    listing = await _remote_listing(device_name, remote_dir)
+    verify = []
+    missing = []
+    for name, local in local_files.items():
+        remote = listing.get(name)
+        if remote is None or remote[0] != local.size:
+            missing.append(name)
+        elif remote_index.get(serial, _remote_path(remote_dir, name)) == (remote[0], remote[1], local.sha256):
+            plan.unchanged.add(name)
+        else:
+            verify.append(name)
+
+    if verify:
+        digests = await _remote_sha256(device_name, remote_dir, verify)
+        for name in verify:
+            local = local_files[name]
+            if digests.get(name) == local.sha256:
+                plan.unchanged.add(name)
+                remote_index.record(serial, _remote_path(remote_dir, name), local.size, listing[name][1], local.sha256)
+            else:
+                missing.append(name)
+
+    # 按内容查找设备上其他位置的相同文件，用一条stat命令确认记录仍然有效
+    candidates = {name: remote_index.find(serial, local_files[name].sha256) for name in missing}
+    paths = {path for found in candidates.values() for path, _, _ in found}
+    current = await _remote_stat(device_name, paths) if paths else {}
+    for name in missing:
+        for path, size, mtime in candidates[name]:
+            if current.get(path) == (size, mtime) and size == local_files[name].size:
+                plan.copies[name] = (path, mtime)
+                break
+        else:
+            plan.to_push.add(name)
+    for path, size, mtime in {entry for found in candidates.values() for entry in found}:
+        if current.get(path) != (size, mtime):
+            remote_index.forget(serial, path)
+
+    logger.info(
+        f"增量同步计划 - 设备: {device_name}, 目录: {remote_dir}, 需推送 {len(plan.to_push)} 个, "
+        f"设备上已有 {len(plan.unchanged)} 个 (校验sha256 {len(verify)} 个), 设备上复制 {len(plan.copies)} 个"
+    )
+    return plan
+
+async def apply_copies(device_name: str, plan: SyncPlan) -> None:
+    """
+    在设备上复制同步计划中已有相同内容的文件
+
+    所有复制在一条shell命令中执行，成功的文件加入unchanged并记录到远程文件索引，
+    失败的文件加入to_push改为推送。
+
+    Args:
+        device_name: 设备名称或别名
+        plan: 同步计划
+    """
+    if not plan.copies:
+        return
+    commands = [
+        f"cp -p -- {shlex.quote(source)} {shlex.quote(_remote_path(plan.remote_dir, name))} "
+        f"&& echo {shlex.quote('__copied__ ' + name)}"
+        for name, (source, _) in plan.copies.items()
+    ]
+    try:
+        output = await adb.execute_device_command_async(device_name, ["shell", "; ".join(commands) + "; true"])
+    except Exception as e:
+        logger.warning(f"在设备 {device_name} 上复制文件失败，改为推送: {str(e)}")
+        output = ""
+    copied = {line[len("__copied__ "):] for line in output.splitlines() if line.startswith("__copied__ ")}
+
+    for name, (_, mtime) in plan.copies.items():
+        if name in copied:
+            plan.unchanged.add(name)
+            local = plan.local_files[name]
+            remote_index.record(plan.serial, _remote_path(plan.remote_dir, name), local.size, mtime, local.sha256)
+        else:
+            plan.to_push.add(name)
+    logger.info(f"设备上复制完成 - 设备: {device_name}, 成功 {len(copied)}/{len(plan.copies)} 个")
+    plan.copies = {}
@@ -0,0 +1,110 @@
+"""
+线程池模块
+
+该模块按子系统划分阻塞调用使用的线程池，包括：
+1. disk：上传写盘、去重存储、磁盘统计等文件操作
+2. device：ADB套接字引擎调用和设备列表查询
+3. cpu：哈希计算等CPU密集的操作
+
+主要功能：
+- 慢的子系统（如多个ADB命令同时超时）只占满自己的线程池，不影响上传写盘
+- 每个线程池记录排队等待时间、运行中和排队中的任务数
+"""
+
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from core.config import Settings
+from core.metrics import EXECUTOR_QUEUE_WAIT, EXECUTOR_ACTIVE, EXECUTOR_QUEUED, EXECUTOR_WORKERS
+
+class InstrumentedExecutor(ThreadPoolExecutor):
+    """记录排队等待时间和运行中任务数的线程池"""
+
+    def __init__(self, name: str, max_workers: int):
+        """
+        初始化线程池
+
+        Args:
+            name: 线程池名称，用作指标标签和线程名前缀
+            max_workers: 线程数上限
+        """
+        super().__init__(max_workers=max_workers, thread_name_prefix=f"{name}-pool")
+        self.name = name
+        self.max_workers = max_workers
+        self._stats_lock = threading.Lock()
+        self.active = 0
+        self.queued = 0
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        submitted = time.perf_counter()
+        with self._stats_lock:
+            self.queued += 1
+
+        def run():
+            EXECUTOR_QUEUE_WAIT.observe(time.perf_counter() - submitted, pool=self.name)
+            with self._stats_lock:
+                self.queued -= 1
+                self.active += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._stats_lock:
+                    self.active -= 1
+
+        future = super().submit(run)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future: Future) -> None:
+        # 排队中被取消的任务不会执行run，在这里扣除排队数
+        if future.cancelled():
+            with self._stats_lock:
+                self.queued -= 1
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        在线程池中执行阻塞调用并等待结果
+
+        Args:
+            func: 阻塞函数
+            *args: 位置参数
+            **kwargs: 关键字参数
+
+        Returns:
+            函数返回值
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self, functools.partial(func, *args, **kwargs))
+
+# 创建全局线程池实例
+disk_executor = InstrumentedExecutor("disk", Settings.EXECUTOR_DISK_WORKERS)
+device_io_executor = InstrumentedExecutor("device", Settings.EXECUTOR_DEVICE_WORKERS)
+cpu_executor = InstrumentedExecutor("cpu", Settings.EXECUTOR_CPU_WORKERS)
+
+EXECUTORS: List[InstrumentedExecutor] = [disk_executor, device_io_executor, cpu_executor]
+
+def _pool_values(attr: str) -> Callable[[], Dict[str, int]]:
+    return lambda: {executor.name: getattr(executor, attr) for executor in EXECUTORS}
+
+EXECUTOR_ACTIVE.set_function(_pool_values("active"))
+EXECUTOR_QUEUED.set_function(_pool_values("queued"))
+EXECUTOR_WORKERS.set_function(_pool_values("max_workers"))
+
+async def shutdown_executors() -> None:
+    """
+    关闭所有线程池，等待正在执行的任务结束
+
+    排队中的任务立即取消；等待线程退出的阻塞调用放到单独的线程中，
+    关闭期间事件循环仍可处理其他回调
+    """
+    for executor in EXECUTORS:
+        executor.shutdown(wait=False, cancel_futures=True)
+    await asyncio.to_thread(_join_executors)
+
+def _join_executors() -> None:
+    for executor in EXECUTORS:
+        executor.shutdown(wait=True)
@@ -0,0 +1,239 @@
+"""
+设备任务队列模块
+
+该模块提供进程内的持久化任务队列，用于把设备相关的耗时操作移出上传请求：
+1. 任务入队与状态持久化（SQLite）
+2. 后台工作协程消费任务
+3. 任务进度查询
+
+主要功能：
+- 上传完成后登记立即任务并返回任务ID
+- 后台执行图片推送和媒体扫描通知，实时记录进度
+- 待执行任务按发布时间（上传时间戳）排序，临近发布的任务先执行
+- 服务重启后自动恢复未完成的任务
+"""
+
+import asyncio
+import itertools
+import logging
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from core.config import Settings
+from core.sqlite_db import shared_database
+from core.tasks import execute_immediate_tasks
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+
+# 可以通过进度回调更新的字段
+PROGRESS_FIELDS = {"images_total", "images_pushed", "images_failed", "notification", "error"}
+
+class DeviceJobQueue:
+    """
+    设备任务队列
+
+    任务记录保存在SQLite中，内存中只保留待执行任务的优先队列，
+    按 (上传时间戳, 入队顺序) 排序。
+    """
+
+    def __init__(self, db_path: Path, workers: int = 1):
+        """
+        初始化任务队列
+
+        Args:
+            db_path: 数据库文件路径
+            workers: 工作协程数量
+        """
+        self.db_path = db_path
+        self.workers = workers
+        database = shared_database(db_path)
+        self._lock = database.lock
+        self._conn = database.conn
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+        self._tasks: List[asyncio.Task] = []
+        self._init_db()
+
+    def _init_db(self) -> None:
+        """创建数据表和索引"""
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS device_jobs (
+                    id TEXT PRIMARY KEY,
+                    device_name TEXT NOT NULL,
+                    upload_time INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    images_total INTEGER NOT NULL DEFAULT 0,
+                    images_pushed INTEGER NOT NULL DEFAULT 0,
+                    images_failed INTEGER NOT NULL DEFAULT 0,
+                    notification TEXT NOT NULL DEFAULT 'pending',
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    finished_at REAL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_device_jobs_status ON device_jobs (status, created_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_device_jobs_upload ON device_jobs (device_name, upload_time)")
+
+    def enqueue(self, device_name: str, upload_time: int) -> dict:
+        """
+        登记并排队一个立即任务
+
+        同一设备同一时间戳已有排队中、运行中或已成功的任务时（如上传请求重试），
+        不再重复登记，直接返回已有任务；已失败的任务允许重新登记。
+
+        Args:
+            device_name: 设备名称
+            upload_time: 数据上传时间戳
+
+        Returns:
+            dict: 任务记录
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            existing = self._conn.execute(
+                "SELECT * FROM device_jobs WHERE device_name = ? AND upload_time = ? AND status IN (?, ?, ?) "
+                "ORDER BY created_at DESC LIMIT 1",
+                (device_name, upload_time, STATUS_QUEUED, STATUS_RUNNING, STATUS_SUCCEEDED)
+            ).fetchone()
+            if existing is not None:
+                logger.info(f"任务已存在，不重复入队: {existing['id']} - 设备: {device_name}")
+                return dict(existing)
+            self._conn.execute(
+                "INSERT INTO device_jobs (id, device_name, upload_time, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, device_name, upload_time, STATUS_QUEUED, now, now)
+            )
+        self._put(job_id, upload_time)
+        logger.info(f"任务已入队: {job_id} - 设备: {device_name}")
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """
+        查询任务记录
+
+        Args:
+            job_id: 任务ID
+
+        Returns:
+            dict: 任务记录，不存在时返回None
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM device_jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def _put(self, job_id: str, upload_time: int) -> None:
+        """按发布时间放入待执行队列"""
+        self._queue.put_nowait((upload_time, next(self._sequence), job_id))
+
+    def depth(self) -> int:
+        """获取等待执行的任务数量"""
+        return self._queue.qsize()
+
+    def update(self, job_id: str, **fields) -> None:
+        """
+        更新任务字段
+
+        Args:
+            job_id: 任务ID
+            **fields: 需要更新的字段
+        """
+        if not fields:
+            return
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE device_jobs SET {assignments} WHERE id = ?",
+                (*fields.values(), job_id)
+            )
+
+    def _pending_jobs(self) -> List[sqlite3.Row]:
+        """获取未完成的任务（包括上次运行中断的任务）"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, upload_time FROM device_jobs WHERE status IN (?, ?) ORDER BY created_at",
+                (STATUS_QUEUED, STATUS_RUNNING)
+            ).fetchall()
+
+    def _purge_finished(self) -> None:
+        """清理超过保留期的已结束任务"""
+        cutoff = time.time() - Settings.JOB_RETENTION_DAYS * 86400
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM device_jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (STATUS_SUCCEEDED, STATUS_FAILED, cutoff)
+            )
+
+    async def start(self) -> None:
+        """启动工作协程，并恢复未完成的任务"""
+        if self._tasks:
+            return
+        self._purge_finished()
+        pending = self._pending_jobs()
+        for row in pending:
+            self.update(row["id"], status=STATUS_QUEUED)
+            self._put(row["id"], row["upload_time"])
+        if pending:
+            logger.info(f"恢复 {len(pending)} 个未完成的任务")
+
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"设备任务队列已启动，工作协程数: {self.workers}")
+
+    async def stop(self) -> None:
+        """停止工作协程，运行中的任务会在下次启动时重新执行"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("设备任务队列已停止")
+
+    async def _worker(self, index: int) -> None:
+        """工作协程：循环取出任务并执行"""
+        while True:
+            _, _, job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"工作协程 {index} 处理任务 {job_id} 时出错: {str(e)}", exc_info=True)
+                self.update(job_id, status=STATUS_FAILED, error=str(e), finished_at=time.time())
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        """执行单个任务并记录结果"""
+        job = self.get(job_id)
+        if job is None or job["status"] != STATUS_QUEUED:
+            return
+
+        self.update(job_id, status=STATUS_RUNNING)
+
+        def report(**fields):
+            self.update(job_id, **{k: v for k, v in fields.items() if k in PROGRESS_FIELDS})
+
+        success = await execute_immediate_tasks(
+            device_name=job["device_name"],
+            upload_time=job["upload_time"],
+            progress=report
+        )
+        self.update(
+            job_id,
+            status=STATUS_SUCCEEDED if success else STATUS_FAILED,
+            finished_at=time.time()
+        )
+
+# 创建全局任务队列实例
+job_queue = DeviceJobQueue(Settings.JOB_QUEUE_DB, workers=Settings.JOB_QUEUE_WORKERS)
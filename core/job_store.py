@@ -0,0 +1,230 @@
+"""
+定时任务持久化存储模块
+
+该模块为APScheduler提供基于SQLite的任务存储，包括：
+1. 定时任务序列化后保存在本地数据库（WAL模式）
+2. 按执行时间、设备名称建立索引
+3. 不反序列化任务即可按设备和时间范围查询
+
+主要功能：
+- 服务重启或部署后定时发布任务不会丢失
+- 启动时只读取最近的执行时间，到期任务才反序列化
+"""
+
+import pickle
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from apscheduler.job import Job
+from apscheduler.jobstores.base import BaseJobStore, ConflictingIdError, JobLookupError
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+
+from core.sqlite_db import SQLiteDatabase
+
+class SQLiteJobStore(BaseJobStore):
+    """
+    SQLite任务存储
+
+    除序列化的任务状态外，单独保存设备名称和任务时间戳两列，
+    供任务查询接口直接走索引，无需加载全部任务。
+    """
+
+    def __init__(self, db_path: Path, pickle_protocol: int = pickle.HIGHEST_PROTOCOL):
+        """
+        初始化任务存储
+
+        Args:
+            db_path: 数据库文件路径
+            pickle_protocol: 任务状态的序列化协议版本
+        """
+        super().__init__()
+        self.db_path = db_path
+        self.pickle_protocol = pickle_protocol
+        self._db = SQLiteDatabase(db_path)
+        self._lock = self._db.lock
+        self._conn = self._db.conn
+        self._init_db()
+
+    def _init_db(self) -> None:
+        """创建数据表和索引"""
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS scheduled_jobs (
+                    id TEXT PRIMARY KEY,
+                    next_run_time REAL,
+                    device_name TEXT,
+                    task_time INTEGER,
+                    job_state BLOB NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_scheduled_jobs_next_run ON scheduled_jobs (next_run_time)")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_scheduled_jobs_device ON scheduled_jobs (device_name, next_run_time)"
+            )
+
+    def _row_values(self, job: Job) -> tuple:
+        """生成任务对应的列值：(下次执行时间, 设备名称, 任务时间戳, 序列化状态)"""
+        return (
+            datetime_to_utc_timestamp(job.next_run_time),
+            job.kwargs.get("device_name"),
+            job.kwargs.get("task_time"),
+            pickle.dumps(job.__getstate__(), self.pickle_protocol)
+        )
+
+    def _reconstitute_job(self, job_state: bytes) -> Job:
+        """从序列化状态恢复任务对象"""
+        state = pickle.loads(job_state)
+        state["jobstore"] = self
+        job = Job.__new__(Job)
+        job.__setstate__(state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    def _get_jobs(self, where: str = "", params: tuple = ()) -> List[Job]:
+        """按条件加载任务，无法恢复的任务被删除"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, job_state FROM scheduled_jobs {where} ORDER BY next_run_time", params
+            ).fetchall()
+        jobs = []
+        failed_ids = []
+        for row in rows:
+            try:
+                jobs.append(self._reconstitute_job(row["job_state"]))
+            except BaseException:
+                self._logger.exception('Unable to restore job "%s" -- removing it', row["id"])
+                failed_ids.append(row["id"])
+        if failed_ids:
+            with self._lock:
+                self._conn.executemany("DELETE FROM scheduled_jobs WHERE id = ?", [(job_id,) for job_id in failed_ids])
+        return jobs
+
+    def lookup_job(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute("SELECT job_state FROM scheduled_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._reconstitute_job(row["job_state"]) if row else None
+
+    def get_due_jobs(self, now: datetime) -> List[Job]:
+        return self._get_jobs("WHERE next_run_time <= ?", (datetime_to_utc_timestamp(now),))
+
+    def get_next_run_time(self) -> Optional[datetime]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT next_run_time FROM scheduled_jobs WHERE next_run_time IS NOT NULL "
+                "ORDER BY next_run_time LIMIT 1"
+            ).fetchone()
+        return utc_timestamp_to_datetime(row["next_run_time"]) if row else None
+
+    def get_all_jobs(self) -> List[Job]:
+        jobs = self._get_jobs()
+        self._fix_paused_jobs_sorting(jobs)
+        return jobs
+
+    def add_job(self, job: Job) -> None:
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT INTO scheduled_jobs (id, next_run_time, device_name, task_time, job_state) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (job.id, *self._row_values(job))
+                )
+        except sqlite3.IntegrityError:
+            raise ConflictingIdError(job.id)
+
+    def update_job(self, job: Job) -> None:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE scheduled_jobs SET next_run_time = ?, device_name = ?, task_time = ?, job_state = ? "
+                "WHERE id = ?",
+                (*self._row_values(job), job.id)
+            )
+        if cursor.rowcount == 0:
+            raise JobLookupError(job.id)
+
+    def remove_job(self, job_id: str) -> None:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM scheduled_jobs WHERE id = ?", (job_id,))
+        if cursor.rowcount == 0:
+            raise JobLookupError(job_id)
+
+    def remove_all_jobs(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM scheduled_jobs")
+
+    def shutdown(self) -> None:
+        self._db.close()
+
+    def job_ids(self) -> List[str]:
+        """获取所有任务ID（只读取主键索引）"""
+        with self._lock:
+            return [row["id"] for row in self._conn.execute("SELECT id FROM scheduled_jobs")]
+
+    def count(self) -> int:
+        """获取任务数量"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM scheduled_jobs").fetchone()[0]
+
+    def run_times(self, device_names: List[str], start: float, end: float,
+                  exclude_id: Optional[str] = None) -> List[float]:
+        """
+        查询指定设备在时间范围内的任务执行时间
+
+        Args:
+            device_names: 设备名称列表
+            start: 时间下限（UTC时间戳，不包含）
+            end: 时间上限（UTC时间戳，不包含）
+            exclude_id: 需要排除的任务ID
+
+        Returns:
+            list: 按时间排序的执行时间列表
+        """
+        placeholders = ", ".join("?" for _ in device_names)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT next_run_time FROM scheduled_jobs WHERE device_name IN ({placeholders}) "
+                "AND next_run_time > ? AND next_run_time < ? AND id != ? ORDER BY next_run_time",
+                (*device_names, start, end, exclude_id or "")
+            ).fetchall()
+        return [row["next_run_time"] for row in rows]
+
+    def find_jobs(self, device_name: Optional[str] = None, start: Optional[float] = None,
+                  end: Optional[float] = None, limit: int = 100, offset: int = 0) -> Dict:
+        """
+        按设备和执行时间范围查询任务摘要，不反序列化任务状态
+
+        Args:
+            device_name: 设备名称，为None时不过滤
+            start: 执行时间下限（UTC时间戳，包含）
+            end: 执行时间上限（UTC时间戳，不包含）
+            limit: 返回数量
+            offset: 跳过数量
+
+        Returns:
+            dict: {"total": 总数, "items": [{"id", "device_name", "task_time", "next_run_time"}]}
+        """
+        conditions = []
+        params = []
+        if device_name is not None:
+            conditions.append("device_name = ?")
+            params.append(device_name)
+        if start is not None:
+            conditions.append("next_run_time >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("next_run_time < ?")
+            params.append(end)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM scheduled_jobs {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT id, device_name, task_time, next_run_time FROM scheduled_jobs {where} "
+                "ORDER BY next_run_time LIMIT ? OFFSET ?",
+                (*params, limit, offset)
+            ).fetchall()
+        return {"total": total, "items": [dict(row) for row in rows]}
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} (path={self.db_path})>"
@@ -0,0 +1,264 @@
+"""
+运行指标模块
+
+该模块提供进程内的指标收集和Prometheus文本格式输出，包括：
+1. 计数器（Counter）：单调递增的累计值
+2. 直方图（Histogram）：按区间统计耗时、吞吐等分布
+3. 仪表（Gauge）：抓取时通过回调函数读取的当前值
+
+主要功能：
+- 各模块在热点路径上记录耗时和数据量
+- /metrics接口输出所有指标，供Prometheus抓取
+"""
+
+import abc
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+# 默认耗时区间（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+LabelValues = Tuple[str, ...]
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """生成标签文本，如 {method="GET",le="0.1"}"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric(abc.ABC):
+    """指标基类"""
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    @abc.abstractmethod
+    def samples(self) -> List[str]:
+        """生成指标的样本行"""
+
+    def render(self) -> str:
+        """生成包含HELP和TYPE的完整文本"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class Counter(Metric):
+    """计数器"""
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """
+        增加计数
+
+        Args:
+            amount: 增加量
+            **labels: 标签值
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+class Histogram(Metric):
+    """直方图"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        """
+        记录一个观测值
+
+        Args:
+            value: 观测值
+            **labels: 标签值
+        """
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * len(self.buckets), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """统计代码块的耗时（秒），代码块抛出异常时同样记录"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+class Gauge(Metric):
+    """
+    仪表
+
+    值在抓取时由回调函数提供，回调返回 {标签值元组: 数值}，无标签时返回单个数值。
+    """
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._callback: Callable[[], object] = lambda: {}
+
+    def set_function(self, callback: Callable[[], object]) -> None:
+        """
+        设置读取当前值的回调函数
+
+        Args:
+            callback: 回调函数
+        """
+        self._callback = callback
+
+    def samples(self) -> List[str]:
+        values = self._callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key if isinstance(key, tuple) else (key,))} {_format_value(value)}"
+            for key, value in values.items()
+        ]
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        """注册指标并返回该指标"""
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        生成Prometheus文本格式的全部指标
+
+        Returns:
+            str: 指标文本
+        """
+        sections = []
+        for metric in self._metrics:
+            try:
+                sections.append(metric.render())
+            except Exception as e:
+                sections.append(f"# {metric.name} unavailable: {_escape(str(e))}")
+        return "\n".join(sections) + "\n"
+
+# 创建全局注册表
+registry = MetricsRegistry()
+
+# 上传
+HTTP_REQUEST_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"]
+))
+UPLOAD_DECODE_DURATION = registry.register(Histogram(
+    "upload_base64_decode_seconds", "Time to base64-decode one uploaded file"
+))
+UPLOAD_HASH_DURATION = registry.register(Histogram(
+    "upload_sha256_seconds", "Time to sha256 one uploaded file"
+))
+
+# ADB
+ADB_COMMAND_DURATION = registry.register(Histogram(
+    "adb_command_duration_seconds", "Latency of a single ADB command", ["engine", "command"]
+))
+ADB_PUSH_BYTES = registry.register(Counter(
+    "adb_push_bytes_total", "Bytes pushed to devices", ["device"]
+))
+ADB_PUSH_THROUGHPUT = registry.register(Histogram(
+    "adb_push_throughput_bytes_per_second", "Throughput of a batched directory push", ["device"],
+    buckets=(256e3, 512e3, 1e6, 2e6, 5e6, 10e6, 20e6, 40e6, 80e6)
+))
+
+# 自动化
+AUTOMATION_STEP_DURATION = registry.register(Histogram(
+    "automation_step_duration_seconds", "Duration of a post_content step", ["step"]
+))
+AUTOMATION_HIERARCHY_DUMPS = registry.register(Counter(
+    "automation_hierarchy_dumps_total", "UI hierarchy dumps fetched from devices", ["step"]
+))
+
+# 线程池
+EXECUTOR_QUEUE_WAIT = registry.register(Histogram(
+    "executor_queue_wait_seconds", "Time a blocking call waited for a free thread", ["pool"]
+))
+EXECUTOR_ACTIVE = registry.register(Gauge(
+    "executor_active_threads", "Threads currently running a task", ["pool"]
+))
+EXECUTOR_QUEUED = registry.register(Gauge(
+    "executor_queued_tasks", "Tasks waiting for a free thread", ["pool"]
+))
+EXECUTOR_WORKERS = registry.register(Gauge(
+    "executor_max_workers", "Thread limit of the pool", ["pool"]
+))
+
+# 图片传输调度
+TRANSFER_WAIT = registry.register(Histogram(
+    "transfer_slot_wait_seconds", "Time a push waited for a transfer slot", ["hub"]
+))
+TRANSFERS_RUNNING = registry.register(Gauge(
+    "transfers_running", "Pushes currently holding a transfer slot", ["hub"]
+))
+TRANSFERS_WAITING = registry.register(Gauge(
+    "transfers_waiting", "Pushes waiting for a transfer slot"
+))
+
+# 队列和设备状态（抓取时读取）
+SCHEDULER_JOBS = registry.register(Gauge(
+    "scheduler_jobs", "Scheduled jobs in the job store"
+))
+DEVICE_JOB_QUEUE_DEPTH = registry.register(Gauge(
+    "device_job_queue_depth", "Immediate device jobs waiting in the job queue"
+))
+DEVICE_WORK_WAITING = registry.register(Gauge(
+    "device_work_waiting", "Work items waiting for a physical device slot", ["serial"]
+))
+CONNECTED_DEVICES = registry.register(Gauge(
+    "connected_devices", "Devices currently online according to the device registry"
+))
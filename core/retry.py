@@ -0,0 +1,258 @@
+"""
+任务重试模块
+
+该模块为设备任务中的单个步骤提供重试能力，包括：
+1. 指数退避加随机抖动的重试策略
+2. 步骤台账：记录每个步骤的完成状态，已完成的步骤不会重复执行
+3. 死信列表：重试耗尽或不可重试的步骤记录下来供人工处理
+
+主要功能：
+- 只重试失败的步骤（如单张图片推送、发布操作），不重跑整个任务
+- 步骤以确定的键标识，任务重跑时跳过已完成的步骤
+"""
+
+import asyncio
+import json
+import logging
+import random
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from core.config import Settings
+from core.sqlite_db import shared_database
+
+logger = logging.getLogger(__name__)
+
+# 步骤状态
+STEP_DONE = "done"
+STEP_FAILED = "failed"
+
+class NonRetryableError(Exception):
+    """步骤失败且不能重试（如重试可能导致重复发布）"""
+    pass
+
+class RetryPolicy:
+    """
+    指数退避重试策略
+
+    第n次失败后等待 min(max_delay, base_delay * multiplier^(n-1))，
+    再随机缩短最多jitter比例，避免多个任务同时重试。
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 1.0, max_delay: float = 60.0,
+                 multiplier: float = 2.0, jitter: float = 0.5):
+        """
+        初始化重试策略
+
+        Args:
+            max_attempts: 最多尝试次数（包括第一次）
+            base_delay: 第一次重试前的等待时间（秒）
+            max_delay: 单次等待时间上限（秒）
+            multiplier: 每次重试等待时间的增长倍数
+            jitter: 随机缩短等待时间的最大比例（0-1）
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+
+    @classmethod
+    def from_settings(cls, name: str) -> "RetryPolicy":
+        """
+        从配置创建重试策略
+
+        Args:
+            name: Settings.RETRY_POLICIES中的策略名称
+
+        Returns:
+            RetryPolicy: 重试策略
+        """
+        return cls(**Settings.RETRY_POLICIES[name])
+
+    def delay(self, attempt: int) -> float:
+        """
+        计算第attempt次失败后的等待时间
+
+        Args:
+            attempt: 已失败的次数（从1开始）
+
+        Returns:
+            float: 等待时间（秒）
+        """
+        backoff = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        return backoff * (1 - self.jitter * random.random())
+
+class StepLedger:
+    """
+    步骤台账和死信列表
+
+    台账按步骤键记录每个步骤的状态和已尝试次数，任务重新执行时据此跳过已完成的步骤；
+    重试耗尽或不可重试的步骤连同重放所需的参数写入死信列表。
+    """
+
+    def __init__(self, db_path: Path):
+        """
+        初始化台账
+
+        Args:
+            db_path: 数据库文件路径
+        """
+        database = shared_database(db_path)
+        self._lock = database.lock
+        self._conn = database.conn
+        self._init_db()
+
+    def _init_db(self) -> None:
+        """创建数据表和索引"""
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS step_ledger (
+                    step_key TEXT PRIMARY KEY,
+                    device_name TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    error TEXT,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS dead_letters (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    step_key TEXT NOT NULL,
+                    device_name TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    error TEXT,
+                    attempts INTEGER NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_step_ledger_updated ON step_ledger (updated_at)")
+
+    def is_done(self, step_key: str) -> bool:
+        """判断步骤是否已经完成"""
+        with self._lock:
+            row = self._conn.execute("SELECT status FROM step_ledger WHERE step_key = ?", (step_key,)).fetchone()
+        return row is not None and row["status"] == STEP_DONE
+
+    def record(self, step_key: str, device_name: str, status: str, attempts: int, error: Optional[str] = None) -> None:
+        """
+        记录步骤结果
+
+        Args:
+            step_key: 步骤键
+            device_name: 设备名称
+            status: 步骤状态
+            attempts: 已尝试次数
+            error: 最后一次失败的原因
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO step_ledger (step_key, device_name, status, attempts, error, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (step_key, device_name, status, attempts, error, time.time())
+            )
+
+    def add_dead_letter(self, step_key: str, device_name: str, payload: Dict, error: str, attempts: int) -> None:
+        """
+        记录死信
+
+        Args:
+            step_key: 步骤键
+            device_name: 设备名称
+            payload: 重新执行该步骤所需的参数
+            error: 失败原因
+            attempts: 已尝试次数
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO dead_letters (step_key, device_name, payload, error, attempts, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (step_key, device_name, json.dumps(payload, ensure_ascii=False), error, attempts, time.time())
+            )
+
+    def dead_letters(self, device_name: Optional[str] = None, limit: int = 50, offset: int = 0) -> Dict:
+        """
+        查询死信列表，最新的在前
+
+        Args:
+            device_name: 设备名称，为None时不过滤
+            limit: 返回数量
+            offset: 跳过数量
+
+        Returns:
+            dict: {"total": 总数, "items": [死信记录]}
+        """
+        where = "WHERE device_name = ?" if device_name else ""
+        params = (device_name,) if device_name else ()
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM dead_letters {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT * FROM dead_letters {where} ORDER BY id DESC LIMIT ? OFFSET ?",
+                (*params, limit, offset)
+            ).fetchall()
+        items = []
+        for row in rows:
+            item = dict(row)
+            item["payload"] = json.loads(item["payload"])
+            items.append(item)
+        return {"total": total, "items": items}
+
+    def purge(self, before: float) -> None:
+        """清理指定时间之前的台账和死信记录"""
+        with self._lock:
+            self._conn.execute("DELETE FROM step_ledger WHERE updated_at < ?", (before,))
+            self._conn.execute("DELETE FROM dead_letters WHERE created_at < ?", (before,))
+
+# 创建全局台账实例
+step_ledger = StepLedger(Settings.JOB_QUEUE_DB)
+
+async def run_step(step_key: str, device_name: str, func: Callable[[], Awaitable[Any]],
+                   policy: RetryPolicy, payload: Dict, attempts_made: int = 0,
+                   last_error: Optional[str] = None) -> bool:
+    """
+    按重试策略执行一个步骤
+
+    func执行成功（不抛出异常）即视为步骤完成；抛出NonRetryableError时不再重试。
+    重试耗尽或不可重试时记录死信。
+
+    Args:
+        step_key: 步骤键，同一步骤在多次任务执行中保持不变
+        device_name: 设备名称
+        func: 执行步骤的协程函数，失败时抛出异常
+        policy: 重试策略
+        payload: 写入死信的参数
+        attempts_made: 调用前已经失败的次数（如批量推送中已失败一次）
+        last_error: 调用前最后一次失败的原因
+
+    Returns:
+        bool: 步骤是否完成
+    """
+    if step_ledger.is_done(step_key):
+        logger.info(f"步骤已完成，跳过: {step_key}")
+        return True
+
+    attempt = attempts_made
+    error = last_error
+    retryable = True
+    while attempt < policy.max_attempts and retryable:
+        if attempt > 0:
+            wait = policy.delay(attempt)
+            logger.info(f"步骤 {step_key} 第 {attempt} 次失败，{wait:.1f}秒后重试: {error}")
+            await asyncio.sleep(wait)
+        attempt += 1
+        try:
+            await func()
+            step_ledger.record(step_key, device_name, STEP_DONE, attempt)
+            return True
+        except NonRetryableError as e:
+            error = str(e)
+            retryable = False
+        except Exception as e:
+            error = str(e) or type(e).__name__
+
+    logger.error(f"步骤 {step_key} 失败，已尝试 {attempt} 次，写入死信: {error}")
+    step_ledger.record(step_key, device_name, STEP_FAILED, attempt, error)
+    step_ledger.add_dead_letter(step_key, device_name, payload, error, attempt)
+    return False
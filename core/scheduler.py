@@ -5,6 +5,10 @@
 1. 初始化和管理调度器
 2. 添加定时任务
 3. 处理任务的生命周期
+4. 定时任务持久化到本地SQLite，重启后自动恢复
+5. 按设备和时间戳生成确定的任务ID，重复提交时跳过或替换
+6. 查询、改期、取消和立即执行已调度的任务
+7. 按设备和账号的最小间隔为发布任务分配时间槽
 
 主要功能：
 - 启动和停止调度器
@@ -12,14 +16,47 @@
 - 处理任务调度异常
 """
 
+from apscheduler.job import Job
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.events import EVENT_JOB_ADDED, EVENT_JOB_REMOVED, EVENT_ALL_JOBS_REMOVED
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.date import DateTrigger
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
 import logging
 from core.config import Settings
+from core.job_store import SQLiteJobStore
 
 logger = logging.getLogger(__name__)
-scheduler = AsyncIOScheduler(timezone=Settings.SCHEDULER_TIMEZONE)
+job_store = SQLiteJobStore(Settings.SCHEDULER_DB)
+scheduler = AsyncIOScheduler(timezone=Settings.SCHEDULER_TIMEZONE, jobstores={"default": job_store})
+
+# 已调度任务ID的内存索引，重复提交时无需查询任务存储
+_job_ids: Set[str] = set()
+
+def _on_job_event(event):
+    """根据任务增删事件维护内存索引"""
+    if event.code == EVENT_JOB_ADDED:
+        _job_ids.add(event.job_id)
+    elif event.code == EVENT_JOB_REMOVED:
+        _job_ids.discard(event.job_id)
+    elif event.code == EVENT_ALL_JOBS_REMOVED:
+        _job_ids.clear()
+
+scheduler.add_listener(_on_job_event, EVENT_JOB_ADDED | EVENT_JOB_REMOVED | EVENT_ALL_JOBS_REMOVED)
+
+def scheduled_job_id(device_name: str, timestamp: int) -> str:
+    """
+    生成定时发布任务的ID
+
+    Args:
+        device_name: 设备名称
+        timestamp: 计划发布的时间戳
+
+    Returns:
+        str: 形如 post:deviceA:1700000000 的任务ID
+    """
+    return f"post:{device_name}:{timestamp}"
 
 def start_scheduler():
     """
@@ -28,6 +65,8 @@ def start_scheduler():
     如果调度器未运行，则启动它并设置正确的时区
     """
     if not scheduler.running:
+        _job_ids.clear()
+        _job_ids.update(job_store.job_ids())
         scheduler.start()
         logger.info("Scheduler started with timezone: %s", Settings.SCHEDULER_TIMEZONE)
 
@@ -41,7 +80,46 @@ def stop_scheduler():
         scheduler.shutdown()
         logger.info("Scheduler stopped")
 
-def add_job(func, run_time: datetime, *args, **kwargs):
+def allocate_post_slot(device_name: str, run_time: datetime, job_id: Optional[str] = None) -> datetime:
+    """
+    为发布任务分配时间槽
+
+    同一台手机（所有映射到同一序列号的设备名）上的发布至少间隔POST_MIN_INTERVAL_DEVICE秒，
+    同一账号（设备名）的发布至少间隔POST_MIN_INTERVAL_ACCOUNT秒。
+    请求的时间与已有任务冲突时顺延到下一个空闲时间，不会丢弃任务。
+
+    Args:
+        device_name: 设备名称
+        run_time (datetime): 请求的执行时间
+        job_id (str): 任务自身的ID，分配时忽略该任务（用于重复提交）
+
+    Returns:
+        datetime: 分配到的执行时间，不早于请求的时间
+    """
+    serial = Settings.DEVICE_MAPPING.get(device_name, device_name)
+    aliases = [name for name, value in Settings.DEVICE_MAPPING.items() if value == serial] or [device_name]
+    rules = [
+        (aliases, Settings.POST_MIN_INTERVAL_DEVICE),
+        ([device_name], Settings.POST_MIN_INTERVAL_ACCOUNT)
+    ]
+
+    candidate = run_time.timestamp()
+    moved = True
+    while moved:
+        moved = False
+        for names, interval in rules:
+            conflicts = job_store.run_times(names, candidate - interval, candidate + interval, exclude_id=job_id)
+            if conflicts and conflicts[-1] + interval > candidate:
+                candidate = conflicts[-1] + interval
+                moved = True
+
+    if candidate != run_time.timestamp():
+        logger.info("Post slot for %s shifted from %s to %s", device_name, run_time,
+                    run_time + timedelta(seconds=candidate - run_time.timestamp()))
+    return run_time + timedelta(seconds=candidate - run_time.timestamp())
+
+def add_job(func, run_time: datetime, *args, job_id: Optional[str] = None,
+            replace_existing: Optional[bool] = None, **kwargs):
     """
     添加定时任务
 
@@ -49,14 +127,17 @@ def add_job(func, run_time: datetime, *args, **kwargs):
         func: 要执行的函数
         run_time (datetime): 任务执行时间
         *args: 传递给任务函数的位置参数
+        job_id (str): 任务ID，为None时由调度器随机生成
+        replace_existing (bool): 任务ID已存在时是否替换，为None时按SCHEDULE_DUPLICATE_POLICY处理
         **kwargs: 传递给任务函数的关键字参数
 
     Returns:
-        Job: 已创建的任务对象，如果创建失败则返回None
+        Job: 已创建（或已存在而被跳过）的任务对象，如果创建失败则返回None
 
     注意:
         - 如果执行时间早于当前时间，任务将不会被添加
         - 任务默认有120秒的容错时间
+        - 任务ID已存在且不替换时直接返回已有任务
     """
     if run_time < datetime.now(tz=Settings.SCHEDULER_TIMEZONE):
         logger.warning("Attempted to schedule job in the past: %s", run_time)
@@ -66,13 +147,126 @@ def add_job(func, run_time: datetime, *args, **kwargs):
     if run_time.tzinfo is None:
         run_time = run_time.replace(tzinfo=Settings.SCHEDULER_TIMEZONE)
     
+    if replace_existing is None:
+        replace_existing = Settings.SCHEDULE_DUPLICATE_POLICY == "replace"
+    if job_id is not None and job_id in _job_ids and not replace_existing:
+        logger.info("Job %s already scheduled, skipping duplicate", job_id)
+        return scheduler.get_job(job_id)
+    
     job = scheduler.add_job(
         func,
         DateTrigger(run_date=run_time, timezone=Settings.SCHEDULER_TIMEZONE),
         args=args,
         kwargs=kwargs,
+        id=job_id,
+        replace_existing=replace_existing,
         misfire_grace_time=120,  # 任务最大延迟执行时间（秒）
         coalesce=True  # 如果错过了执行时间，只执行一次
     )
+    _job_ids.add(job.id)
     logger.info("Scheduled job %s for %s", job.id, run_time)
-    return job
\ No newline at end of file
+    return job
+
+def job_summary(job: Job) -> Dict:
+    """
+    生成定时任务的摘要信息
+
+    Args:
+        job: 任务对象
+
+    Returns:
+        dict: 任务ID、设备名称、任务时间戳及下次执行时间
+    """
+    return {
+        "id": job.id,
+        "device_name": job.kwargs.get("device_name"),
+        "task_time": job.kwargs.get("task_time"),
+        "next_run_time": job.next_run_time.timestamp() if job.next_run_time else None
+    }
+
+def get_scheduled_job(job_id: str) -> Optional[Dict]:
+    """
+    查询定时任务
+
+    Args:
+        job_id: 任务ID
+
+    Returns:
+        dict: 任务摘要，不存在时返回None
+    """
+    job = scheduler.get_job(job_id)
+    return job_summary(job) if job else None
+
+def _allocate_for_job(job_id: str, run_time: datetime) -> datetime:
+    """
+    为已有任务分配新的时间槽，分配时忽略任务自身
+
+    Raises:
+        JobLookupError: 任务不存在
+    """
+    job = scheduler.get_job(job_id)
+    if job is None:
+        raise JobLookupError(job_id)
+    device_name = job.kwargs.get("device_name")
+    if device_name is None:
+        return run_time
+    return allocate_post_slot(device_name, run_time, job_id=job_id)
+
+def reschedule_job(job_id: str, run_time: datetime) -> Dict:
+    """
+    修改定时任务的执行时间
+
+    新的执行时间同样经过allocate_post_slot分配，与同一手机或账号的其他发布冲突时顺延。
+
+    Args:
+        job_id: 任务ID
+        run_time: 新的执行时间
+
+    Returns:
+        dict: 修改后的任务摘要
+
+    Raises:
+        JobLookupError: 任务不存在
+        ValueError: 新的执行时间早于当前时间
+    """
+    if run_time < datetime.now(tz=Settings.SCHEDULER_TIMEZONE):
+        raise ValueError("Run time is in the past")
+    run_time = _allocate_for_job(job_id, run_time)
+    job = scheduler.reschedule_job(job_id, trigger=DateTrigger(run_date=run_time, timezone=Settings.SCHEDULER_TIMEZONE))
+    logger.info("Rescheduled job %s to %s", job_id, run_time)
+    return job_summary(job)
+
+def cancel_job(job_id: str) -> None:
+    """
+    取消定时任务
+
+    Args:
+        job_id: 任务ID
+
+    Raises:
+        JobLookupError: 任务不存在
+    """
+    scheduler.remove_job(job_id)
+    logger.info("Cancelled job %s", job_id)
+
+def run_job_now(job_id: str) -> Dict:
+    """
+    立即执行定时任务
+
+    把下次执行时间改为当前时间并唤醒调度器，任务仍经由调度器执行。
+    当前时间与同一手机或账号的其他发布间隔不足时，改为顺延后的最早空闲时间。
+
+    Args:
+        job_id: 任务ID
+
+    Returns:
+        dict: 修改后的任务摘要
+
+    Raises:
+        JobLookupError: 任务不存在
+    """
+    run_time = _allocate_for_job(job_id, datetime.now(tz=Settings.SCHEDULER_TIMEZONE))
+    job = scheduler.modify_job(job_id, next_run_time=run_time)
+    scheduler.wakeup()
+    logger.info("Job %s triggered to run now", job_id)
+    return job_summary(job)
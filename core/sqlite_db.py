@@ -0,0 +1,64 @@
+"""
+SQLite连接模块
+
+该模块统一管理本地持久化存储使用的SQLite连接，包括：
+1. 连接参数（跨线程使用、自动提交、按列名访问行）
+2. WAL日志模式和NORMAL同步级别
+3. 保护连接的线程锁
+
+主要功能：
+- 同一数据库文件上的多个存储共用一个连接和一把锁
+- 各存储只负责自己的数据表，不再重复连接初始化代码
+"""
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict
+
+class SQLiteDatabase:
+    """
+    SQLite数据库连接
+
+    连接可以在任意线程中使用，所有语句都应在lock内执行。
+    """
+
+    def __init__(self, db_path: Path):
+        """
+        打开数据库
+
+        Args:
+            db_path: 数据库文件路径
+        """
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+
+    def close(self) -> None:
+        """关闭连接"""
+        with self.lock:
+            self.conn.close()
+
+_shared: Dict[str, SQLiteDatabase] = {}
+_shared_lock = threading.Lock()
+
+def shared_database(db_path: Path) -> SQLiteDatabase:
+    """
+    获取数据库文件对应的共享连接，首次调用时打开
+
+    Args:
+        db_path: 数据库文件路径
+
+    Returns:
+        SQLiteDatabase: 同一路径始终返回同一个实例
+    """
+    key = str(Path(db_path).resolve())
+    with _shared_lock:
+        database = _shared.get(key)
+        if database is None:
+            database = _shared[key] = SQLiteDatabase(Path(db_path))
+        return database
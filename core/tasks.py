@@ -12,6 +12,7 @@
 - 记录任务执行日志
 """
 
+import asyncio
 import logging
 import os
 import glob
@@ -22,19 +23,39 @@ from typing import Dict, Any, Callable, Coroutine, Optional, List
 from core.adb import adb, ADBException
 from core.config import Settings, UPLOAD_DIR
 from core.automation import AndroidAutomation
+from core.device_executor import device_executor
+from core.device_scheduler import device_scheduler
+from core.device_sync import plan_sync, apply_copies
+from core.transfer_scheduler import transfer_scheduler
+from core.retry import RetryPolicy, NonRetryableError, STEP_DONE, run_step, step_ledger
 
 logger = logging.getLogger(__name__)
 
+# 任务进度回调，以关键字参数上报进度字段
+ProgressCallback = Callable[..., None]
+
 # 立即执行任务
 # ===============================================
 
-async def send_images_to_device(device_name: str, upload_time: int):
+def _report(progress: Optional[ProgressCallback], **fields):
+    """上报任务进度，回调出错不影响任务本身"""
+    if progress is None:
+        return
+    try:
+        progress(**fields)
+    except Exception as e:
+        logger.warning(f"上报任务进度失败: {str(e)}")
+
+async def send_images_to_device(device_name: str, upload_time: int, progress: Optional[ProgressCallback] = None):
     """
     将上传的图片通过ADB发送到设备
     
+    整个目录先批量推送一次，失败的图片再按重试策略逐个重试，重试耗尽的写入死信。
+    
     Args:
         device_name: 设备名称
         upload_time: 数据上传时间戳
+        progress: 可选的进度回调，上报images_total/images_pushed/images_failed
     """
     try:
         # 记录详细诊断信息
@@ -52,7 +73,7 @@ async def send_images_to_device(device_name: str, upload_time: int):
             logger.info(f"当前已连接的设备ID列表: {connected_devices}")
             
             # 尝试获取设备ID
-            device_id = adb._get_device_id(device_name)
+            device_id = adb.get_device_id(device_name)
             logger.info(f"设备 {device_name} 的设备ID: {device_id}")
             
             # 检查设备连接状态
@@ -70,6 +91,7 @@ async def send_images_to_device(device_name: str, upload_time: int):
                 
                 if not is_connected:
                     logger.error(f"设备 {device_name} 无法连接，终止任务")
+                    _report(progress, error="device not connected")
                     return False
         except Exception as e:
             logger.error(f"检查设备连接状态时出错: {str(e)}")
@@ -105,32 +127,89 @@ async def send_images_to_device(device_name: str, upload_time: int):
         # 5. 获取本地图片文件列表
         if not local_dir.exists():
             logger.warning(f"本地图片目录不存在: {local_dir}")
+            _report(progress, error="image directory not found")
             return False
             
         image_files = list(local_dir.glob("*.*"))
         logger.info(f"找到 {len(image_files)} 个图片文件需要发送")
+        _report(progress, images_total=len(image_files))
         
         if not image_files:
             logger.warning(f"没有找到图片文件在: {local_dir}")
             return False
             
-        # 6. 逐个推送图片到设备
-        successful_transfers = 0
-        for img_path in image_files:
+        # 6. 在一次传输会话中批量推送整个imgs目录，任务重跑时跳过已推送完成的图片
+        def push_step_key(name: str) -> str:
+            return f"push:{device_name}:{upload_time}:{name}"
+        
+        pending = {p.name for p in image_files if not step_ledger.is_done(push_step_key(p.name))}
+        pushed = {"success": len(image_files) - len(pending)}
+        if pushed["success"]:
+            logger.info(f"{pushed['success']} 个图片此前已推送完成，跳过")
+        
+        # 增量模式下跳过目标目录中已有的图片，设备上其他位置有相同内容时直接在设备上复制，
+        # 比较失败时回退到全部推送
+        sync_plan = None
+        if pending and Settings.DEVICE_SYNC_MODE == "incremental":
             try:
-                remote_path = f"{remote_dir}/{img_path.name}"
-                push_cmd = ["push", str(img_path), remote_path]
-                logger.info(f"执行推送命令: adb -s {device_id} {' '.join(push_cmd)}")
-                
-                await adb.execute_device_command_async(
-                    device_name,
-                    push_cmd
-                )
-                logger.info(f"成功推送图片到设备 {device_name}: {remote_path}")
-                successful_transfers += 1
-            except ADBException as e:
-                logger.error(f"推送图片 {img_path.name} 到设备 {device_name} 失败: {str(e)}")
+                sync_plan = await plan_sync(device_name, local_dir, remote_dir, pending)
+                await apply_copies(device_name, sync_plan)
+                for name in sync_plan.unchanged:
+                    step_ledger.record(push_step_key(name), device_name, STEP_DONE, 0)
+                pushed["success"] += len(sync_plan.unchanged)
+                pending = sync_plan.to_push
+            except Exception as e:
+                logger.warning(f"比较设备 {device_name} 上的文件失败，推送全部图片: {str(e)}")
+        if pushed["success"]:
+            _report(progress, images_pushed=pushed["success"])
+        
+        def on_file_pushed(result: dict):
+            name = os.path.basename(result["local_path"])
+            if result["success"]:
+                step_ledger.record(push_step_key(name), device_name, STEP_DONE, 1)
+                if sync_plan is not None:
+                    sync_plan.record_pushed(name)
+                pushed["success"] += 1
+                _report(progress, images_pushed=pushed["success"])
+            else:
+                logger.error(f"推送图片 {name} 到设备 {device_name} 失败: {result['error']}")
+        
+        # 传输名额按发布时间（即上传时间戳）排队，不同设备的推送并行进行
+        failed = []
+        if pending:
+            async with transfer_scheduler.slot(device_name, upload_time):
+                report = await adb.push_directory_async(device_name, local_dir, remote_dir,
+                                                        on_result=on_file_pushed, names=pending)
+            failed = [r for r in report["files"] if not r["success"]]
+            logger.info(
+                f"批量推送完成: {report['success_count']}/{len(report['files'])} 文件, "
+                f"共 {report['total_bytes']} 字节, 吞吐 {report['throughput'] / 1024 / 1024:.2f} MB/s"
+            )
         
+        # 7. 只对推送失败的图片按重试策略逐个重试
+        policy = RetryPolicy.from_settings("push")
+        for result in failed:
+            name = os.path.basename(result["local_path"])
+            
+            async def push_one(result=result):
+                async with transfer_scheduler.slot(device_name, upload_time):
+                    await adb.execute_device_command_async(
+                        device_name, ["push", result["local_path"], result["remote_path"]]
+                    )
+            
+            retried = await run_step(
+                push_step_key(name), device_name, push_one, policy,
+                payload={"step": "push", "device_name": device_name, "upload_time": upload_time, "file": name},
+                attempts_made=1, last_error=result["error"]
+            )
+            if retried:
+                if sync_plan is not None:
+                    sync_plan.record_pushed(name)
+                pushed["success"] += 1
+                _report(progress, images_pushed=pushed["success"])
+        
+        successful_transfers = pushed["success"]
+        _report(progress, images_failed=len(image_files) - successful_transfers)
         logger.info(f"推送完成: {successful_transfers}/{len(image_files)} 文件成功发送到设备 {device_name}")
         logger.info(f"===== 图片发送任务结束 - 设备名: {device_name} =====")
         return successful_transfers > 0
@@ -138,7 +217,8 @@ async def send_images_to_device(device_name: str, upload_time: int):
         logger.error(f"发送图片到设备 {device_name} 时发生错误: {str(e)}", exc_info=True)
         return False
 
-async def send_upload_notification(device_name: str, upload_time: int, success: bool = True):
+async def send_upload_notification(device_name: str, upload_time: int, success: bool = True,
+                                   progress: Optional[ProgressCallback] = None) -> bool:
     """
     发送上传完成通知
     
@@ -146,6 +226,10 @@ async def send_upload_notification(device_name: str, upload_time: int, success:
         device_name: 设备名称
         upload_time: 数据上传时间戳
         success: 图片传输是否成功
+        progress: 可选的进度回调，上报notification状态
+        
+    Returns:
+        bool: 通知是否发送成功
     """
     try:
         logger.info(f"===== 开始发送通知任务 - 设备名: {device_name} =====")
@@ -156,11 +240,12 @@ async def send_upload_notification(device_name: str, upload_time: int, success:
         
         if not is_connected:
             logger.warning(f"设备 {device_name} 未连接，无法发送通知")
-            return
+            _report(progress, notification="skipped")
+            return False
         
         # 获取设备配置
         device_config = Settings.DEVICE_CONFIG[device_name]
-        device_id = adb._get_device_id(device_name)
+        device_id = adb.get_device_id(device_name)
         
         # 使用设备配置中的存储路径
         storage_path = device_config['storage_path']
@@ -174,43 +259,59 @@ async def send_upload_notification(device_name: str, upload_time: int, success:
         
         logger.info(f"执行通知命令: adb -s {device_id} {' '.join(notification_cmd)}")
         
+        sent = False
         try:
             await adb.execute_device_command_async(device_name, notification_cmd)
             logger.info(f"已发送媒体扫描通知到设备 {device_name}")
+            sent = True
         except ADBException as e:
             logger.error(f"发送通知到设备 {device_name} 失败: {str(e)}")
+        _report(progress, notification="sent" if sent else "failed")
             
         logger.info(f"===== 发送通知任务结束 - 设备名: {device_name} =====")
+        return sent
     except Exception as e:
         logger.error(f"处理设备通知时发生错误: {str(e)}", exc_info=True)
+        _report(progress, notification="failed", error=str(e))
+        return False
 
 # 立即任务调度器
-async def execute_immediate_tasks(device_name: str, upload_time: int):
+async def execute_immediate_tasks(device_name: str, upload_time: int,
+                                  progress: Optional[ProgressCallback] = None) -> bool:
     """
     执行所有立即任务的调度器
     
     集中调度所有需要立即执行的任务，统一管理异常处理和日志记录。
+    推送和通知在物理设备槽位内执行，同一手机上的其他别名任务需排队等待。
     
     Args:
         device_name: 设备名称
         upload_time: 数据上传时间戳
+        progress: 可选的进度回调，由任务队列用于记录推送和通知进度
+        
+    Returns:
+        bool: 图片推送和通知是否都成功
     """
     logger.info(f"=========================================")
     logger.info(f"开始执行立即任务 - 设备: {device_name}, 时间: {datetime.fromtimestamp(upload_time)}")
     logger.info(f"=========================================")
     
     try:
-        # 1. 执行图片发送任务
-        success = await send_images_to_device(device_name, upload_time)
-        
-        # 2. 发送操作完成通知
-        await send_upload_notification(device_name, upload_time, success)
+        async with device_scheduler.slot(device_name, f"push:{device_name}:{upload_time}"):
+            # 1. 执行图片发送任务
+            success = await send_images_to_device(device_name, upload_time, progress)
+            
+            # 2. 发送操作完成通知
+            notified = await send_upload_notification(device_name, upload_time, success, progress)
         
         logger.info(f"=========================================")
         logger.info(f"所有立即任务完成 - 设备: {device_name}")
         logger.info(f"=========================================")
+        return bool(success) and notified
     except Exception as e:
         logger.error(f"立即任务执行过程中出现未处理异常: {str(e)}", exc_info=True)
+        _report(progress, error=str(e))
+        return False
 
 # 定时执行任务
 # ===============================================
@@ -238,6 +339,10 @@ async def perform_content_automation(device_name: str, task_time: int):
     """
     执行内容自动化发布任务
     
+    连接设备和发布操作都是阻塞调用，在物理设备槽位内放到该设备专用的执行器线程中运行，
+    不阻塞事件循环。发布失败或超时时按重试策略重新执行发布步骤，已点击发布按钮后不再重试；
+    任务被取消时通知发布操作停止并继续抛出取消异常。
+    
     Args:
         device_name: 设备名称
         task_time: 计划执行时间戳
@@ -254,14 +359,6 @@ async def perform_content_automation(device_name: str, task_time: int):
         title, content = await get_content_from_file(device_name, task_time)
         logger.info(f"准备发布内容 - 标题: {title if title else '[无标题]'}, 正文长度: {len(content) if content else 0}")
             
-        # 初始化自动化实例
-        automation = AndroidAutomation(device_name)
-        
-        # 连接设备
-        if not automation.connect_device():
-            logger.error(f"设备 {device_name} 连接失败")
-            return False
-            
         # 构建图片路径
         time_dir = datetime.fromtimestamp(task_time).strftime("%Y%m%d%H%M%S")
         local_dir = UPLOAD_DIR / device_name / time_dir / "imgs"
@@ -276,14 +373,46 @@ async def perform_content_automation(device_name: str, task_time: int):
         if not image_paths:
             logger.error(f"未找到需要发布的图片: {local_dir}")
             return False
+        
+        timeout = Settings.AUTOMATION_CONFIG['POST_TIMEOUT']
+        
+        async def publish():
+            # 每次尝试使用新的自动化实例，避免沿用上次超时设置的取消标记
+            automation = AndroidAutomation(device_name)
             
-        # 执行发布操作
-        success, status = automation.post_content(title, content, image_paths)
+            def run_automation():
+                # 连接设备并执行发布操作（在设备执行器线程中运行）
+                if not automation.connect_device():
+                    return False, "CONNECT_FAILED"
+                return automation.post_content(title, content, image_paths)
+            
+            try:
+                async with device_scheduler.slot(device_name, f"post:{device_name}:{task_time}"):
+                    success, status = await device_executor.run(
+                        automation.device_id, run_automation,
+                        timeout=timeout, cancel_event=automation.cancel_event
+                    )
+            except asyncio.TimeoutError:
+                status = f"TIMEOUT({timeout}s)"
+                success = False
+            
+            if success:
+                return
+            logger.error(f"内容发布失败 - 设备: {device_name}, 状态: {status}")
+            # 超时时device_executor.run已等待发布线程结束，publish_clicked不会再变化
+            if automation.publish_clicked:
+                # 已点击发布按钮，重试可能导致重复发布
+                raise NonRetryableError(f"{status} after publish clicked")
+            raise Exception(status)
+        
+        success = await run_step(
+            f"publish:{device_name}:{task_time}", device_name, publish,
+            RetryPolicy.from_settings("publish"),
+            payload={"step": "publish", "device_name": device_name, "task_time": task_time}
+        )
         
         if success:
             logger.info(f"内容发布成功 - 设备: {device_name}")
-        else:
-            logger.error(f"内容发布失败 - 设备: {device_name}, 状态: {status}")
             
         return success
         
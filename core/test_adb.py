@@ -1,12 +1,31 @@
 """
 ADB模块测试脚本
 
-用于测试ADB连接和基本功能是否正常工作
+用于测试ADB连接和基本功能是否正常工作：
+1. 真实设备的连接测试
+2. 基于本地模拟ADB服务器的套接字引擎测试（无需真实设备）
+3. 异步子进程执行器的输出流、超时和取消测试
 """
 
 import asyncio
 import logging
+import os
+import queue
+import re
+import socketserver
+import struct
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from unittest.mock import patch
+from adbutils.errors import AdbConnectionError
 from core.adb import adb, ADBException
+from core.adb_engine import SocketADBEngine
+from core.adb_process import AsyncProcessRunner
+from core.config import Settings
+from core.device_registry import DeviceRegistry
+from core.transfer_scheduler import BandwidthLimiter, TransferScheduler
 
 # 配置日志
 logging.basicConfig(
@@ -15,6 +34,167 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+FAKE_SERIAL = "FAKE0001"
+
+class FakeADBHandler(socketserver.BaseRequestHandler):
+    """模拟ADB服务器的单个连接，支持devices、track-devices、transport、shell、exec:sh和sync服务"""
+
+    def _read_exact(self, n: int) -> bytes:
+        data = b""
+        while len(data) < n:
+            chunk = self.request.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError("client closed")
+            data += chunk
+        return data
+
+    def _reply_block(self, payload: str):
+        data = payload.encode()
+        self.request.sendall(b"OKAY" + f"{len(data):04x}".encode() + data)
+
+    def handle(self):
+        server = self.server
+        try:
+            while True:
+                length = int(self._read_exact(4), 16)
+                command = self._read_exact(length).decode()
+                server.commands.append(command)
+                if command == "host:version":
+                    self._reply_block("0029")
+                    return
+                if command == "host:devices":
+                    self._reply_block(f"{FAKE_SERIAL}\tdevice\n")
+                    return
+                if command == "host:track-devices":
+                    self._handle_track()
+                    return
+                if command == f"host:transport:{FAKE_SERIAL}":
+                    self.request.sendall(b"OKAY")
+                    continue
+                if command == f"host:tport:serial:{FAKE_SERIAL}":
+                    self.request.sendall(b"OKAY" + struct.pack("<Q", 1))
+                    continue
+                if command.startswith("shell:"):
+                    self._handle_shell(command[len("shell:"):])
+                    return
+                if command == "exec:sh" and server.exec_supported:
+                    server.exec_sessions += 1
+                    self.request.sendall(b"OKAY")
+                    self._handle_exec_sh()
+                    return
+                if command == "sync:":
+                    server.sync_connections += 1
+                    self.request.sendall(b"OKAY")
+                    self._handle_sync()
+                    return
+                message = f"unknown command: {command}".encode()
+                self.request.sendall(b"FAIL" + f"{len(message):04x}".encode() + message)
+                return
+        except ConnectionError:
+            pass
+
+    def _handle_track(self):
+        """发送当前设备列表，之后每次有更新时推送完整列表"""
+        self.request.sendall(b"OKAY")
+        payload = f"{FAKE_SERIAL}\tdevice\n"
+        while True:
+            data = payload.encode()
+            self.request.sendall(f"{len(data):04x}".encode() + data)
+            while True:
+                try:
+                    payload = self.server.track_updates.get(timeout=0.1)
+                    break
+                except queue.Empty:
+                    if self.server.stopped:
+                        return
+
+    def _run_fake_command(self, command: str):
+        """执行模拟shell命令：以false开头的命令返回退出码1，echo原样输出"""
+        self.server.shell_commands.append(command)
+        if command.startswith("false"):
+            return 1, ""
+        if command.startswith("echo "):
+            return 0, command[len("echo "):] + "\n"
+        return 0, ""
+
+    def _handle_shell(self, command: str):
+        returncode, output = self._run_fake_command(command.partition("; echo X4EXIT:$?")[0])
+        output += f"X4EXIT:{returncode}\n"
+        self.request.sendall(b"OKAY" + output.encode())
+
+    def _handle_exec_sh(self):
+        """模拟常驻sh：逐行读取 ( 命令 ) </dev/null 2>&1; echo 标记 $? 并输出结果和结束标记"""
+        pattern = re.compile(r"^\( (.*) \) </dev/null 2>&1; echo (\S+) \$\?$")
+        buffer = b""
+        while True:
+            while b"\n" not in buffer:
+                chunk = self.request.recv(4096)
+                if not chunk or self.server.exec_kill:
+                    self.server.exec_kill = False
+                    return
+                buffer += chunk
+            line, buffer = buffer.split(b"\n", 1)
+            match = pattern.match(line.decode())
+            returncode, output = self._run_fake_command(match.group(1))
+            self.request.sendall(f"{output}{match.group(2)} {returncode}\n".encode())
+
+    def _handle_sync(self):
+        """处理sync会话中的STAT/SEND/QUIT请求"""
+        server = self.server
+        while True:
+            cmd = self._read_exact(4)
+            length = struct.unpack("<I", self._read_exact(4))[0]
+            path = self._read_exact(length).decode()
+            if cmd == b"QUIT":
+                return
+            if cmd == b"STAT":
+                mode = 0o040755 if path.rstrip("/") in server.dirs else 0
+                self.request.sendall(b"STAT" + struct.pack("<III", mode, 0, 0))
+            elif cmd == b"SEND":
+                remote_path = path.rsplit(",", 1)[0]
+                content = b""
+                while True:
+                    chunk_id = self._read_exact(4)
+                    size = struct.unpack("<I", self._read_exact(4))[0]
+                    if chunk_id == b"DONE":
+                        break
+                    content += self._read_exact(size)
+                if remote_path in server.fail_paths:
+                    message = b"Permission denied"
+                    self.request.sendall(b"FAIL" + struct.pack("<I", len(message)) + message)
+                    return
+                server.files[remote_path] = content
+                self.request.sendall(b"OKAY" + struct.pack("<I", 0))
+
+class FakeADBServer(socketserver.ThreadingTCPServer):
+    """本地模拟ADB服务器，记录收到的命令和推送的文件"""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeADBHandler)
+        self.commands = []
+        self.shell_commands = []
+        self.files = {}
+        self.dirs = {"/sdcard/Pictures"}
+        self.fail_paths = set()
+        self.sync_connections = 0
+        self.exec_sessions = 0
+        self.exec_kill = False  # 为True时常驻sh在收到下一条命令时直接断开
+        self.exec_supported = True
+        self.track_updates = queue.Queue()
+        self.stopped = False
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def stop(self):
+        self.stopped = True
+        self.shutdown()
+        self.server_close()
+
 async def test_adb_connection():
     """测试ADB连接功能"""
     logger.info("=== 开始ADB连接测试 ===")
@@ -23,7 +203,265 @@ async def test_adb_connection():
     connected_devices = adb.update_connected_devices()
     logger.info(f"当前连接的设备: {connected_devices}")
 
+def test_socket_engine_shell():
+    """测试套接字引擎执行shell命令并获取退出码"""
+    server = FakeADBServer()
+    engine = SocketADBEngine(host="127.0.0.1", port=server.port)
+    try:
+        assert engine.shell(FAKE_SERIAL, "echo hello") == (0, "hello")
+        returncode, _ = engine.shell(FAKE_SERIAL, "false")
+        assert returncode == 1
+        assert server.shell_commands == ["echo hello", "false"]
+    finally:
+        engine.close()
+        server.stop()
+
+def test_socket_engine_persistent_shell():
+    """测试shell命令复用常驻sh会话，会话断开后自动重建，不支持exec时回退到shell服务"""
+    server = FakeADBServer()
+    engine = SocketADBEngine(host="127.0.0.1", port=server.port)
+    try:
+        assert engine.shell(FAKE_SERIAL, "echo a") == (0, "a")
+        assert engine.shell(FAKE_SERIAL, "false") == (1, "")
+        assert engine.shell(FAKE_SERIAL, "echo b c") == (0, "b c")
+        assert server.exec_sessions == 1
+
+        server.exec_kill = True
+        assert engine.shell(FAKE_SERIAL, "echo again") == (0, "again")
+        assert server.exec_sessions == 2
+
+        engine.drop_device(FAKE_SERIAL)
+        server.exec_supported = False
+        assert engine.shell(FAKE_SERIAL, "echo fallback") == (0, "fallback")
+        assert engine.shell(FAKE_SERIAL, "echo fallback") == (0, "fallback")
+        assert server.commands.count("exec:sh") == 3
+        assert server.shell_commands == ["echo a", "false", "echo b c", "echo again", "echo fallback", "echo fallback"]
+    finally:
+        engine.close()
+        server.stop()
+
+def test_socket_engine_push_reuses_sync_connection():
+    """测试连续推送复用同一个sync连接，且推送到目录时使用本地文件名"""
+    server = FakeADBServer()
+    engine = SocketADBEngine(host="127.0.0.1", port=server.port)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        first = os.path.join(tmp_dir, "a.jpg")
+        second = os.path.join(tmp_dir, "b.jpg")
+        with open(first, "wb") as f:
+            f.write(b"a" * 200000)
+        with open(second, "wb") as f:
+            f.write(b"b" * 10)
+        try:
+            assert engine.push(FAKE_SERIAL, first, "/sdcard/Pictures/x.jpg") == 200000
+            assert engine.push(FAKE_SERIAL, second, "/sdcard/Pictures") == 10
+            assert server.files["/sdcard/Pictures/x.jpg"] == b"a" * 200000
+            assert server.files["/sdcard/Pictures/b.jpg"] == b"b" * 10
+            assert server.sync_connections == 1
+        finally:
+            engine.close()
+            server.stop()
+
+def test_push_many_raises_without_server():
+    """测试无法连接ADB服务器时批量推送抛出AdbConnectionError，由调用方回退到adb进程"""
+    server = FakeADBServer()
+    port = server.port
+    server.stop()
+    engine = SocketADBEngine(host="127.0.0.1", port=port)
+    try:
+        engine.push_many(FAKE_SERIAL, [(__file__, "/sdcard/Pictures/a.jpg")])
+        raise AssertionError("expected AdbConnectionError")
+    except AdbConnectionError:
+        pass
+
+def test_push_directory_single_session():
+    """测试批量推送整个目录：正常时只用一个sync连接，单个文件失败后为剩余文件重建连接"""
+    server = FakeADBServer()
+    server.fail_paths.add("/sdcard/Pictures/post/b.jpg")
+    original_engine = adb.engine
+    adb.engine = SocketADBEngine(host="127.0.0.1", port=server.port)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, size in (("a.jpg", 100), ("b.jpg", 20), ("c.jpg", 30)):
+            with open(os.path.join(tmp_dir, name), "wb") as f:
+                f.write(name[0].encode() * size)
+        pushed = []
+
+        async def run():
+            return await adb.push_directory_async(
+                FAKE_SERIAL, Path(tmp_dir), "/sdcard/Pictures/post",
+                on_result=lambda result: pushed.append(result["success"])
+            )
+
+        try:
+            report = asyncio.run(run())
+            assert [f["success"] for f in report["files"]] == [True, False, True]
+            assert pushed == [True, False, True]
+            assert report["success_count"] == 2
+            assert report["total_bytes"] == 130
+            assert "Permission denied" in report["files"][1]["error"]
+            assert server.files["/sdcard/Pictures/post/c.jpg"] == b"c" * 30
+            assert server.sync_connections == 2
+        finally:
+            adb.engine.close()
+            adb.engine = original_engine
+            server.stop()
+
+def test_execute_device_command_uses_engine():
+    """测试execute_device_command_async的shell和push走套接字引擎，失败时抛出ADBException"""
+    server = FakeADBServer()
+    original_engine = adb.engine
+    adb.engine = SocketADBEngine(host="127.0.0.1", port=server.port)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        local_path = os.path.join(tmp_dir, "c.png")
+        with open(local_path, "wb") as f:
+            f.write(b"c")
+
+        async def run():
+            assert await adb.execute_device_command_async(FAKE_SERIAL, ["shell", "echo", "ok"]) == "ok"
+            assert await adb.push_file_async(FAKE_SERIAL, local_path, "/sdcard/Pictures/c.png")
+            try:
+                await adb.execute_device_command_async(FAKE_SERIAL, ["shell", "false"])
+                raise AssertionError("expected ADBException")
+            except ADBException:
+                pass
+
+        try:
+            asyncio.run(run())
+            assert server.files["/sdcard/Pictures/c.png"] == b"c"
+        finally:
+            adb.engine.close()
+            adb.engine = original_engine
+            server.stop()
+
+def test_device_registry_tracks_devices():
+    """测试注册表通过track-devices维护设备状态，并触发上线和下线回调"""
+    server = FakeADBServer()
+    registry = DeviceRegistry(poll=set, host="127.0.0.1", port=server.port)
+    events = []
+
+    async def wait_until(predicate):
+        for _ in range(50):
+            if predicate():
+                return
+            await asyncio.sleep(0.05)
+        raise AssertionError("condition not met")
+
+    async def run():
+        registry.add_listener(lambda serial, connected, status: events.append((serial, connected)))
+        registry.start()
+        try:
+            await wait_until(lambda: registry.is_connected(FAKE_SERIAL))
+            assert registry.is_fresh()
+            server.track_updates.put("")
+            await wait_until(lambda: not registry.is_connected(FAKE_SERIAL))
+            await asyncio.sleep(0)  # 等待回调在事件循环中执行
+        finally:
+            registry.stop()
+
+    try:
+        asyncio.run(run())
+        assert events == [(FAKE_SERIAL, True), (FAKE_SERIAL, False)]
+    finally:
+        server.stop()
+
+def test_process_runner_stream_timeout_cancel():
+    """测试子进程执行器逐行回调输出（含超长行）、按设备限制并发，超时和取消时结束子进程"""
+    runner = AsyncProcessRunner(max_concurrency=8, per_device=1, kill_grace=1)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        marker = os.path.join(tmp_dir, "still_running")
+        slow = [sys.executable, "-c", f"import time; time.sleep(0.5); open({marker!r}, 'w').close()"]
+
+        async def run():
+            lines = []
+            code, stdout, _ = await runner.run(
+                [sys.executable, "-c", "print('a'); print('b')"], on_line=lines.append
+            )
+            assert code == 0 and lines == ["a", "b"] and stdout.split() == ["a", "b"]
+
+            # 超过64KiB的单行输出不应触发StreamReader的长度限制
+            lines = []
+            code, stdout, _ = await runner.run(
+                [sys.executable, "-c", "print('x' * 200000); print('y')"], on_line=lines.append
+            )
+            assert code == 0 and [len(line) for line in lines] == [200000, 1]
+
+            peak = 0
+            async def track(cmd):
+                nonlocal peak
+                task = asyncio.ensure_future(runner.run(cmd, device_id=FAKE_SERIAL))
+                while not task.done():
+                    peak = max(peak, runner.running)
+                    await asyncio.sleep(0.01)
+                return task.result()
+            short = [sys.executable, "-c", "import time; time.sleep(0.1)"]
+            await asyncio.gather(track(short), track(short))
+            assert peak == 1
+
+            try:
+                await runner.run(slow, timeout=0.1)
+                raise AssertionError("expected TimeoutError")
+            except asyncio.TimeoutError:
+                pass
+
+            task = asyncio.ensure_future(runner.run(slow))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            try:
+                await task
+                raise AssertionError("expected CancelledError")
+            except asyncio.CancelledError:
+                pass
+            assert runner.running == 0
+
+            await asyncio.sleep(0.8)
+            assert not os.path.exists(marker)
+
+        asyncio.run(run())
+
+def test_transfer_scheduler_order_and_pacing():
+    """测试传输调度按发布时间放行、遵守集线器上限，以及带宽限速器的等待时间"""
+    scheduler = TransferScheduler(max_transfers=2, per_hub=1)
+    config = {"hubA1": {"hub": "A"}, "hubA2": {"hub": "A"}, "hubB": {"hub": "B"}}
+
+    async def run():
+        order = []
+        release = asyncio.Event()
+
+        async def transfer(device_name, publish_time):
+            async with scheduler.slot(device_name, publish_time):
+                order.append(device_name)
+                await release.wait()
+
+        with patch.dict(Settings.DEVICE_CONFIG, config):
+            first = asyncio.ensure_future(transfer("hubA1", 300))
+            await asyncio.sleep(0)
+            late = asyncio.ensure_future(transfer("hubA2", 200))
+            early = asyncio.ensure_future(transfer("hubA1", 100))
+            other = asyncio.ensure_future(transfer("hubB", 400))
+            await asyncio.sleep(0.01)
+            # 集线器A已满，B上的传输不受A排队的影响
+            assert order == ["hubA1", "hubB"] and scheduler.waiting() == 2
+            release.set()
+            await asyncio.gather(first, late, early, other)
+        assert order == ["hubA1", "hubB", "hubA1", "hubA2"]
+        assert scheduler.stats()["completed"] == 4 and scheduler.stats()["running"] == {}
+
+    asyncio.run(run())
+
+    limiter = BandwidthLimiter(rate=1000, burst=100)
+    assert limiter.reserve(100) == 0.0
+    assert abs(limiter.reserve(500) - 0.5) < 0.01
+    assert BandwidthLimiter(rate=0, burst=0).reserve(10 ** 9) == 0.0
 
 if __name__ == "__main__":
     # 运行测试
-    asyncio.run(test_adb_connection()) 
\ No newline at end of file
+    test_socket_engine_shell()
+    test_socket_engine_persistent_shell()
+    test_socket_engine_push_reuses_sync_connection()
+    test_push_many_raises_without_server()
+    test_push_directory_single_session()
+    test_execute_device_command_uses_engine()
+    test_device_registry_tracks_devices()
+    test_process_runner_stream_timeout_cancel()
+    test_transfer_scheduler_order_and_pacing()
+    logger.info("=== 套接字引擎测试通过 ===")
+    asyncio.run(test_adb_connection())
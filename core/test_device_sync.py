@@ -0,0 +1,156 @@
+"""
+设备增量同步测试脚本
+
+用于测试推送前的文件比较，无需真实设备（设备上的shell命令在本机的临时目录中执行）：
+1. 已推送且记录在远程文件索引中的文件直接跳过，不在设备上计算sha256
+2. 索引中没有记录的同名同大小文件用sha256sum校验
+3. 设备上其他目录中的相同内容直接复制，已被修改的记录从索引中删除
+4. 目录不存在时视为空目录，列表命令失败时抛出异常
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from unittest.mock import patch
+from core import device_sync as device_sync_module
+from core.adb import ADBException
+from core.device_sync import RemoteFileIndex, apply_copies, plan_sync
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# deviceA和deviceA_sys2是同一台手机的两个系统，deviceB是另一台手机
+SERIAL = device_sync_module.adb.get_device_id("deviceA")
+
+class FakeDevice:
+    """在本机执行shell命令的模拟设备，记录执行过的命令"""
+
+    def __init__(self):
+        self.commands = []
+
+    async def execute_device_command_async(self, device_name, command_args):
+        assert command_args[0] == "shell"
+        self.commands.append(command_args[1])
+        result = subprocess.run(["sh", "-c", command_args[1]], capture_output=True, text=True)
+        return result.stdout
+
+    def ran(self, program: str) -> bool:
+        """是否执行过包含指定程序的命令"""
+        return any(program in command for command in self.commands)
+
+@contextmanager
+def isolated_device(tmp_dir: str):
+    """把设备命令和远程文件索引替换为模拟设备和临时数据库"""
+    device = FakeDevice()
+    index = RemoteFileIndex(Path(tmp_dir) / "jobs.db")
+    with patch.object(device_sync_module.adb, "execute_device_command_async", device.execute_device_command_async), \
+            patch.object(device_sync_module, "remote_index", index):
+        yield device, index
+
+def make_post(root: Path, files: dict) -> Path:
+    """创建本地图片目录（不写清单，sha256在线程池中计算）"""
+    local_dir = root / "post" / "imgs"
+    local_dir.mkdir(parents=True)
+    for name, data in files.items():
+        (local_dir / name).write_bytes(data)
+    return local_dir
+
+def push(local_dir: Path, remote_dir: Path, names) -> None:
+    """模拟adb push：复制文件并保留修改时间"""
+    remote_dir.mkdir(parents=True, exist_ok=True)
+    for name in names:
+        shutil.copy2(local_dir / name, remote_dir / name)
+
+def test_pushed_files_are_skipped():
+    """测试推送过的文件按索引跳过，无记录的同名文件用sha256sum校验，内容不同的重新推送"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir, isolated_device(tmp_dir) as (device, index):
+            root = Path(tmp_dir)
+            local_dir = make_post(root, {"a.jpg": b"aaaa", "b.jpg": b"bbbb", "c.jpg": b"cccc"})
+            remote_dir = root / "device" / "DCIM" / "post"
+            names = {"a.jpg", "b.jpg", "c.jpg"}
+
+            plan = await plan_sync("deviceA", local_dir, str(remote_dir), names)
+            assert plan.to_push == names and not plan.unchanged
+
+            push(local_dir, remote_dir, ["a.jpg"])
+            plan.record_pushed("a.jpg")
+            push(local_dir, remote_dir, ["b.jpg"])
+            (remote_dir / "c.jpg").write_bytes(b"CCCC")
+
+            device.commands.clear()
+            plan = await plan_sync("deviceA", local_dir, str(remote_dir), names)
+            assert plan.unchanged == {"a.jpg", "b.jpg"} and plan.to_push == {"c.jpg"}
+            assert "a.jpg" not in next(command for command in device.commands if "sha256sum" in command)
+            assert index.get(SERIAL, str(remote_dir / "b.jpg")) is not None
+
+            device.commands.clear()
+            plan = await plan_sync("deviceA", local_dir, str(remote_dir), {"a.jpg", "b.jpg"})
+            assert plan.unchanged == {"a.jpg", "b.jpg"} and not device.ran("sha256sum")
+
+    asyncio.run(run())
+
+def test_copies_from_other_directory():
+    """测试同一手机上其他目录中未被修改的相同内容在设备上复制，已被修改的改为推送并删除记录"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir, isolated_device(tmp_dir) as (device, index):
+            root = Path(tmp_dir)
+            local_dir = make_post(root, {"a.jpg": b"aaaa", "b.jpg": b"bbbb"})
+            first_dir = root / "device" / "DCIM" / "first"
+            plan = await plan_sync("deviceA", local_dir, str(first_dir), {"a.jpg", "b.jpg"})
+            push(local_dir, first_dir, plan.to_push)
+            for name in plan.to_push:
+                plan.record_pushed(name)
+            (first_dir / "b.jpg").write_bytes(b"BBBB")
+            os.utime(first_dir / "b.jpg", (1600000000, 1600000000))  # 与推送时的修改时间不同
+
+            second_dir = root / "device" / "DCIM" / "second"
+            second_dir.mkdir()
+            plan = await plan_sync("deviceA_sys2", local_dir, str(second_dir), {"a.jpg", "b.jpg"})
+            assert set(plan.copies) == {"a.jpg"} and plan.copies["a.jpg"][0] == str(first_dir / "a.jpg")
+            assert plan.to_push == {"b.jpg"}
+            assert index.get(SERIAL, str(first_dir / "b.jpg")) is None
+
+            await apply_copies("deviceA_sys2", plan)
+            assert not plan.copies and plan.unchanged == {"a.jpg"}
+            assert (second_dir / "a.jpg").read_bytes() == b"aaaa"
+            assert index.get(SERIAL, str(second_dir / "a.jpg")) is not None
+
+            # 其他手机上的记录不参与查找
+            plan = await plan_sync("deviceB", local_dir, str(root / "device" / "DCIM" / "third"), {"a.jpg"})
+            assert plan.to_push == {"a.jpg"} and not plan.copies
+
+    asyncio.run(run())
+
+def test_listing_failure_raises():
+    """测试列表命令没有正常结束时抛出异常，而不是当作空目录"""
+    async def broken(device_name, command_args):
+        return "find: unknown option -maxdepth\n"
+
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir, isolated_device(tmp_dir):
+            local_dir = make_post(Path(tmp_dir), {"a.jpg": b"aaaa"})
+            with patch.object(device_sync_module.adb, "execute_device_command_async", broken):
+                try:
+                    await plan_sync("deviceA", local_dir, "/sdcard/DCIM/post", {"a.jpg"})
+                    raise AssertionError("expected ADBException")
+                except ADBException as e:
+                    assert "/sdcard/DCIM/post" in str(e)
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    # 运行测试
+    test_pushed_files_are_skipped()
+    test_copies_from_other_directory()
+    test_listing_failure_raises()
+    logger.info("=== 设备增量同步测试通过 ===")
@@ -0,0 +1,133 @@
+"""
+定时任务存储测试脚本
+
+用于测试SQLite任务存储，无需真实设备：
+1. 重新打开数据库后任务完整恢复
+2. 按执行时间读取到期任务和下次执行时间
+3. 不反序列化任务的索引查询
+4. 无法恢复的任务被删除
+"""
+
+import asyncio
+import logging
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from apscheduler.jobstores.base import ConflictingIdError, JobLookupError
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from core.job_store import SQLiteJobStore
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def publish(device_name: str, task_time: int) -> None:
+    """测试用的任务函数，序列化时按模块路径引用"""
+
+def open_scheduler(db_path: Path):
+    """
+    打开任务存储并以暂停状态启动调度器
+
+    调度器绑定到一个不运行的事件循环，任务不会被执行，也没有后台线程访问存储。
+    """
+    store = SQLiteJobStore(db_path)
+    scheduler = AsyncIOScheduler(timezone=timezone.utc, jobstores={"default": store},
+                                 event_loop=asyncio.new_event_loop())
+    scheduler.start(paused=True)
+    return scheduler, store
+
+def close_scheduler(scheduler: AsyncIOScheduler) -> None:
+    """关闭调度器（同时关闭任务存储）和它的事件循环"""
+    scheduler.shutdown(wait=False)
+    scheduler._eventloop.close()
+
+def test_jobs_survive_reopen():
+    """测试关闭后重新打开数据库，任务的参数、ID和执行时间保持不变"""
+    now = datetime.now(timezone.utc)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / "scheduler.db"
+        scheduler, store = open_scheduler(db_path)
+        for index in range(50):
+            scheduler.add_job(
+                publish, "date", run_date=now + timedelta(minutes=index + 1), id=f"post:deviceA:{index}",
+                kwargs={"device_name": "deviceA" if index % 2 else "deviceB", "task_time": index}
+            )
+        try:
+            store.add_job(store.lookup_job("post:deviceA:0"))
+            raise AssertionError("expected ConflictingIdError")
+        except ConflictingIdError:
+            pass
+        close_scheduler(scheduler)
+
+        scheduler, store = open_scheduler(db_path)
+        try:
+            assert store.count() == 50 and len(store.job_ids()) == 50
+            jobs = scheduler.get_jobs()
+            assert [job.id for job in jobs] == [f"post:deviceA:{index}" for index in range(50)]
+            assert jobs[3].kwargs == {"device_name": "deviceA", "task_time": 3}
+            assert jobs[3].func is publish
+            assert abs((jobs[3].next_run_time - (now + timedelta(minutes=4))).total_seconds()) < 1e-3
+            assert abs((store.get_next_run_time() - (now + timedelta(minutes=1))).total_seconds()) < 1e-3
+            due = store.get_due_jobs(now + timedelta(minutes=3, seconds=30))
+            assert [job.id for job in due] == ["post:deviceA:0", "post:deviceA:1", "post:deviceA:2"]
+        finally:
+            close_scheduler(scheduler)
+
+def test_index_queries_and_removal():
+    """测试按设备和时间范围查询、执行时间冲突查询，以及删除不存在的任务"""
+    base = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        scheduler, store = open_scheduler(Path(tmp_dir) / "scheduler.db")
+        try:
+            for index, device in enumerate(["deviceA", "deviceB", "deviceA", "deviceC"]):
+                scheduler.add_job(
+                    publish, "date", run_date=base + timedelta(minutes=10 * index), id=f"job{index}",
+                    kwargs={"device_name": device, "task_time": index}
+                )
+            found = store.find_jobs(device_name="deviceA")
+            assert found["total"] == 2 and [item["id"] for item in found["items"]] == ["job0", "job2"]
+            start = base.timestamp()
+            assert store.find_jobs(start=start + 1, limit=1)["items"][0]["id"] == "job1"
+            assert store.run_times(["deviceA", "deviceC"], start - 1, start + 3600) == [
+                start, start + 1200, start + 1800
+            ]
+            assert store.run_times(["deviceA"], start - 1, start + 3600, exclude_id="job0") == [start + 1200]
+
+            store.update_job(store.lookup_job("job0"))
+            store.remove_job("job1")
+            for job_id in ("job1", "missing"):
+                try:
+                    store.remove_job(job_id)
+                    raise AssertionError("expected JobLookupError")
+                except JobLookupError:
+                    pass
+            assert store.count() == 3
+        finally:
+            close_scheduler(scheduler)
+
+def test_unrestorable_job_is_removed():
+    """测试序列化状态损坏的任务在加载时被删除，不影响其他任务"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        scheduler, store = open_scheduler(Path(tmp_dir) / "scheduler.db")
+        try:
+            scheduler.add_job(publish, "date", run_date=datetime(2030, 1, 1, tzinfo=timezone.utc), id="good",
+                              kwargs={"device_name": "deviceA", "task_time": 1})
+            with store._lock:
+                store._conn.execute(
+                    "INSERT INTO scheduled_jobs (id, next_run_time, device_name, task_time, job_state) "
+                    "VALUES ('broken', 0, 'deviceA', 2, x'00')"
+                )
+            assert [job.id for job in store.get_all_jobs()] == ["good"]
+            assert store.job_ids() == ["good"]
+        finally:
+            close_scheduler(scheduler)
+
+if __name__ == "__main__":
+    # 运行测试
+    test_jobs_survive_reopen()
+    test_index_queries_and_removal()
+    test_unrestorable_job_is_removed()
+    logger.info("=== 定时任务存储测试通过 ===")
@@ -0,0 +1,195 @@
+"""
+定时任务调度测试脚本
+
+用于测试定时发布任务的调度，无需真实设备：
+1. 按设备和时间戳生成任务ID，重复提交时按策略跳过或替换
+2. 同一时间戳的立即任务只登记一次
+3. 定时任务的查询、改期、取消和立即执行
+4. 同一手机和同一账号的发布间隔
+"""
+
+import asyncio
+import logging
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+from apscheduler.events import EVENT_JOB_ADDED, EVENT_JOB_REMOVED, EVENT_ALL_JOBS_REMOVED
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from core import scheduler as scheduler_module
+from core.config import Settings
+from core.job_queue import DeviceJobQueue, STATUS_FAILED
+from core.job_store import SQLiteJobStore
+from core.scheduler import (
+    add_job, allocate_post_slot, cancel_job, get_scheduled_job, reschedule_job, run_job_now, scheduled_job_id
+)
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# record_run执行过的任务时间戳
+RUNS = []
+
+def publish(device_name: str, task_time: int) -> None:
+    """测试用的任务函数"""
+
+def record_run(device_name: str, task_time: int) -> None:
+    """测试用的任务函数，记录执行过的任务"""
+    RUNS.append(task_time)
+
+@contextmanager
+def isolated_scheduler(tmp_dir: str):
+    """
+    把调度器和任务存储替换为临时数据库上的新实例并启动
+
+    需要在运行中的事件循环内使用。
+    """
+    store = SQLiteJobStore(Path(tmp_dir) / "scheduler.db")
+    scheduler = AsyncIOScheduler(timezone=Settings.SCHEDULER_TIMEZONE, jobstores={"default": store})
+    scheduler.add_listener(scheduler_module._on_job_event,
+                           EVENT_JOB_ADDED | EVENT_JOB_REMOVED | EVENT_ALL_JOBS_REMOVED)
+    with patch.object(scheduler_module, "job_store", store), patch.object(scheduler_module, "scheduler", scheduler):
+        scheduler_module.start_scheduler()
+        try:
+            yield scheduler
+        finally:
+            scheduler_module.stop_scheduler()
+
+def in_hours(hours: float) -> datetime:
+    """当前时间之后若干小时（调度器时区）"""
+    return datetime.now(tz=Settings.SCHEDULER_TIMEZONE) + timedelta(hours=hours)
+
+def test_duplicate_scheduled_posts():
+    """测试同一设备同一时间戳重复提交时默认保留已有任务，显式替换时更新执行时间"""
+    assert scheduled_job_id("deviceA", 1700000000) == "post:deviceA:1700000000"
+
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir, isolated_scheduler(tmp_dir):
+            job_id = scheduled_job_id("deviceA", 1)
+            first = add_job(publish, in_hours(1), job_id=job_id, device_name="deviceA", task_time=1)
+            second = add_job(publish, in_hours(2), job_id=job_id, device_name="deviceA", task_time=1)
+            assert second.id == first.id and second.next_run_time == first.next_run_time
+            assert scheduler_module.job_store.count() == 1
+
+            replaced = add_job(publish, in_hours(2), job_id=job_id, replace_existing=True,
+                               device_name="deviceA", task_time=1)
+            assert replaced.next_run_time > first.next_run_time
+            assert scheduler_module.job_store.count() == 1
+
+            assert add_job(publish, in_hours(-1), job_id=scheduled_job_id("deviceA", 2),
+                           device_name="deviceA", task_time=2) is None
+
+    asyncio.run(run())
+
+def test_duplicate_immediate_jobs():
+    """测试上传重试时立即任务不重复登记，已失败的任务允许重新登记"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        queue = DeviceJobQueue(Path(tmp_dir) / "jobs.db")
+        first = queue.enqueue("deviceA", 1700000000)
+        assert queue.enqueue("deviceA", 1700000000)["id"] == first["id"]
+        assert queue.enqueue("deviceB", 1700000000)["id"] != first["id"]
+
+        queue.update(first["id"], status=STATUS_FAILED)
+        assert queue.enqueue("deviceA", 1700000000)["id"] != first["id"]
+
+def test_reschedule_cancel_and_run_now():
+    """测试改期、取消和立即执行，以及任务不存在或时间已过时的错误"""
+    RUNS.clear()
+
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir, isolated_scheduler(tmp_dir):
+            for timestamp in (1, 2, 3):
+                add_job(record_run, in_hours(timestamp), job_id=scheduled_job_id("deviceA", timestamp),
+                        device_name="deviceA", task_time=timestamp)
+
+            target = in_hours(5)
+            summary = reschedule_job(scheduled_job_id("deviceA", 1), target)
+            assert summary["task_time"] == 1 and summary["next_run_time"] == target.timestamp()
+            assert get_scheduled_job(scheduled_job_id("deviceA", 1))["next_run_time"] == target.timestamp()
+            for job_id, run_time, error in ((scheduled_job_id("deviceA", 1), in_hours(-1), ValueError),
+                                            ("missing", in_hours(1), JobLookupError)):
+                try:
+                    reschedule_job(job_id, run_time)
+                    raise AssertionError(f"expected {error.__name__}")
+                except error:
+                    pass
+
+            cancel_job(scheduled_job_id("deviceA", 2))
+            assert get_scheduled_job(scheduled_job_id("deviceA", 2)) is None
+            try:
+                cancel_job(scheduled_job_id("deviceA", 2))
+                raise AssertionError("expected JobLookupError")
+            except JobLookupError:
+                pass
+
+            summary = run_job_now(scheduled_job_id("deviceA", 3))
+            assert summary["next_run_time"] <= datetime.now(tz=Settings.SCHEDULER_TIMEZONE).timestamp()
+            for _ in range(100):
+                if RUNS:
+                    break
+                await asyncio.sleep(0.02)
+            assert RUNS == [3] and get_scheduled_job(scheduled_job_id("deviceA", 3)) is None
+
+    asyncio.run(run())
+
+@contextmanager
+def slot_settings():
+    """两个账号映射到同一台手机，另一个账号在另一台手机上；手机间隔180秒，账号间隔600秒"""
+    mapping = {"acct1": "SER1", "acct2": "SER1", "other": "SER2"}
+    with patch.object(Settings, "DEVICE_MAPPING", mapping), \
+            patch.object(Settings, "POST_MIN_INTERVAL_DEVICE", 180), \
+            patch.object(Settings, "POST_MIN_INTERVAL_ACCOUNT", 600):
+        yield
+
+def test_post_slot_spacing():
+    """测试发布时间按手机和账号间隔顺延，并跳过任务自身"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir, isolated_scheduler(tmp_dir), slot_settings():
+            base = in_hours(1).replace(microsecond=0)
+            add_job(publish, base, job_id="acct1:0", device_name="acct1", task_time=0)
+
+            assert allocate_post_slot("acct2", base) == base + timedelta(seconds=180)
+            assert allocate_post_slot("acct1", base) == base + timedelta(seconds=600)
+            assert allocate_post_slot("other", base) == base
+            assert allocate_post_slot("acct1", base, job_id="acct1:0") == base
+            # 相隔足够远的请求不受影响
+            assert allocate_post_slot("acct2", base + timedelta(seconds=180)) == base + timedelta(seconds=180)
+
+            add_job(publish, base + timedelta(seconds=180), job_id="acct2:0", device_name="acct2", task_time=0)
+            # 先被手机间隔推到acct2:0之后，再被账号间隔推到acct2:0之后600秒
+            assert allocate_post_slot("acct2", base + timedelta(seconds=100)) == base + timedelta(seconds=780)
+
+    asyncio.run(run())
+
+def test_reschedule_and_run_now_respect_slots():
+    """测试改期和立即执行同样经过时间槽分配"""
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp_dir, isolated_scheduler(tmp_dir), slot_settings():
+            base = in_hours(1).replace(microsecond=0)
+            add_job(publish, base, job_id="acct1:0", device_name="acct1", task_time=0)
+            add_job(publish, base + timedelta(hours=2), job_id="acct2:0", device_name="acct2", task_time=0)
+
+            summary = reschedule_job("acct2:0", base)
+            assert summary["next_run_time"] == (base + timedelta(seconds=180)).timestamp()
+
+            now = datetime.now(tz=Settings.SCHEDULER_TIMEZONE)
+            add_job(publish, now + timedelta(seconds=60), job_id="acct1:1", device_name="acct1", task_time=1)
+            summary = run_job_now("acct2:0")
+            assert abs(summary["next_run_time"] - (now + timedelta(seconds=240)).timestamp()) < 5
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    # 运行测试
+    test_duplicate_scheduled_posts()
+    test_duplicate_immediate_jobs()
+    test_reschedule_cancel_and_run_now()
+    test_post_slot_spacing()
+    test_reschedule_and_run_now_respect_slots()
+    logger.info("=== 定时任务调度测试通过 ===")
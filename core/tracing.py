@@ -0,0 +1,262 @@
+"""
+自动化步骤追踪模块
+
+该模块记录每次发布操作中各步骤的耗时，包括：
+1. 每次运行按设备和帖子时间戳登记，重试时产生新的运行记录
+2. 每个步骤记录开始时间、耗时、其中等待界面的时间和失败原因
+3. 运行结束后一次性写入SQLite，供接口按设备、帖子查询和按步骤汇总
+
+主要功能：
+- 找出耗时最长的步骤（慢的选择器、过长的等待）
+- 同步记录步骤耗时指标
+"""
+
+import logging
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from core.config import Settings
+from core.sqlite_db import shared_database
+from core.metrics import AUTOMATION_STEP_DURATION
+
+logger = logging.getLogger(__name__)
+
+class Span:
+    """单个步骤的耗时记录"""
+
+    def __init__(self, step: str, offset: float):
+        self.step = step
+        self.offset = offset  # 相对运行开始的时间（秒）
+        self.duration = 0.0
+        self.slept = 0.0  # 步骤中轮询等待界面的时间（秒）
+        self.error: Optional[str] = None
+
+class PostTrace:
+    """
+    一次发布运行的追踪记录
+
+    只在设备执行器线程中使用，不需要加锁。
+    """
+
+    def __init__(self, device_name: str, post_time: Optional[int] = None):
+        """
+        初始化追踪记录
+
+        Args:
+            device_name: 设备名称
+            post_time: 帖子时间戳
+        """
+        self.run_id = uuid.uuid4().hex
+        self.device_name = device_name
+        self.post_time = post_time
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._step_started = 0.0
+        self.spans: List[Span] = []
+        self.current: Optional[Span] = None
+
+    def begin(self, step: str) -> None:
+        """
+        结束当前步骤并开始下一个步骤
+
+        Args:
+            step: 步骤名称
+        """
+        self.end()
+        self._step_started = time.perf_counter()
+        self.current = Span(step, self._step_started - self._started)
+
+    def end(self, error: Optional[str] = None) -> None:
+        """
+        结束当前步骤
+
+        Args:
+            error: 步骤失败的原因
+        """
+        span = self.current
+        if span is None:
+            return
+        span.duration = time.perf_counter() - self._step_started
+        span.error = error
+        self.spans.append(span)
+        self.current = None
+        AUTOMATION_STEP_DURATION.observe(span.duration, step=span.step)
+
+    def add_sleep(self, seconds: float) -> None:
+        """累计当前步骤中等待的时间"""
+        if self.current is not None:
+            self.current.slept += seconds
+
+    def finish(self, status: str) -> None:
+        """
+        结束运行并写入数据库，失败状态记录在未结束的步骤上
+
+        Args:
+            status: 运行结果状态，如SUCCESS、FOLDER_NOT_FOUND
+        """
+        self.end(None if status == "SUCCESS" else status)
+        try:
+            trace_store.save(self, status, time.perf_counter() - self._started)
+        except Exception as e:
+            logger.warning(f"保存步骤追踪失败: {str(e)}")
+
+class TraceStore:
+    """
+    步骤追踪存储
+
+    每次发布运行保存一条汇总记录（设备、发布时间、结果、总耗时），
+    以及按执行顺序编号的各步骤耗时、等待时间和错误。
+    """
+
+    def __init__(self, db_path: Path):
+        """
+        初始化存储
+
+        Args:
+            db_path: 数据库文件路径
+        """
+        database = shared_database(db_path)
+        self._lock = database.lock
+        self._conn = database.conn
+        self._init_db()
+
+    def _init_db(self) -> None:
+        """创建数据表和索引"""
+        with self._lock:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS automation_runs (
+                    run_id TEXT PRIMARY KEY,
+                    device_name TEXT NOT NULL,
+                    post_time INTEGER,
+                    status TEXT NOT NULL,
+                    started_at REAL NOT NULL,
+                    duration REAL NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS automation_spans (
+                    run_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    step TEXT NOT NULL,
+                    start_offset REAL NOT NULL,
+                    duration REAL NOT NULL,
+                    slept REAL NOT NULL,
+                    error TEXT,
+                    PRIMARY KEY (run_id, seq)
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_automation_runs_post ON automation_runs (device_name, post_time)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_automation_runs_started ON automation_runs (started_at)")
+
+    def save(self, trace: PostTrace, status: str, duration: float) -> None:
+        """
+        写入一次运行及其所有步骤
+
+        Args:
+            trace: 追踪记录
+            status: 运行结果状态
+            duration: 运行总耗时（秒）
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "INSERT INTO automation_runs (run_id, device_name, post_time, status, started_at, duration) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (trace.run_id, trace.device_name, trace.post_time, status, trace.started_at, duration)
+                )
+                self._conn.executemany(
+                    "INSERT INTO automation_spans (run_id, seq, step, start_offset, duration, slept, error) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(trace.run_id, seq, span.step, span.offset, span.duration, span.slept, span.error)
+                     for seq, span in enumerate(trace.spans)]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def runs(self, device_name: Optional[str] = None, post_time: Optional[int] = None,
+             limit: int = 20, offset: int = 0) -> Dict:
+        """
+        查询运行记录及其步骤，最新的在前
+
+        Args:
+            device_name: 设备名称，为None时不过滤
+            post_time: 帖子时间戳，为None时不过滤
+            limit: 返回数量
+            offset: 跳过数量
+
+        Returns:
+            dict: {"total": 总数, "items": [运行记录，含spans列表]}
+        """
+        conditions = []
+        params = []
+        if device_name is not None:
+            conditions.append("device_name = ?")
+            params.append(device_name)
+        if post_time is not None:
+            conditions.append("post_time = ?")
+            params.append(post_time)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM automation_runs {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT * FROM automation_runs {where} ORDER BY started_at DESC LIMIT ? OFFSET ?",
+                (*params, limit, offset)
+            ).fetchall()
+            items = [dict(row) for row in rows]
+            for item in items:
+                spans = self._conn.execute(
+                    "SELECT step, start_offset, duration, slept, error FROM automation_spans WHERE run_id = ? ORDER BY seq",
+                    (item["run_id"],)
+                ).fetchall()
+                item["spans"] = [dict(span) for span in spans]
+        return {"total": total, "items": items}
+
+    def step_stats(self, device_name: Optional[str] = None, since: Optional[float] = None) -> List[Dict]:
+        """
+        按步骤汇总耗时，平均耗时最长的在前
+
+        Args:
+            device_name: 设备名称，为None时不过滤
+            since: 只统计此时间之后开始的运行（Unix时间戳）
+
+        Returns:
+            list: [{"step", "count", "failures", "avg_duration", "max_duration", "avg_slept"}]
+        """
+        conditions = []
+        params = []
+        if device_name is not None:
+            conditions.append("r.device_name = ?")
+            params.append(device_name)
+        if since is not None:
+            conditions.append("r.started_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT s.step, COUNT(*) AS count, COUNT(s.error) AS failures, "
+                "AVG(s.duration) AS avg_duration, MAX(s.duration) AS max_duration, AVG(s.slept) AS avg_slept "
+                f"FROM automation_spans s JOIN automation_runs r ON r.run_id = s.run_id {where} "
+                "GROUP BY s.step ORDER BY avg_duration DESC",
+                params
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def purge(self, before: float) -> None:
+        """清理指定时间之前的运行记录"""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM automation_spans WHERE run_id IN "
+                "(SELECT run_id FROM automation_runs WHERE started_at < ?)",
+                (before,)
+            )
+            self._conn.execute("DELETE FROM automation_runs WHERE started_at < ?", (before,))
+
+# 创建全局追踪存储实例
+trace_store = TraceStore(Settings.JOB_QUEUE_DB)
@@ -0,0 +1,204 @@
+"""
+图片传输调度模块
+
+该模块协调不同设备之间的图片推送，包括：
+1. 不同设备的推送并行执行，同时进行的传输数受全局上限限制
+2. 同一USB集线器（或同一网络出口）上同时进行的传输数受单独上限限制
+3. 名额不足时按发布时间排队，发布时间早的推送先获得名额
+4. 所有传输共享一个总带宽预算（令牌桶），在发送数据块前按字节数限速
+
+主要功能：
+- 设备数增加时总推送吞吐随之增加，直到达到带宽预算或集线器上限
+- 临近发布的推送不会被大批远期推送堵住
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Tuple
+
+from core.config import Settings
+from core.metrics import TRANSFER_WAIT, TRANSFERS_RUNNING, TRANSFERS_WAITING
+
+logger = logging.getLogger(__name__)
+
+class BandwidthLimiter:
+    """
+    全局带宽限速器（令牌桶）
+
+    每次发送前按字节数预留额度，额度不足时返回需要等待的时间。
+    允许预留超过桶容量的字节数（额度变为负数），后续调用方相应等待更久，
+    因此总速率不超过设定值，单个大块也不会永远等待。
+    """
+
+    def __init__(self, rate: float, burst: int):
+        """
+        初始化限速器
+
+        Args:
+            rate: 总速率（字节/秒），不大于0时不限速
+            burst: 桶容量（字节），空闲后允许的突发量
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, nbytes: int) -> float:
+        """
+        预留额度
+
+        Args:
+            nbytes: 即将发送的字节数
+
+        Returns:
+            float: 发送前需要等待的时间（秒）
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= nbytes
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def consume(self, nbytes: int) -> None:
+        """预留额度并阻塞等待（在线程池线程中调用）"""
+        delay = self.reserve(nbytes)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def consume_async(self, nbytes: int) -> None:
+        """预留额度并异步等待"""
+        delay = self.reserve(nbytes)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+class TransferScheduler:
+    """
+    图片传输调度器
+
+    等待中的传输按 (发布时间, 到达顺序) 排序，有名额释放时从前往后查找
+    所属集线器仍有名额的第一个传输放行，集线器已满的传输不阻塞其他集线器上的传输。
+    """
+
+    def __init__(self, max_transfers: int, per_hub: int):
+        """
+        初始化调度器
+
+        Args:
+            max_transfers: 同时进行的传输数上限
+            per_hub: 同一集线器上同时进行的传输数上限
+        """
+        self.max_transfers = max_transfers
+        self.per_hub = per_hub
+        self._waiting: List[Tuple[int, int, str, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._running: Dict[str, int] = {}
+        self._completed = 0
+
+    @staticmethod
+    def hub_of(device_name: str) -> str:
+        """获取设备所在的集线器，未配置时归入default"""
+        return Settings.DEVICE_CONFIG.get(device_name, {}).get("hub", "default")
+
+    def _can_run(self, hub: str) -> bool:
+        return (self.running_count() < self.max_transfers
+                and self._running.get(hub, 0) < self.per_hub)
+
+    def _dispatch(self) -> None:
+        """按发布时间顺序放行有名额的等待传输"""
+        if self.running_count() >= self.max_transfers:
+            return
+        remaining = []
+        while self._waiting:
+            entry = heapq.heappop(self._waiting)
+            _, _, hub, future = entry
+            if future.done():
+                continue
+            if self._can_run(hub):
+                self._running[hub] = self._running.get(hub, 0) + 1
+                future.set_result(None)
+            else:
+                remaining.append(entry)
+        for entry in remaining:
+            heapq.heappush(self._waiting, entry)
+
+    def _release(self, hub: str) -> None:
+        self._running[hub] -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, device_name: str, publish_time: int) -> AsyncIterator[None]:
+        """
+        占用一个传输名额，退出上下文时释放
+
+        Args:
+            device_name: 设备名称
+            publish_time: 计划发布时间戳，名额不足时越早越先放行
+        """
+        hub = self.hub_of(device_name)
+        future = asyncio.get_running_loop().create_future()
+        queued_at = time.monotonic()
+        heapq.heappush(self._waiting, (publish_time, next(self._sequence), hub, future))
+        self._dispatch()
+        if not future.done():
+            logger.info(
+                f"传输名额已满，{device_name} 的推送进入排队 (集线器: {hub}, "
+                f"运行中 {self.running_count()}, 排队 {len(self._waiting)})"
+            )
+        try:
+            await future
+        except asyncio.CancelledError:
+            # 取消时名额可能已经分配给本次传输，需归还
+            if future.done() and not future.cancelled():
+                self._release(hub)
+            raise
+
+        wait = time.monotonic() - queued_at
+        TRANSFER_WAIT.observe(wait, hub=hub)
+        try:
+            yield
+        finally:
+            self._completed += 1
+            self._release(hub)
+
+    def running(self) -> Dict[str, int]:
+        """获取各集线器运行中的传输数（包括当前为0的集线器）"""
+        return dict(self._running)
+
+    def running_count(self) -> int:
+        """获取运行中的传输总数"""
+        return sum(self._running.values())
+
+    def waiting(self) -> int:
+        """获取排队中的传输数"""
+        return sum(1 for *_, future in self._waiting if not future.done())
+
+    def stats(self) -> Dict:
+        """
+        获取调度统计
+
+        Returns:
+            dict: 名额上限、各集线器运行中的传输数、排队数和已完成数
+        """
+        return {
+            "max_transfers": self.max_transfers,
+            "per_hub": self.per_hub,
+            "running": {hub: count for hub, count in self.running().items() if count},
+            "waiting": self.waiting(),
+            "completed": self._completed
+        }
+
+# 创建全局带宽限速器和传输调度器实例
+bandwidth_limiter = BandwidthLimiter(Settings.TRANSFER_BANDWIDTH_LIMIT, Settings.TRANSFER_BANDWIDTH_BURST)
+transfer_scheduler = TransferScheduler(Settings.TRANSFER_MAX_CONCURRENCY, Settings.TRANSFER_PER_HUB)
+
+TRANSFERS_RUNNING.set_function(transfer_scheduler.running)
+TRANSFERS_WAITING.set_function(transfer_scheduler.waiting)
@@ -0,0 +1,125 @@
+"""
+uiautomator2会话缓存模块
+
+该模块按设备序列号缓存uiautomator2连接，供连续的发布任务复用：
+1. 复用前查询设备信息检查设备端服务是否存活，失败时重新连接
+2. 超过空闲时间未使用的会话被淘汰
+3. 设备从ADB断开时立即丢弃对应会话
+
+主要功能：
+- 同一手机上的连续发布跳过连接建立和服务启动
+- 连接异常时自动重连
+"""
+
+import logging
+import threading
+import time
+from typing import Dict
+import uiautomator2 as u2
+from core.adb import adb
+from core.config import Settings
+
+logger = logging.getLogger(__name__)
+
+class U2Session:
+    """缓存中的单个uiautomator2连接"""
+
+    def __init__(self, device: u2.Device):
+        self.device = device
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0
+
+class U2SessionCache:
+    """
+    uiautomator2会话缓存
+
+    会话只在设备执行器线程中使用，同一设备同一时刻只有一个使用者，
+    缓存本身用线程锁保护，连接建立和健康检查在锁外进行。
+    """
+
+    def __init__(self, idle_timeout: float):
+        """
+        初始化缓存
+
+        Args:
+            idle_timeout: 会话最长空闲时间（秒）
+        """
+        self.idle_timeout = idle_timeout
+        self._sessions: Dict[str, U2Session] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _is_alive(device: u2.Device) -> bool:
+        """检查设备端uiautomator服务是否可用（通过公开的device.info接口查询设备信息）"""
+        try:
+            device.info
+            return True
+        except Exception:
+            return False
+
+    def _evict_idle(self) -> None:
+        """淘汰超过空闲时间的会话"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [serial for serial, session in self._sessions.items()
+                       if now - session.last_used > self.idle_timeout]
+            for serial in expired:
+                del self._sessions[serial]
+        for serial in expired:
+            logger.info(f"淘汰空闲的uiautomator2会话: {serial}")
+
+    def get(self, serial: str) -> u2.Device:
+        """
+        获取设备的uiautomator2连接，缓存的连接不可用时重新连接
+
+        Args:
+            serial: 设备序列号
+
+        Returns:
+            u2.Device: 可用的设备连接
+
+        Raises:
+            Exception: 连接失败
+        """
+        self._evict_idle()
+        with self._lock:
+            session = self._sessions.get(serial)
+
+        if session is not None:
+            if self._is_alive(session.device):
+                session.last_used = time.monotonic()
+                session.uses += 1
+                logger.info(f"复用uiautomator2会话: {serial} (第 {session.uses} 次使用)")
+                return session.device
+            logger.warning(f"uiautomator2会话已失效，重新连接: {serial}")
+            self.invalidate(serial)
+
+        device = u2.connect(serial)
+        session = U2Session(device)
+        session.uses = 1
+        with self._lock:
+            self._sessions[serial] = session
+        return device
+
+    def invalidate(self, serial: str) -> None:
+        """
+        丢弃设备的缓存会话
+
+        Args:
+            serial: 设备序列号
+        """
+        with self._lock:
+            session = self._sessions.pop(serial, None)
+        if session is not None:
+            logger.info(f"丢弃uiautomator2会话: {serial}")
+
+# 创建全局会话缓存实例
+u2_sessions = U2SessionCache(Settings.U2_SESSION_IDLE_TIMEOUT)
+
+def _on_device_state(serial: str, connected: bool, status: str) -> None:
+    """设备断开时丢弃会话，避免复用指向旧连接的对象"""
+    if not connected:
+        u2_sessions.invalidate(serial)
+
+adb.registry.add_listener(_on_device_state)
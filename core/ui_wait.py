@@ -0,0 +1,154 @@
+"""
+界面等待模块
+
+该模块为自动化操作提供基于界面层级快照的等待，包括：
+1. 每次轮询只获取一次界面层级，所有选择器都在同一份快照上匹配
+2. 快照获取后先运行uiautomator2 watcher（处理弹窗等），触发后重新获取，重新获取的次数有上限
+3. 等待条件满足立即返回，不使用固定等待
+
+主要功能：
+- 替代固定时长的等待和逐个元素的exists查询，减少设备往返次数
+- 同一屏幕上的多个元素（如图片列表、密码键盘）一次解析、按坐标点击
+"""
+
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import uiautomator2 as u2
+from uiautomator2.xpath import PageSource, XMLElement
+from core.metrics import AUTOMATION_HIERARCHY_DUMPS
+
+logger = logging.getLogger(__name__)
+
+# 一次快照中watcher连续触发的最多次数，超过后直接使用当前层级，避免弹窗反复出现时无限循环
+MAX_WATCHER_ROUNDS = 5
+
+class Screen:
+    """一次界面层级快照"""
+
+    def __init__(self, d: u2.Device, source: PageSource):
+        self.d = d
+        self.source = source
+
+    def find_all(self, xpath: str) -> List[XMLElement]:
+        """在快照上查找所有匹配的元素"""
+        return self.d.xpath(xpath, self.source).all()
+
+    def find(self, xpath: str) -> Optional[XMLElement]:
+        """在快照上查找第一个匹配的元素，不存在时返回None"""
+        elements = self.find_all(xpath)
+        return elements[0] if elements else None
+
+class UIWaiter:
+    """
+    界面等待器
+
+    轮询间隔通过pause函数等待，自动化被取消时由pause抛出异常结束等待。
+    """
+
+    def __init__(self, d: u2.Device, pause: Callable[[float], None], poll_interval: float = 0.2,
+                 step: Callable[[], str] = lambda: ""):
+        """
+        初始化等待器
+
+        Args:
+            d: uiautomator2设备连接
+            pause: 可被取消的等待函数
+            poll_interval: 条件不满足时的轮询间隔（秒）
+            step: 返回当前步骤名称的函数，用于统计各步骤的层级获取次数
+        """
+        self.d = d
+        self.pause = pause
+        self.poll_interval = poll_interval
+        self.step = step
+        self.dumps = 0
+
+    def snapshot(self) -> Screen:
+        """
+        获取当前界面层级快照，注册的watcher被触发时等待一个轮询间隔后重新获取
+
+        Returns:
+            Screen: 界面快照
+        """
+        for _ in range(MAX_WATCHER_ROUNDS):
+            source = PageSource.parse(self.d.dump_hierarchy())
+            self.dumps += 1
+            AUTOMATION_HIERARCHY_DUMPS.inc(step=self.step())
+            if not self.d.watcher.run(source):
+                return Screen(self.d, source)
+            logger.debug("watcher已处理界面，重新获取层级")
+            self.pause(self.poll_interval)
+        logger.warning(f"watcher连续触发 {MAX_WATCHER_ROUNDS} 次，使用当前界面层级")
+        source = PageSource.parse(self.d.dump_hierarchy())
+        self.dumps += 1
+        AUTOMATION_HIERARCHY_DUMPS.inc(step=self.step())
+        return Screen(self.d, source)
+
+    def wait_any(self, selectors: Dict[str, str],
+                 timeout: float) -> Tuple[Optional[str], Optional[XMLElement], Optional[Screen]]:
+        """
+        等待任意一个选择器出现，按字典顺序优先匹配
+
+        Args:
+            selectors: {名称: xpath}
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            tuple: (匹配的名称, 元素, 快照)，超时时均为None
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            screen = self.snapshot()
+            for name, xpath in selectors.items():
+                element = screen.find(xpath)
+                if element is not None:
+                    return name, element, screen
+            if time.monotonic() >= deadline:
+                return None, None, None
+            self.pause(self.poll_interval)
+
+    def register_popups(self, texts: List[str]) -> None:
+        """
+        注册弹窗处理watcher：界面上出现这些文字的按钮时点击
+
+        会话在多次发布间复用，注册前先移除同名watcher，避免重复注册。
+
+        Args:
+            texts: 弹窗按钮文字列表
+        """
+        for text in texts:
+            name = f"popup:{text}"
+            self.d.watcher.remove(name)
+            self.d.watcher(name).when(f'//*[@text="{text}"]').click()
+
+    def wait(self, xpath: str, timeout: float) -> Optional[XMLElement]:
+        """
+        等待元素出现
+
+        Args:
+            xpath: 元素xpath
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            XMLElement: 元素，超时时返回None
+        """
+        _, element, _ = self.wait_any({xpath: xpath}, timeout)
+        return element
+
+    def click(self, xpath: str, timeout: float) -> bool:
+        """
+        等待元素出现并点击
+
+        Args:
+            xpath: 元素xpath
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            bool: 是否点击成功
+        """
+        element = self.wait(xpath, timeout)
+        if element is None:
+            return False
+        element.click()
+        return True
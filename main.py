@@ -10,15 +10,27 @@
 - 初始化FastAPI应用
 - 配置日志系统
 - 注册API路由
-- 管理调度器的启动和关闭
+- 管理调度器、任务队列和设备状态跟踪的启动和关闭
 """
 
 import logging
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from api.v1.upload import router as upload_router
 from api.v1.device import router as device_router
+from api.v1.jobs import router as jobs_router
+from api.metrics import router as metrics_router
 from core.scheduler import start_scheduler, stop_scheduler
+from core.job_queue import job_queue
+from core.adb import adb
+from core.config import Settings
+from core.device_executor import device_executor
+from core.executors import shutdown_executors
+from core.metrics import HTTP_REQUEST_DURATION
+from core.retry import step_ledger
+from core.tracing import trace_store
+from core.device_sync import remote_index
 
 # 配置日志系统
 logging.basicConfig(
@@ -43,27 +55,66 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    """记录请求耗时，按路由模板而不是实际路径统计，避免标签数量无限增长"""
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=route.path if route is not None else "unmatched",
+            status=str(status_code)
+        )
+
+def purge_expired_records():
+    """清理步骤台账、死信、步骤追踪和远程文件索引中超过JOB_RETENTION_DAYS的记录"""
+    cutoff = time.time() - Settings.JOB_RETENTION_DAYS * 86400
+    step_ledger.purge(cutoff)
+    trace_store.purge(cutoff)
+    remote_index.purge(cutoff)
+
 @app.on_event("startup")
 async def startup_event():
     """
     应用程序启动时的处理函数
     
-    启动调度器，确保能够处理定时任务
+    启动调度器，确保能够处理定时任务；
+    启动任务队列，恢复上次未完成的设备任务；
+    启动设备状态跟踪；
+    清理各存储中超过保留期的记录
     """
+    purge_expired_records()
+    adb.registry.start()
     start_scheduler()
+    await job_queue.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """
     应用程序关闭时的处理函数
     
-    安全地关闭调度器，确保正在执行的任务能够完成
+    安全地关闭调度器，确保正在执行的任务能够完成；
+    停止任务队列，未完成的任务会在下次启动时恢复；
+    关闭设备执行器和各子系统线程池
     """
+    await job_queue.stop()
     stop_scheduler()
+    device_executor.shutdown()
+    adb.registry.stop()
+    await shutdown_executors()
 
 # 注册路由
 app.include_router(upload_router)
 app.include_router(device_router)
+app.include_router(jobs_router)
+app.include_router(metrics_router)
 
 # 启动服务器（仅在直接运行时）
 if __name__ == "__main__":
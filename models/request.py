@@ -3,7 +3,9 @@
 
 该模块定义了API请求中使用的数据模型，包括：
 1. 文件上传的Base64编码模型
-2. 设备上传请求的完整模型
+2. 上传请求的公共元数据模型
+3. 设备上传请求的完整模型
+4. 断点续传会话的创建请求模型
 
 主要功能：
 - 定义请求数据的结构
@@ -11,14 +13,17 @@
 - 处理Base64编码的文件数据
 """
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field
 from typing import List, Optional
 import base64
+from core.metrics import UPLOAD_DECODE_DURATION
 
 class FileBase64(BaseModel):
     """
     Base64编码的文件数据模型
 
+    校验时不解码，请求解析不占用事件循环；保存时调用decode在线程池中解码一次。
+
     属性:
         filename (str): 原始文件名
         data (str): Base64编码的文件内容
@@ -26,39 +31,75 @@ class FileBase64(BaseModel):
     filename: str
     data: str
 
-    @validator('data')
-    def validate_base64(cls, v):
+    def decode(self) -> bytes:
         """
-        验证Base64数据的有效性
-
-        Args:
-            v (str): Base64编码字符串
+        验证并解码Base64数据（阻塞调用，应在线程池中执行）
 
         Returns:
-            str: 验证通过的Base64字符串
+            bytes: 解码后的文件内容
 
         Raises:
             ValueError: 当Base64数据无效时抛出
         """
         try:
-            base64.b64decode(v.encode(), validate=True)
-            return v
+            with UPLOAD_DECODE_DURATION.time():
+                return base64.b64decode(self.data, validate=True)
         except Exception as e:
             raise ValueError("Invalid Base64 data") from e
 
-class UploadRequest(BaseModel):
+class UploadMeta(BaseModel):
     """
-    设备上传请求的数据模型
+    上传请求的公共元数据模型
+
+    JSON上传和multipart上传共用的字段
 
     属性:
         device_name (str): 设备名称，2-50个字符
         timestamp (int): 上传时间戳，必须大于0
         title (Optional[str]): 可选的标题，最大100个字符
         content (Optional[str]): 可选的内容，最大1000个字符
-        files (List[FileBase64]): Base64编码的文件列表
     """
     device_name: str = Field(..., min_length=2, max_length=50)
     timestamp: int = Field(..., gt=0)
     title: Optional[str] = Field(None, max_length=100)
     content: Optional[str] = Field(None, max_length=1000)
-    files: List[FileBase64]
\ No newline at end of file
+
+class UploadRequest(UploadMeta):
+    """
+    设备上传请求的数据模型
+
+    属性:
+        files (List[FileBase64]): Base64编码的文件列表
+    """
+    files: List[FileBase64]
+
+class SessionFile(BaseModel):
+    """
+    断点续传会话中的文件声明
+
+    属性:
+        filename (str): 原始文件名
+        size (int): 文件总字节数
+        sha256 (Optional[str]): 可选的文件摘要，合并时用于校验
+    """
+    filename: str
+    size: int = Field(..., ge=0)
+    sha256: Optional[str] = Field(None, min_length=64, max_length=64)
+
+class UploadSessionRequest(UploadMeta):
+    """
+    创建断点续传会话的请求模型
+
+    属性:
+        files (List[SessionFile]): 待上传的文件列表
+    """
+    files: List[SessionFile] = Field(..., min_length=1)
+
+class RescheduleRequest(BaseModel):
+    """
+    定时任务改期请求模型
+
+    属性:
+        run_at (int): 新的执行时间（Unix时间戳）
+    """
+    run_at: int
@@ -0,0 +1,182 @@
+"""
+内容寻址存储模块
+
+该模块以文件的sha256摘要为键，在上传目录下维护去重的图片存储，包括：
+1. 按摘要保存文件内容，重复内容只保存一份
+2. 以硬链接把存储中的文件挂到各次上传的imgs目录
+3. 统计各设备的磁盘占用和去重节省的空间
+
+存储结构：uploads/.blobs/摘要前两位/摘要
+"""
+
+import os
+import uuid
+import shutil
+import logging
+import aiofiles
+from pathlib import Path
+from typing import Dict
+from core.config import UPLOAD_DIR
+from core.executors import disk_executor
+
+logger = logging.getLogger(__name__)
+
+class BlobStore:
+    """
+    内容寻址存储
+
+    imgs目录中的文件与存储中的文件共享同一inode，
+    硬链接不可用时（如跨文件系统）退化为复制。
+    """
+
+    def __init__(self, root: Path):
+        """
+        初始化存储
+
+        Args:
+            root: 存储根目录
+        """
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def blob_path(self, digest: str) -> Path:
+        """
+        获取摘要对应的存储路径
+
+        Args:
+            digest: sha256十六进制摘要
+
+        Returns:
+            Path: 存储文件路径
+        """
+        return self.root / digest[:2] / digest
+
+    def contains(self, digest: str) -> bool:
+        """判断内容是否已存储"""
+        return self.blob_path(digest).exists()
+
+    def _temp_path(self, digest: str) -> Path:
+        """生成写入用的临时路径，写完后再发布为正式路径"""
+        path = self.blob_path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path.with_name(f".{digest}.{uuid.uuid4().hex}.tmp")
+
+    def _publish(self, digest: str, src: Path) -> bool:
+        """
+        把临时文件发布为正式存储文件
+
+        使用硬链接实现“不存在才创建”，并发写入相同内容时只有一个生效，
+        已经链接到imgs目录的文件不会被替换掉。
+
+        Returns:
+            bool: 是否由本次调用发布
+        """
+        try:
+            os.link(src, self.blob_path(digest))
+            return True
+        except FileExistsError:
+            return False
+        except OSError:
+            os.replace(src, self.blob_path(digest))
+            return True
+        finally:
+            if src.exists():
+                src.unlink()
+
+    async def put_bytes(self, digest: str, data: bytes) -> bool:
+        """
+        保存内容
+
+        Args:
+            digest: 内容的sha256摘要
+            data: 文件内容
+
+        Returns:
+            bool: 是否实际写入（已存在时跳过写入并返回False）
+        """
+        if self.contains(digest):
+            return False
+        temp_path = self._temp_path(digest)
+        async with aiofiles.open(temp_path, "wb", executor=disk_executor) as f:
+            await f.write(data)
+        return await disk_executor.run(self._publish, digest, temp_path)
+
+    def put_file(self, digest: str, src: Path) -> bool:
+        """
+        把已落盘的文件移入存储
+
+        Args:
+            digest: 文件的sha256摘要
+            src: 源文件路径，调用后该文件被移入存储或删除
+
+        Returns:
+            bool: 是否实际移入（已存在时删除源文件并返回False）
+        """
+        if self.contains(digest):
+            src.unlink()
+            return False
+        self.blob_path(digest).parent.mkdir(parents=True, exist_ok=True)
+        return self._publish(digest, src)
+
+    def link(self, digest: str, dest: Path) -> None:
+        """
+        把存储中的文件链接到目标路径
+
+        Args:
+            digest: 内容的sha256摘要
+            dest: 目标路径（如某次上传的imgs目录下的文件）
+        """
+        try:
+            os.link(self.blob_path(digest), dest)
+        except FileExistsError:
+            # imgs目录中的文件按摘要命名，已存在说明同一内容已经保存过（如请求重试）
+            return
+        except OSError as e:
+            logger.warning(f"创建硬链接失败，改为复制: {dest}, 原因: {str(e)}")
+            shutil.copyfile(self.blob_path(digest), dest)
+
+    def usage(self) -> Dict:
+        """
+        统计磁盘占用
+
+        logical_bytes为各次上传imgs目录中文件大小之和（不去重），
+        physical_bytes为实际占用（存储中的文件加上未链接到存储的文件）。
+
+        Returns:
+            dict: 按设备和总体汇总的占用统计
+        """
+        devices = {}
+        unlinked_bytes = 0
+        for device_dir in UPLOAD_DIR.iterdir():
+            if not device_dir.is_dir() or device_dir.name.startswith("."):
+                continue
+            files = 0
+            logical = 0
+            for img_path in device_dir.glob("*/imgs/*"):
+                stat = img_path.stat()
+                files += 1
+                logical += stat.st_size
+                if stat.st_nlink == 1:
+                    unlinked_bytes += stat.st_size
+            devices[device_dir.name] = {"files": files, "logical_bytes": logical}
+
+        blob_count = 0
+        blob_bytes = 0
+        for blob in self.root.glob("*/*"):
+            if blob.name.startswith("."):
+                continue
+            blob_count += 1
+            blob_bytes += blob.stat().st_size
+
+        logical_total = sum(d["logical_bytes"] for d in devices.values())
+        physical_total = blob_bytes + unlinked_bytes
+        return {
+            "devices": devices,
+            "blobs": {"count": blob_count, "bytes": blob_bytes},
+            "logical_bytes": logical_total,
+            "physical_bytes": physical_total,
+            "saved_bytes": max(logical_total - physical_total, 0)
+        }
+
+# 创建全局存储实例
+blob_store = BlobStore(UPLOAD_DIR / ".blobs")
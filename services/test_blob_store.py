@@ -0,0 +1,97 @@
+"""
+内容寻址存储测试脚本
+
+用于测试去重存储，无需真实设备：
+1. 相同内容只保存一份
+2. 硬链接到imgs目录，硬链接不可用时退化为复制
+3. 磁盘占用与去重节省的统计
+"""
+
+import asyncio
+import errno
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+from services import blob_store as blob_store_module
+from services.blob_store import BlobStore
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DATA = b"same image content"
+DIGEST = hashlib.sha256(DATA).hexdigest()
+
+def cross_device_link(src, dst):
+    """模拟跨文件系统时硬链接失败"""
+    raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+def test_put_deduplicates_content():
+    """测试重复内容只写入一次，且不留下临时文件"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = BlobStore(Path(tmp_dir) / ".blobs")
+        assert asyncio.run(store.put_bytes(DIGEST, DATA)) is True
+        assert asyncio.run(store.put_bytes(DIGEST, DATA)) is False
+
+        src = Path(tmp_dir) / "staged.part"
+        src.write_bytes(DATA)
+        assert store.put_file(DIGEST, src) is False
+        assert not src.exists()
+
+        assert store.blob_path(DIGEST).read_bytes() == DATA
+        assert [path.name for path in store.root.glob("*/*")] == [DIGEST]
+
+def test_link_shares_inode_and_tolerates_retry():
+    """测试链接到imgs目录的文件与存储共享inode，重复链接同一路径不报错"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = BlobStore(Path(tmp_dir) / ".blobs")
+        asyncio.run(store.put_bytes(DIGEST, DATA))
+        dest = Path(tmp_dir) / "img.jpg"
+        store.link(DIGEST, dest)
+        store.link(DIGEST, dest)
+        assert dest.stat().st_ino == store.blob_path(DIGEST).stat().st_ino
+
+def test_link_falls_back_to_copy():
+    """测试硬链接不可用时发布和链接都退化为移动或复制"""
+    with tempfile.TemporaryDirectory() as tmp_dir, patch.object(blob_store_module.os, "link", cross_device_link):
+        store = BlobStore(Path(tmp_dir) / ".blobs")
+        src = Path(tmp_dir) / "staged.part"
+        src.write_bytes(DATA)
+        assert store.put_file(DIGEST, src) is True
+        assert not src.exists() and store.blob_path(DIGEST).read_bytes() == DATA
+
+        dest = Path(tmp_dir) / "img.jpg"
+        store.link(DIGEST, dest)
+        assert dest.read_bytes() == DATA
+        assert dest.stat().st_ino != store.blob_path(DIGEST).stat().st_ino
+
+def test_usage_reports_saved_bytes():
+    """测试两个设备引用同一内容时统计去重节省的空间"""
+    with tempfile.TemporaryDirectory() as tmp_dir, patch.object(blob_store_module, "UPLOAD_DIR", Path(tmp_dir)):
+        store = BlobStore(Path(tmp_dir) / ".blobs")
+        asyncio.run(store.put_bytes(DIGEST, DATA))
+        for device in ("deviceA", "deviceB"):
+            imgs = Path(tmp_dir) / device / "20240101000000" / "imgs"
+            os.makedirs(imgs)
+            store.link(DIGEST, imgs / "a.jpg")
+
+        usage = store.usage()
+        assert usage["devices"]["deviceA"] == {"files": 1, "logical_bytes": len(DATA)}
+        assert usage["blobs"] == {"count": 1, "bytes": len(DATA)}
+        assert usage["logical_bytes"] == 2 * len(DATA)
+        assert usage["physical_bytes"] == len(DATA)
+        assert usage["saved_bytes"] == len(DATA)
+
+if __name__ == "__main__":
+    # 运行测试
+    test_put_deduplicates_content()
+    test_link_shares_inode_and_tolerates_retry()
+    test_link_falls_back_to_copy()
+    test_usage_reports_saved_bytes()
+    logger.info("=== 内容寻址存储测试通过 ===")
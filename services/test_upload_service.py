@@ -0,0 +1,119 @@
+"""
+上传服务测试脚本
+
+用于测试上传处理流程，无需真实设备：
+1. JSON上传的Base64解码校验
+2. multipart流式上传的解析、截断和字段名校验
+"""
+
+import asyncio
+import base64
+import logging
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+from models.request import UploadRequest
+from services import upload_service
+from services.blob_store import BlobStore
+from services.upload_service import InvalidFileDataError, process_multipart_upload, process_upload
+from utils.multipart_utils import MultipartError
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+BOUNDARY = "testboundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+def isolated_upload_dir(tmp_dir: str):
+    """把上传目录、multipart临时目录和内容寻址存储重定向到临时目录"""
+    root = Path(tmp_dir)
+    return (patch.object(upload_service, "UPLOAD_DIR", root),
+            patch.object(upload_service, "INCOMING_DIR", root / ".incoming"),
+            patch.object(upload_service, "blob_store", BlobStore(root / ".blobs")))
+
+def multipart_body(file_field: str = "files", image: bytes = b"image-bytes") -> bytes:
+    """构造包含设备名、时间戳和一个图片文件的multipart请求体"""
+    parts = [
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="device_name"\r\n\r\ndeviceA\r\n'.encode(),
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="timestamp"\r\n\r\n1700000000\r\n'.encode(),
+        (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{file_field}"; filename="a.jpg"\r\n'
+         f'Content-Type: image/jpeg\r\n\r\n').encode() + image + b"\r\n",
+        f"--{BOUNDARY}--\r\n".encode()
+    ]
+    return b"".join(parts)
+
+async def chunked(body: bytes, size: int = 7):
+    """按固定大小切分请求体，模拟分块到达的网络流"""
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+def run_multipart(tmp_dir: str, body: bytes):
+    """在临时上传目录中处理一个multipart请求体"""
+    upload_dir, incoming_dir, store = isolated_upload_dir(tmp_dir)
+    with upload_dir, incoming_dir, store:
+        return asyncio.run(process_multipart_upload(CONTENT_TYPE, chunked(body)))
+
+def test_invalid_file_leaves_no_post_directory():
+    """测试一个有效文件和一个无效文件的上传被拒绝，且不留下帖子目录"""
+    request = UploadRequest(
+        device_name="deviceA",
+        timestamp=1700000000,
+        title="title",
+        files=[
+            {"filename": "ok.jpg", "data": base64.b64encode(b"image").decode()},
+            {"filename": "bad.jpg", "data": "!!!not base64"}
+        ]
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        upload_dir, incoming_dir, store = isolated_upload_dir(tmp_dir)
+        with upload_dir, incoming_dir, store:
+            try:
+                asyncio.run(process_upload(request))
+                raise AssertionError("expected InvalidFileDataError")
+            except InvalidFileDataError as e:
+                assert "bad.jpg" in str(e)
+            assert not (Path(tmp_dir) / "deviceA").exists()
+            assert not any((Path(tmp_dir) / ".blobs").rglob("*.*"))
+
+def test_multipart_upload_streams_file():
+    """测试分块到达的multipart请求体被完整解析，文件写入imgs目录"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        meta, response = run_multipart(tmp_dir, multipart_body(image=b"x" * 5000))
+        assert meta.device_name == "deviceA" and response["files_count"] == 1
+        images = list((Path(tmp_dir) / "deviceA").glob("*/imgs/*.jpg"))
+        assert len(images) == 1 and images[0].read_bytes() == b"x" * 5000
+        assert not any((Path(tmp_dir) / ".incoming").iterdir())
+
+def test_multipart_rejects_truncated_body():
+    """测试缺少结束边界的请求体被拒绝，不写入帖子目录"""
+    body = multipart_body()
+    for cut in (len(body) - len(f"--{BOUNDARY}--\r\n"), body.index(b"image-bytes") + 5):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            try:
+                run_multipart(tmp_dir, body[:cut])
+                raise AssertionError("expected MultipartError")
+            except MultipartError:
+                pass
+            assert not (Path(tmp_dir) / "deviceA").exists()
+
+def test_multipart_rejects_unexpected_file_field():
+    """测试文件字段名不是files时被拒绝"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        try:
+            run_multipart(tmp_dir, multipart_body(file_field="image"))
+            raise AssertionError("expected MultipartError")
+        except MultipartError as e:
+            assert "image" in str(e)
+        assert not (Path(tmp_dir) / "deviceA").exists()
+
+if __name__ == "__main__":
+    # 运行测试
+    test_invalid_file_leaves_no_post_directory()
+    test_multipart_upload_streams_file()
+    test_multipart_rejects_truncated_body()
+    test_multipart_rejects_unexpected_file_field()
+    logger.info("=== 上传服务测试通过 ===")
@@ -0,0 +1,144 @@
+"""
+断点续传上传服务测试脚本
+
+用于测试分块上传会话，无需真实设备：
+1. 分块按偏移写入、越界校验和区间合并
+2. 仍有分块写入时合并返回冲突
+3. 合并后写入正式目录并删除会话
+"""
+
+import asyncio
+import hashlib
+import logging
+import tempfile
+from contextlib import ExitStack
+from pathlib import Path
+from unittest.mock import patch
+from models.request import UploadSessionRequest
+from services import upload_service, upload_session_service
+from services.blob_store import BlobStore
+from services.upload_session_service import (
+    UploadSessionConflict, UploadSessionError, UploadSessionNotFound,
+    create_session, finalize_session, get_session, write_chunk
+)
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def isolated_session_dirs(stack: ExitStack, tmp_dir: str) -> Path:
+    """把上传目录、会话目录和内容寻址存储重定向到临时目录"""
+    root = Path(tmp_dir)
+    store = BlobStore(root / ".blobs")
+    stack.enter_context(patch.object(upload_service, "UPLOAD_DIR", root))
+    stack.enter_context(patch.object(upload_session_service, "UPLOAD_DIR", root))
+    stack.enter_context(patch.object(upload_session_service, "SESSION_DIR", root / ".sessions"))
+    stack.enter_context(patch.object(upload_session_service, "blob_store", store))
+    return root
+
+async def stream_of(*chunks: bytes):
+    """把字节块包装为异步字节流"""
+    for chunk in chunks:
+        yield chunk
+
+async def expect(exception, coroutine):
+    """断言协程抛出指定异常"""
+    try:
+        await coroutine
+    except exception:
+        return
+    raise AssertionError(f"expected {exception.__name__}")
+
+def session_request(*files: bytes, sha256: bool = True) -> UploadSessionRequest:
+    """按文件内容构造会话创建请求，默认声明各文件的摘要"""
+    return UploadSessionRequest(
+        device_name="deviceA",
+        timestamp=1700000000,
+        title="title",
+        files=[
+            {"filename": f"{index}.jpg", "size": len(data),
+             "sha256": hashlib.sha256(data).hexdigest() if sha256 else None}
+            for index, data in enumerate(files)
+        ]
+    )
+
+def test_chunk_offsets_and_validation():
+    """测试分块按任意顺序写入、区间合并，以及序号、偏移和长度越界的拒绝"""
+    with tempfile.TemporaryDirectory() as tmp_dir, ExitStack() as stack:
+        isolated_session_dirs(stack, tmp_dir)
+
+        async def run():
+            session = await create_session(session_request(b"0123456789"))
+            session_id = session["session_id"]
+            assert session["complete"] is False
+
+            status = await write_chunk(session_id, 0, 1, 5, stream_of(b"567", b"89"))
+            assert status["received"] == [[5, 10]] and not status["complete"]
+            # 重复上传同一分块不影响已接收区间
+            await write_chunk(session_id, 0, 1, 5, stream_of(b"56789"))
+
+            await expect(UploadSessionError, write_chunk(session_id, 1, 0, 0, stream_of(b"x")))
+            await expect(UploadSessionError, write_chunk(session_id, 0, 0, 11, stream_of(b"x")))
+            await expect(UploadSessionError, write_chunk(session_id, 0, 2, 8, stream_of(b"89ab")))
+            await expect(UploadSessionNotFound, write_chunk("missing", 0, 0, 0, stream_of(b"x")))
+            await expect(UploadSessionError, finalize_session(session_id))
+
+            status = await write_chunk(session_id, 0, 0, 0, stream_of(b"01234"))
+            assert status["received"] == [[0, 10]] and status["complete"]
+            assert (await get_session(session_id))["complete"] is True
+
+        asyncio.run(run())
+
+def test_finalize_conflicts_with_active_write():
+    """测试分块写入过程中合并返回冲突，写完后合并成功且会话被删除"""
+    with tempfile.TemporaryDirectory() as tmp_dir, ExitStack() as stack:
+        root = isolated_session_dirs(stack, tmp_dir)
+
+        async def run():
+            data = b"image-data"
+            session_id = (await create_session(session_request(data)))["session_id"]
+            release = asyncio.Event()
+
+            async def slow_stream():
+                yield data[:4]
+                await release.wait()
+                yield data[4:]
+
+            writer = asyncio.ensure_future(write_chunk(session_id, 0, 0, 0, slow_stream()))
+            await asyncio.sleep(0.05)
+            await expect(UploadSessionConflict, finalize_session(session_id))
+            release.set()
+            assert (await writer)["complete"]
+
+            meta, response = await finalize_session(session_id)
+            assert meta.device_name == "deviceA" and response["files_count"] == 1
+            images = list((root / "deviceA").glob("*/imgs/*.jpg"))
+            assert len(images) == 1 and images[0].read_bytes() == data
+            assert not (root / ".sessions" / session_id).exists()
+            await expect(UploadSessionNotFound, get_session(session_id))
+            await expect(UploadSessionNotFound, write_chunk(session_id, 0, 0, 0, stream_of(b"x")))
+
+        asyncio.run(run())
+
+def test_finalize_rejects_sha256_mismatch():
+    """测试合并时校验声明的摘要"""
+    with tempfile.TemporaryDirectory() as tmp_dir, ExitStack() as stack:
+        root = isolated_session_dirs(stack, tmp_dir)
+
+        async def run():
+            session_id = (await create_session(session_request(b"expected")))["session_id"]
+            await write_chunk(session_id, 0, 0, 0, stream_of(b"tampered"))
+            await expect(UploadSessionError, finalize_session(session_id))
+            assert not (root / "deviceA").exists()
+
+        asyncio.run(run())
+
+if __name__ == "__main__":
+    # 运行测试
+    test_chunk_offsets_and_validation()
+    test_finalize_conflicts_with_active_write()
+    test_finalize_rejects_sha256_mismatch()
+    logger.info("=== 断点续传上传服务测试通过 ===")
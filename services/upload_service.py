@@ -5,40 +5,75 @@
 1. 文件系统操作（创建目录、保存文件）
 2. 文本内容处理
 3. 图片文件处理
-4. 生成响应数据
+4. multipart流式上传处理
+5. 生成响应数据
 
 主要功能：
 - 创建基于时间戳的目录结构
 - 保存设备上传的文本内容
 - 处理并保存图片文件
+- 将multipart文件分段按块流式写入磁盘
+- 按内容摘要去重存储图片
 - 生成文件元数据
 """
 
-import base64
+import os
+import uuid
+import shutil
+import json
+import asyncio
 import aiofiles
 from pathlib import Path
 from hashlib import sha256
 from datetime import datetime
-from models.request import UploadRequest
-from core.config import UPLOAD_DIR
-from utils.file_utils import generate_unique_filename
+from typing import AsyncIterator, Dict, List, Tuple
+from models.request import UploadRequest, UploadMeta
+from core.config import Settings, UPLOAD_DIR
+from core.executors import cpu_executor, disk_executor
+from core.metrics import UPLOAD_HASH_DURATION
+from utils.file_utils import generate_unique_filename, content_filename
+from utils.multipart_utils import MultipartError, iter_multipart
+from services.blob_store import blob_store
+
+# multipart上传的临时目录，文件先写入这里，表单字段齐全后再移动到正式目录
+INCOMING_DIR = UPLOAD_DIR / ".incoming"
+# 单个普通表单字段的最大字节数
+MAX_FIELD_SIZE = 64 * 1024
+# multipart上传中图片文件分段的字段名
+MULTIPART_FILE_FIELD = "files"
+
+class UploadTooLargeError(Exception):
+    """上传文件超过大小限制"""
+    pass
+
+class InvalidFileDataError(Exception):
+    """上传的文件数据无法解码"""
+    pass
 
 async def process_upload(request: UploadRequest) -> dict:
     """
     处理设备上传请求的主函数
 
     处理流程：
-    1. 创建设备专属的目录结构
-    2. 保存上传的文本内容
-    3. 处理并保存图片文件
-    4. 生成处理结果响应
+    1. 在线程池中解码并校验所有图片文件
+    2. 创建设备专属的目录结构
+    3. 保存上传的文本内容
+    4. 保存已解码的图片文件
+    5. 生成处理结果响应
+
+    任一文件无效时在写盘前失败，不会留下不完整的帖子目录。
 
     Args:
         request (UploadRequest): 包含上传数据的请求对象
 
     Returns:
         dict: 包含处理结果的响应数据
+
+    Raises:
+        InvalidFileDataError: 有文件内容不是有效的Base64数据
     """
+    files = await decode_files(request.files)
+
     # 创建目录结构
     device_dir = create_directory_structure(request)
     
@@ -46,17 +81,39 @@ async def process_upload(request: UploadRequest) -> dict:
     await save_text_content(device_dir, request)
     
     # 处理图片文件
-    file_metas = await process_image_files(device_dir, request.files)
+    file_metas = await process_image_files(device_dir, files)
+    await save_manifest(device_dir, file_metas)
     return create_response(request, len(file_metas))
 
-def create_directory_structure(request: UploadRequest) -> Path:
+async def decode_files(files) -> List[Tuple[str, bytes]]:
+    """
+    在线程池中解码上传的Base64文件
+
+    Args:
+        files (List[FileBase64]): Base64编码的文件列表
+
+    Returns:
+        list: (原始文件名, 解码后的内容) 列表，顺序与上传顺序一致
+
+    Raises:
+        InvalidFileDataError: 有文件内容不是有效的Base64数据
+    """
+    async def decode(file) -> Tuple[str, bytes]:
+        try:
+            return file.filename, await cpu_executor.run(file.decode)
+        except ValueError as e:
+            raise InvalidFileDataError(f"{file.filename}: {e}") from e
+
+    return list(await asyncio.gather(*(decode(file) for file in files)))
+
+def create_directory_structure(request: UploadMeta) -> Path:
     """
     创建基于时间戳的目录结构
 
     目录结构：uploads/设备名称/时间戳/imgs/
 
     Args:
-        request (UploadRequest): 包含设备信息的请求对象
+        request (UploadMeta): 包含设备信息的请求对象
 
     Returns:
         Path: 创建的目录路径
@@ -67,7 +124,7 @@ def create_directory_structure(request: UploadRequest) -> Path:
     (device_dir / "imgs").mkdir(parents=True, exist_ok=True)
     return device_dir
 
-async def save_text_content(device_dir: Path, request: UploadRequest):
+async def save_text_content(device_dir: Path, request: UploadMeta):
     """
     保存上传的文本内容
 
@@ -75,72 +132,220 @@ async def save_text_content(device_dir: Path, request: UploadRequest):
 
     Args:
         device_dir (Path): 设备目录路径
-        request (UploadRequest): 包含文本内容的请求对象
+        request (UploadMeta): 包含文本内容的请求对象
     """
     content_path = device_dir / "content.txt"
-    async with aiofiles.open(content_path, "w", encoding='utf-8') as f:
+    async with aiofiles.open(content_path, "w", encoding='utf-8', executor=disk_executor) as f:
         await f.write(f"Title: {request.title or ''}\nContent: {request.content or ''}")
 
+async def save_manifest(device_dir: Path, file_metas: List[dict]) -> None:
+    """
+    保存图片清单，推送到设备时据此比较内容，无需重新计算sha256
+
+    同一时间戳多次上传时合并到已有清单中。
+
+    Args:
+        device_dir (Path): 设备目录路径
+        file_metas (List[dict]): 各图片的元数据
+    """
+    entries = {
+        Path(meta["saved_path"]).name: {"sha256": meta["sha256"], "size": meta["size"]}
+        for meta in file_metas
+    }
+    await disk_executor.run(_merge_manifest, device_dir / Settings.POST_MANIFEST_NAME, entries)
+
+def _merge_manifest(path: Path, entries: Dict[str, dict]) -> None:
+    """把图片条目合并写入清单文件"""
+    try:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        manifest = {"files": {}}
+    manifest["files"].update(entries)
+    temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    temp_path.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+    os.replace(temp_path, path)
+
 async def process_image_files(device_dir: Path, files) -> list:
     """
     处理上传的图片文件列表
 
+    文件并发保存，同时写盘的数量受Settings.UPLOAD_SAVE_CONCURRENCY限制，
+    返回的元数据顺序与上传顺序一致。
+
     Args:
         device_dir (Path): 设备目录路径
-        files (List): 图片文件列表
+        files (List[Tuple[str, bytes]]): (原始文件名, 文件内容) 列表
 
     Returns:
         list: 包含所有文件元数据的列表
     """
-    file_metas = []
-    for file in files:
-        file_meta = await save_single_file(device_dir, file)
-        file_metas.append(file_meta)
-    return file_metas
+    semaphore = asyncio.Semaphore(Settings.UPLOAD_SAVE_CONCURRENCY)
+
+    async def save_with_limit(filename: str, file_data: bytes) -> dict:
+        async with semaphore:
+            return await save_single_file(device_dir, filename, file_data)
+
+    return list(await asyncio.gather(*(save_with_limit(*file) for file in files)))
 
-async def save_single_file(device_dir: Path, file) -> dict:
+async def save_single_file(device_dir: Path, filename: str, file_data: bytes) -> dict:
     """
     保存单个图片文件
 
     处理流程：
-    1. 解码Base64数据
-    2. 生成唯一文件名
-    3. 计算文件哈希值
-    4. 保存文件
+    1. 在线程池中计算文件哈希
+    2. 按哈希生成文件名，同一内容重复上传时不会重复保存
+    3. 内容未存储过时写入内容寻址存储，已存储时跳过写入
+    4. 将存储中的文件链接到imgs目录
     5. 生成文件元数据
 
     Args:
         device_dir (Path): 设备目录路径
-        file: 包含文件数据的对象
+        filename (str): 原始文件名
+        file_data (bytes): 解码后的文件内容
 
     Returns:
         dict: 文件的元数据信息
     """
-    file_data = base64.b64decode(file.data.encode())
-    unique_filename = generate_unique_filename(file.filename)
-    save_path = device_dir / "imgs" / unique_filename
-    
-    # 计算文件哈希
-    hash_sha256 = sha256()
-    hash_sha256.update(file_data)
-    
+    digest = await cpu_executor.run(_sha256_hexdigest, file_data)
+    save_path = device_dir / "imgs" / content_filename(digest, filename)
+
     # 保存文件
-    async with aiofiles.open(save_path, "wb") as f:
-        await f.write(file_data)
-    
+    stored = await blob_store.put_bytes(digest, file_data)
+    await disk_executor.run(blob_store.link, digest, save_path)
+
     return {
-        "original_name": file.filename,
+        "original_name": filename,
         "saved_path": str(save_path.relative_to(UPLOAD_DIR)),
-        "sha256": hash_sha256.hexdigest(),
-        "size": len(file_data)
+        "sha256": digest,
+        "size": len(file_data),
+        "deduplicated": not stored
     }
 
-def create_response(request: UploadRequest, files_count: int) -> dict:
+def _sha256_hexdigest(data: bytes) -> str:
+    """计算数据的sha256十六进制摘要"""
+    with UPLOAD_HASH_DURATION.time():
+        return sha256(data).hexdigest()
+
+def _sha256_file(path: Path, block_size: int = 1024 * 1024) -> str:
+    """分块读取文件并增量计算sha256摘要"""
+    hash_sha256 = sha256()
+    with UPLOAD_HASH_DURATION.time(), open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            hash_sha256.update(block)
+    return hash_sha256.hexdigest()
+
+async def hash_file(path: Path) -> str:
+    """
+    在哈希线程池中计算文件的sha256摘要
+
+    Args:
+        path (Path): 文件路径
+
+    Returns:
+        str: sha256十六进制摘要
+    """
+    return await cpu_executor.run(_sha256_file, path)
+
+async def process_multipart_upload(content_type: str, stream: AsyncIterator[bytes]) -> Tuple[UploadMeta, dict]:
+    """
+    处理multipart/form-data流式上传请求
+
+    处理流程：
+    1. 逐块解析请求体，文件分段边接收边写入临时目录并计算哈希
+    2. 收集普通表单字段并校验为上传元数据
+    3. 创建与JSON上传相同的目录结构并保存文本内容
+    4. 将临时文件移入内容寻址存储并链接到imgs目录
+
+    单个请求的内存占用只与请求体分块大小相关，与文件总大小无关。
+
+    Args:
+        content_type (str): 请求的Content-Type头
+        stream (AsyncIterator[bytes]): 请求体字节流
+
+    Returns:
+        tuple: (上传元数据, 响应数据)
+
+    Raises:
+        MultipartError: 请求体格式错误、被截断、文件字段名不是files或缺少必要字段
+        UploadTooLargeError: 文件或字段超过大小限制
+    """
+    staging_dir = INCOMING_DIR / uuid.uuid4().hex
+    staging_dir.mkdir(parents=True, exist_ok=True)
+    fields: Dict[str, bytes] = {}
+    staged_files: List[dict] = []
+    current = None
+    f = None
+
+    try:
+        async for event, part, chunk in iter_multipart(content_type, stream):
+            if event == "begin":
+                if part.is_file:
+                    if part.name != MULTIPART_FILE_FIELD:
+                        raise MultipartError(f"Unexpected file field: {part.name}")
+                    staging_path = staging_dir / generate_unique_filename(part.filename)
+                    current = {
+                        "original_name": part.filename,
+                        "staging_path": staging_path,
+                        "hash": sha256(),
+                        "size": 0
+                    }
+                    f = await aiofiles.open(staging_path, "wb", executor=disk_executor)
+                else:
+                    fields[part.name] = b""
+            elif event == "data":
+                if part.is_file:
+                    current["size"] += len(chunk)
+                    if current["size"] > Settings.MAX_FILE_SIZE:
+                        raise UploadTooLargeError(f"File too large: {part.filename}")
+                    current["hash"].update(chunk)
+                    await f.write(chunk)
+                else:
+                    fields[part.name] += chunk
+                    if len(fields[part.name]) > MAX_FIELD_SIZE:
+                        raise UploadTooLargeError(f"Field too large: {part.name}")
+            elif event == "end" and part.is_file:
+                await f.close()
+                f = None
+                staged_files.append(current)
+                current = None
+
+        if current is not None:
+            raise MultipartError(f"Incomplete file part: {current['original_name']}")
+
+        try:
+            meta = UploadMeta(**{name: value.decode("utf-8") for name, value in fields.items()})
+        except ValueError as e:
+            raise MultipartError(f"Invalid form fields: {str(e)}") from e
+
+        device_dir = create_directory_structure(meta)
+        await save_text_content(device_dir, meta)
+
+        file_metas = []
+        for staged in staged_files:
+            digest = staged["hash"].hexdigest()
+            save_path = device_dir / "imgs" / content_filename(digest, staged["original_name"])
+            stored = await disk_executor.run(blob_store.put_file, digest, staged["staging_path"])
+            await disk_executor.run(blob_store.link, digest, save_path)
+            file_metas.append({
+                "original_name": staged["original_name"],
+                "saved_path": str(save_path.relative_to(UPLOAD_DIR)),
+                "sha256": digest,
+                "size": staged["size"],
+                "deduplicated": not stored
+            })
+        await save_manifest(device_dir, file_metas)
+        return meta, create_response(meta, len(file_metas))
+    finally:
+        if f is not None:
+            await f.close()
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+def create_response(request: UploadMeta, files_count: int) -> dict:
     """
     创建上传处理的响应数据
 
     Args:
-        request (UploadRequest): 上传请求对象
+        request (UploadMeta): 上传请求对象
         files_count (int): 处理的文件数量
 
     Returns:
@@ -0,0 +1,348 @@
+"""
+断点续传上传服务模块
+
+该模块实现可恢复的分块上传协议，包括：
+1. 创建上传会话，声明文件列表和大小
+2. 按偏移量写入编号分块
+3. 查询各文件已接收的字节区间
+4. 合并完成的文件并写入正式目录结构
+
+主要功能：
+- 连接中断后只需补传缺失的分块，无需重新发送整个请求
+- 合并时分块读取文件增量计算哈希，并写入内容寻址存储
+
+会话目录结构：uploads/.sessions/会话ID/{session.json, 文件序号.part}
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import logging
+import aiofiles
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Set, Tuple
+from core.config import Settings, UPLOAD_DIR
+from core.executors import disk_executor
+from models.request import UploadMeta, UploadSessionRequest
+from services.blob_store import blob_store
+from services.upload_service import (
+    UploadTooLargeError, create_directory_structure, save_text_content, save_manifest, create_response, hash_file
+)
+from utils.file_utils import content_filename
+
+logger = logging.getLogger(__name__)
+
+SESSION_DIR = UPLOAD_DIR / ".sessions"
+MANIFEST_NAME = "session.json"
+
+class UploadSessionNotFound(Exception):
+    """上传会话不存在或已过期"""
+    pass
+
+class UploadSessionError(ValueError):
+    """上传会话请求不合法（偏移越界、文件不完整、摘要不匹配等）"""
+    pass
+
+class UploadSessionConflict(Exception):
+    """会话正在合并时写入分块，或仍有分块在写入时请求合并"""
+    pass
+
+# 每个会话一把锁，保证清单文件的读写不会交错
+_session_locks: Dict[str, asyncio.Lock] = {}
+# 每个会话正在写入的分块数，在会话锁内登记，合并前检查
+_active_writes: Dict[str, int] = {}
+
+def _session_lock(session_id: str) -> asyncio.Lock:
+    """获取会话锁"""
+    if session_id not in _session_locks:
+        _session_locks[session_id] = asyncio.Lock()
+    return _session_locks[session_id]
+
+def _session_path(session_id: str) -> Path:
+    """获取会话目录，拒绝非法的会话ID"""
+    if not session_id.isalnum():
+        raise UploadSessionNotFound(session_id)
+    return SESSION_DIR / session_id
+
+def _load_manifest(session_id: str) -> dict:
+    """读取会话清单"""
+    manifest_path = _session_path(session_id) / MANIFEST_NAME
+    if not manifest_path.exists():
+        raise UploadSessionNotFound(session_id)
+    return json.loads(manifest_path.read_text(encoding="utf-8"))
+
+def _save_manifest(manifest: dict) -> None:
+    """原子写入会话清单，同时刷新最近活动时间"""
+    manifest["updated_at"] = time.time()
+    session_dir = _session_path(manifest["id"])
+    temp_path = session_dir / f"{MANIFEST_NAME}.tmp"
+    temp_path.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+    os.replace(temp_path, session_dir / MANIFEST_NAME)
+
+def _merge_range(ranges: List[List[int]], start: int, end: int) -> List[List[int]]:
+    """
+    把新区间合并进已接收区间列表
+
+    Args:
+        ranges: 已排序且互不重叠的半开区间列表
+        start: 新区间起点
+        end: 新区间终点（不包含）
+
+    Returns:
+        list: 合并后的区间列表
+    """
+    merged = []
+    for r_start, r_end in sorted(ranges + [[start, end]]):
+        if merged and r_start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], r_end)
+        else:
+            merged.append([r_start, r_end])
+    return merged
+
+def _file_status(file: dict) -> dict:
+    """生成单个文件的接收状态"""
+    received = sum(end - start for start, end in file["received"])
+    return {
+        "filename": file["filename"],
+        "size": file["size"],
+        "received": file["received"],
+        "received_bytes": received,
+        "complete": received == file["size"]
+    }
+
+def session_status(manifest: dict) -> dict:
+    """
+    生成会话状态响应
+
+    Args:
+        manifest: 会话清单
+
+    Returns:
+        dict: 会话ID、过期时间及各文件已接收区间
+    """
+    files = [_file_status(file) for file in manifest["files"]]
+    return {
+        "session_id": manifest["id"],
+        "device_name": manifest["meta"]["device_name"],
+        "timestamp": manifest["meta"]["timestamp"],
+        "expires_at": manifest["updated_at"] + Settings.UPLOAD_SESSION_TTL,
+        "complete": all(file["complete"] for file in files),
+        "files": files
+    }
+
+async def purge_expired_sessions() -> None:
+    """清理超过保留时间未活动的会话，正在写入分块的会话除外"""
+    removed = await disk_executor.run(_remove_expired_sessions, set(_active_writes))
+    for session_id in removed:
+        _session_locks.pop(session_id, None)
+        logger.info(f"清理过期上传会话: {session_id}")
+
+def _remove_expired_sessions(skip: Set[str]) -> List[str]:
+    """删除过期的会话目录，返回已删除的会话ID"""
+    if not SESSION_DIR.exists():
+        return []
+    cutoff = time.time() - Settings.UPLOAD_SESSION_TTL
+    removed = []
+    for session_dir in SESSION_DIR.iterdir():
+        if session_dir.name in skip:
+            continue
+        manifest_path = session_dir / MANIFEST_NAME
+        try:
+            if manifest_path.stat().st_mtime < cutoff:
+                shutil.rmtree(session_dir, ignore_errors=True)
+                removed.append(session_dir.name)
+        except FileNotFoundError:
+            shutil.rmtree(session_dir, ignore_errors=True)
+    return removed
+
+def _allocate_session(session_dir: Path, sizes: List[int]) -> None:
+    """创建会话目录，并为每个文件预分配对应大小的分块文件"""
+    session_dir.mkdir(parents=True, exist_ok=True)
+    for index, size in enumerate(sizes):
+        with open(session_dir / f"{index}.part", "wb") as f:
+            f.truncate(size)
+
+async def create_session(request: UploadSessionRequest) -> dict:
+    """
+    创建上传会话
+
+    为每个文件预分配对应大小的分块文件，分块可按任意顺序写入。
+
+    Args:
+        request (UploadSessionRequest): 会话创建请求
+
+    Returns:
+        dict: 会话状态
+
+    Raises:
+        UploadTooLargeError: 声明的文件超过大小限制
+    """
+    for file in request.files:
+        if file.size > Settings.MAX_FILE_SIZE:
+            raise UploadTooLargeError(f"File too large: {file.filename}")
+
+    await purge_expired_sessions()
+
+    session_id = uuid.uuid4().hex
+    await disk_executor.run(_allocate_session, _session_path(session_id), [file.size for file in request.files])
+
+    manifest = {
+        "id": session_id,
+        "created_at": time.time(),
+        "meta": request.model_dump(include={"device_name", "timestamp", "title", "content"}),
+        "files": [
+            {"filename": file.filename, "size": file.size, "sha256": file.sha256, "received": []}
+            for file in request.files
+        ]
+    }
+    await disk_executor.run(_save_manifest, manifest)
+    logger.info(f"创建上传会话: {session_id} - 设备: {request.device_name}, 文件数: {len(request.files)}")
+    return session_status(manifest)
+
+async def get_session(session_id: str) -> dict:
+    """
+    查询会话状态
+
+    Args:
+        session_id (str): 会话ID
+
+    Returns:
+        dict: 会话状态
+
+    Raises:
+        UploadSessionNotFound: 会话不存在
+    """
+    return session_status(await disk_executor.run(_load_manifest, session_id))
+
+async def write_chunk(session_id: str, file_index: int, chunk_no: int, offset: int,
+                      stream: AsyncIterator[bytes]) -> dict:
+    """
+    写入一个分块
+
+    分块内容按请求体流式写入分块文件的指定偏移处，
+    只有完整接收后才记录到已接收区间，中途断开的分块需重新发送。
+
+    Args:
+        session_id (str): 会话ID
+        file_index (int): 文件序号
+        chunk_no (int): 分块编号，仅用于日志和响应
+        offset (int): 分块在文件中的起始偏移
+        stream (AsyncIterator[bytes]): 分块内容字节流
+
+    Returns:
+        dict: 该文件的接收状态
+
+    Raises:
+        UploadSessionNotFound: 会话不存在（包括已合并完成）
+        UploadSessionError: 文件序号或偏移越界
+        UploadTooLargeError: 分块超过大小限制
+    """
+    part_path = _session_path(session_id) / f"{file_index}.part"
+    async with _session_lock(session_id):
+        manifest = await disk_executor.run(_load_manifest, session_id)
+        if not 0 <= file_index < len(manifest["files"]):
+            raise UploadSessionError(f"Invalid file index: {file_index}")
+        size = manifest["files"][file_index]["size"]
+        if not 0 <= offset <= size:
+            raise UploadSessionError(f"Invalid offset: {offset}")
+        if not await disk_executor.run(part_path.exists):
+            raise UploadSessionNotFound(session_id)
+        # 登记正在写入的分块，合并在所有分块写完前不会开始
+        _active_writes[session_id] = _active_writes.get(session_id, 0) + 1
+
+    written = 0
+    try:
+        async with aiofiles.open(part_path, "r+b", executor=disk_executor) as f:
+            await f.seek(offset)
+            async for data in stream:
+                written += len(data)
+                if written > Settings.UPLOAD_CHUNK_MAX_SIZE:
+                    raise UploadTooLargeError(f"Chunk too large: {chunk_no}")
+                if offset + written > size:
+                    raise UploadSessionError(f"Chunk {chunk_no} exceeds declared file size")
+                await f.write(data)
+
+        async with _session_lock(session_id):
+            manifest = await disk_executor.run(_load_manifest, session_id)
+            file = manifest["files"][file_index]
+            if written:
+                file["received"] = _merge_range(file["received"], offset, offset + written)
+                await disk_executor.run(_save_manifest, manifest)
+    finally:
+        _active_writes[session_id] -= 1
+        if not _active_writes[session_id]:
+            del _active_writes[session_id]
+
+    logger.debug(f"会话 {session_id} 文件 {file_index} 接收分块 {chunk_no}: 偏移 {offset}, 长度 {written}")
+    return {"chunk_no": chunk_no, "offset": offset, "length": written, **_file_status(file)}
+
+async def finalize_session(session_id: str) -> Tuple[UploadMeta, dict]:
+    """
+    合并会话中的文件并写入正式目录
+
+    处理流程：
+    1. 校验所有文件均已完整接收
+    2. 创建与JSON上传相同的目录结构并保存文本内容
+    3. 分块读取每个文件增量计算哈希，校验声明的摘要
+    4. 将文件移入内容寻址存储并链接到imgs目录
+    5. 删除会话目录
+
+    Args:
+        session_id (str): 会话ID
+
+    Returns:
+        tuple: (上传元数据, 响应数据)
+
+    Raises:
+        UploadSessionNotFound: 会话不存在
+        UploadSessionConflict: 仍有分块正在写入
+        UploadSessionError: 文件不完整或摘要不匹配
+    """
+    async with _session_lock(session_id):
+        if _active_writes.get(session_id):
+            raise UploadSessionConflict(f"Chunks are still being written: {session_id}")
+        meta, response = await _finalize_locked(session_id)
+    _session_locks.pop(session_id, None)
+
+    logger.info(f"上传会话合并完成: {session_id} - 设备: {meta.device_name}, 文件数: {response['files_count']}")
+    return meta, response
+
+async def _finalize_locked(session_id: str) -> Tuple[UploadMeta, dict]:
+    """在会话锁内合并会话"""
+    manifest = await disk_executor.run(_load_manifest, session_id)
+    status = session_status(manifest)
+    missing = [file["filename"] for file in status["files"] if not file["complete"]]
+    if missing:
+        raise UploadSessionError(f"Incomplete files: {', '.join(missing)}")
+
+    session_dir = _session_path(session_id)
+    digests = []
+    for index, file in enumerate(manifest["files"]):
+        digest = await hash_file(session_dir / f"{index}.part")
+        if file["sha256"] and file["sha256"].lower() != digest:
+            raise UploadSessionError(f"sha256 mismatch: {file['filename']}")
+        digests.append(digest)
+
+    meta = UploadMeta(**manifest["meta"])
+    device_dir = create_directory_structure(meta)
+    await save_text_content(device_dir, meta)
+
+    file_metas = []
+    for index, (file, digest) in enumerate(zip(manifest["files"], digests)):
+        save_path = device_dir / "imgs" / content_filename(digest, file["filename"])
+        stored = await disk_executor.run(blob_store.put_file, digest, session_dir / f"{index}.part")
+        await disk_executor.run(blob_store.link, digest, save_path)
+        file_metas.append({
+            "original_name": file["filename"],
+            "saved_path": str(save_path.relative_to(UPLOAD_DIR)),
+            "sha256": digest,
+            "size": file["size"],
+            "deduplicated": not stored
+        })
+    await save_manifest(device_dir, file_metas)
+
+    await disk_executor.run(shutil.rmtree, session_dir, ignore_errors=True)
+    return meta, create_response(meta, len(file_metas))
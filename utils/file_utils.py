@@ -2,12 +2,13 @@
 文件工具模块
 
 该模块提供文件处理相关的工具函数，包括：
-1. 生成唯一文件名
+1. 生成唯一文件名和按内容摘要命名的文件名
 2. 文件扩展名处理
 3. 其他文件相关的实用函数
 
 主要功能：
 - 生成基于UUID的唯一文件名
+- 生成基于sha256摘要的文件名，同一内容重复上传时文件名相同
 - 保持原始文件扩展名
 """
 
@@ -31,4 +32,25 @@ def generate_unique_filename(original_name: str) -> str:
         '123e4567-e89b-12d3-a456-426614174000.jpg'
     """
     ext = Path(original_name).suffix
-    return f"{uuid.uuid4().hex}{ext}"
\ No newline at end of file
+    return f"{uuid.uuid4().hex}{ext}"
+
+def content_filename(digest: str, original_name: str) -> str:
+    """
+    生成按内容命名的文件名
+
+    使用文件内容的sha256摘要，并保留原始文件的扩展名。
+    同一请求重试时图片保存为相同的文件名，不会在imgs目录中重复出现。
+
+    Args:
+        digest (str): 文件内容的sha256摘要
+        original_name (str): 原始文件名
+
+    Returns:
+        str: 生成的文件名（摘要 + 原始扩展名）
+
+    示例:
+        >>> content_filename('9f86d081884c7d65...', 'test.jpg')
+        '9f86d081884c7d65....jpg'
+    """
+    ext = Path(original_name).suffix
+    return f"{digest}{ext}"
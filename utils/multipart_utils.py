@@ -0,0 +1,131 @@
+"""
+流式multipart解析工具模块
+
+该模块基于python-multipart提供multipart/form-data请求体的流式解析，包括：
+1. 解析Content-Type中的boundary
+2. 按块驱动解析器并产出分段事件
+3. 解析分段头中的字段名和文件名
+
+主要功能：
+- 以异步迭代的方式逐块产出分段数据，避免在内存中缓存整个请求体
+"""
+
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+class MultipartError(ValueError):
+    """multipart请求格式错误"""
+    pass
+
+class MultipartPart:
+    """
+    multipart分段信息
+
+    属性:
+        name (str): 表单字段名
+        filename (Optional[str]): 文件名，普通字段为None
+        headers (Dict[str, str]): 分段头
+    """
+
+    def __init__(self):
+        self.name: str = ""
+        self.filename: Optional[str] = None
+        self.headers: Dict[str, str] = {}
+
+    @property
+    def is_file(self) -> bool:
+        """是否为文件分段"""
+        return self.filename is not None
+
+async def iter_multipart(content_type: str, stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[str, MultipartPart, bytes]]:
+    """
+    流式解析multipart请求体
+
+    每读取一块请求体就驱动一次解析器，并按顺序产出事件：
+    ("begin", part, b"")、("data", part, chunk)、("end", part, b"")
+
+    Args:
+        content_type (str): 请求的Content-Type头
+        stream (AsyncIterator[bytes]): 请求体字节流
+
+    Yields:
+        tuple: (事件类型, 分段信息, 数据块)
+
+    Raises:
+        MultipartError: 请求不是合法的multipart/form-data，或请求体在结束边界之前中断时抛出
+    """
+    media_type, params = parse_options_header(content_type)
+    boundary = params.get(b"boundary")
+    if media_type != b"multipart/form-data" or not boundary:
+        raise MultipartError("Content-Type must be multipart/form-data with a boundary")
+
+    events: List[Tuple[str, MultipartPart, bytes]] = []
+    state = {"part": MultipartPart(), "field": b"", "value": b"", "finished": False}
+
+    def on_part_begin():
+        state["part"] = MultipartPart()
+
+    def on_header_field(data: bytes, start: int, end: int):
+        state["field"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        state["value"] += data[start:end]
+
+    def on_header_end():
+        field = state["field"].decode("latin-1").lower()
+        state["part"].headers[field] = state["value"].decode("utf-8", errors="replace")
+        state["field"] = b""
+        state["value"] = b""
+
+    def on_headers_finished():
+        part = state["part"]
+        disposition = part.headers.get("content-disposition")
+        if disposition is None:
+            raise MultipartError("Missing Content-Disposition header")
+        _, options = parse_options_header(disposition)
+        if b"name" not in options:
+            raise MultipartError("Missing field name in Content-Disposition")
+        part.name = options[b"name"].decode("utf-8", errors="replace")
+        if b"filename" in options:
+            part.filename = options[b"filename"].decode("utf-8", errors="replace")
+        events.append(("begin", part, b""))
+
+    def on_part_data(data: bytes, start: int, end: int):
+        events.append(("data", state["part"], data[start:end]))
+
+    def on_part_end():
+        events.append(("end", state["part"], b""))
+
+    def on_end():
+        state["finished"] = True
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_end": on_end,
+    })
+
+    async for chunk in stream:
+        if not chunk:
+            continue
+        try:
+            parser.write(chunk)
+        except MultipartError:
+            raise
+        except Exception as e:
+            raise MultipartError(f"Malformed multipart body: {str(e)}") from e
+        # 每块解析后立即交出事件，保证内存占用只与块大小相关
+        for event in events:
+            yield event
+        events.clear()
+
+    parser.finalize()
+    for event in events:
+        yield event
+    if not state["finished"]:
+        raise MultipartError("Unexpected end of multipart body")